@@ -2,15 +2,16 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os.path
-
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 
 # Importa as funções de autenticação
 from auth import force_relogin_on_navigate, add_logout_button
+from sheets import (
+    get_sheets_service, get_tabela_sheets, verificar_alteracoes, enviar_operacoes, versao_aba,
+    ABA_DEVOLUCAO, COLUNA_NF, COLUNA_GESTOR_RESP, COLUNA_ASSINATURA, COLUNA_GESTOR_ASSINATURA, COLUNA_DEVOLUCAO,
+)
+from sheets_sync import texto_celulas, operacoes_do_registro
+from prefetch import mostrar_status
+from medicao import medir, cronometrado, mostrar_painel_medicoes
 
 # --- NOME DE USUÁRIO DO ADMINISTRADOR ---
 # Defina aqui o nome de usuário exato do seu administrador
@@ -18,14 +19,7 @@ from auth import force_relogin_on_navigate, add_logout_button
 ADM_USERNAME = "admin" # <--- MUDE AQUI SE O SEU ADM TIVER OUTRO NOME
 
 # --- Configurações ---
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-SPREADSHEET_ID = "1Lpjc8Zb9_P8vZjt8pjjft66LpGqTE4g7uUy0hlOnUO8"
-SHEET_NAME = "Devolução"
-RANGE_NAME = f"{SHEET_NAME}"
-COLUNA_GESTOR_RESP = 'GESTOR_RESP'
-COLUNA_ASSINATURA = 'ASSINATURA'
-COLUNA_GESTOR_ASSINATURA = 'GESTORASSINATURA'
-COLUNA_DEVOLUCAO = 'DEVOLUCAO'
+SHEET_NAME = ABA_DEVOLUCAO
 # Para o ADM, talvez você queira permitir editar tudo,
 # então COLUNAS_DESABILITADAS pode ser uma tupla vazia ()
 # ou você pode remover o 'disabled' do data_editor.
@@ -33,120 +27,193 @@ COLUNA_DEVOLUCAO = 'DEVOLUCAO'
 COLUNAS_DESABILITADAS = ("GESTORASSINATURA",) # Exemplo: ADM pode editar quase tudo
 
 
-# --- Funções de API do Google Sheets (Corrigindo indentação e cache) ---
-
-@st.cache_resource # Cacheia o objeto 'service'
-def get_sheets_service():
-    """Autentica com a API do Google Sheets usando st.secrets e retorna o objeto 'service'."""
-    creds = None
-    if "google_token" not in st.secrets:
-        st.error("Configuração '[google_token]' não encontrada em st.secrets.")
-        return None
-    try:
-        token_info = st.secrets["google_token"].to_dict()
-        creds = Credentials.from_authorized_user_info(token_info, SCOPES)
-    except Exception as e:
-        st.error(f"Erro ao carregar credenciais: {e}")
-        return None
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            #st.info("Token expirado. Tentando atualizar...")
-            try:
-                creds.refresh(Request())
-                st.success("Token atualizado!")
-            except Exception as e:
-                st.error(f"Erro ao atualizar o token: {e}")
-                return None
-        else:
-            st.error("Credenciais inválidas.")
-            return None
-    try:
-        service = build("sheets", "v4", credentials=creds)
-        return service
-    except Exception as e:
-        st.error(f"Erro ao construir serviço: {e}")
-        return None
-
-@st.cache_data(ttl=300) # Cacheia por 5 minutos
-def get_tabela_sheets(_service):
-    """Busca os dados da planilha e retorna um DataFrame Pandas."""
-    if not _service:
-        st.error("Serviço Google Sheets não disponível.")
-        return None
-    try:
-        sheet = _service.spreadsheets()
-        result = (sheet.values().get(spreadsheetId=SPREADSHEET_ID, range=SHEET_NAME).execute())
-        values = result.get("values", [])
-
-        if not values: # Se não houver nada, retorna um DF vazio com colunas
-            st.warning(f"Planilha '{SHEET_NAME}' vazia ou não encontrada. Criando DF vazio.")
-            # Defina as colunas esperadas aqui, caso a planilha esteja realmente vazia
-            expected_cols = ["NF", "FORNECEDOR", "VALOR", "DT VENC", "GESTOR_RESP", "ASSINATURA", "GESTORASSINATURA"]
-            return pd.DataFrame(columns=expected_cols)
-
-        header = values[0]
-        data = values[1:] if len(values) > 1 else []
-        df = pd.DataFrame(data, columns=header)
-
-        # --- Garante Colunas e Conversão de Tipos ---
-        if COLUNA_ASSINATURA not in df.columns: df[COLUNA_ASSINATURA] = 'FALSE'
-        if COLUNA_DEVOLUCAO not in df.columns: df[COLUNA_DEVOLUCAO] = 'FALSE'
-        if COLUNA_GESTOR_ASSINATURA not in df.columns: df[COLUNA_GESTOR_ASSINATURA] = ''
-        if COLUNA_GESTOR_RESP not in df.columns: df[COLUNA_GESTOR_RESP] = ''
-        
-        df[COLUNA_ASSINATURA] = df[COLUNA_ASSINATURA].astype(str).str.upper()
-        df[COLUNA_ASSINATURA] = df[COLUNA_ASSINATURA].map({'TRUE': True, 'VERDADEIRO': True}).fillna(False).astype(bool)
-        df[COLUNA_DEVOLUCAO] = df[COLUNA_DEVOLUCAO].map({'TRUE': True, 'VERDADEIRO': True}).fillna(False).astype(bool)
-
-        if 'VALOR' in df.columns:
-            df['VALOR'] = pd.to_numeric(df['VALOR'].astype(str).str.replace(',', '.', regex=False), errors='coerce').fillna(0)
-        if 'DT VENC' in df.columns:
-            df['DT VENC'] = pd.to_datetime(df['DT VENC'], errors='coerce', dayfirst=True)
-        if 'DATA DEVOLUCAO' in df.columns:
-            df['DATA DEVOLUCAO'] = pd.to_datetime(df['DATA DEVOLUCAO'], errors='coerce', dayfirst=True)
-        if 'ENTREGA GESTOR' in df.columns:
-            df['ENTREGA GESTOR'] = pd.to_datetime(df['ENTREGA GESTOR'], errors='coerce', dayfirst=True)
-
-        return df
-    except Exception as err:
-        st.error(f"Erro ao buscar dados: {err}")
-        return None
-
-def update_tabela_sheets(_service, df_atualizado):
-    """Atualiza os dados na planilha do Google Sheets."""
+# --- Escrita na planilha ---
+
+def _formatar_para_planilha(df):
+    """Converte as colunas do DataFrame para o texto gravado na planilha."""
+    df_to_save = df.copy(deep=False)
+    if COLUNA_ASSINATURA in df_to_save.columns:
+         df_to_save[COLUNA_ASSINATURA] = df_to_save[COLUNA_ASSINATURA].apply(lambda x: 'TRUE' if x else 'FALSE')
+    if COLUNA_DEVOLUCAO in df_to_save.columns:
+         df_to_save[COLUNA_DEVOLUCAO] = df_to_save[COLUNA_DEVOLUCAO].apply(lambda x: 'TRUE' if x else 'FALSE')
+    if 'DT VENC' in df_to_save.columns:
+         df_to_save['DT VENC'] = pd.to_datetime(df_to_save['DT VENC']).dt.strftime('%d/%m/%Y').fillna('')
+    if 'DATA DEVOLUCAO' in df_to_save.columns:
+         df_to_save['DATA DEVOLUCAO'] = pd.to_datetime(df_to_save['DATA DEVOLUCAO']).dt.strftime('%d/%m/%Y').fillna('')
+    if 'ENTREGA GESTOR' in df_to_save.columns:
+         df_to_save['ENTREGA GESTOR'] = pd.to_datetime(df_to_save['ENTREGA GESTOR']).dt.strftime('%d/%m/%Y').fillna('')
+
+    # Ao salvar, as marcações voltam para 'FALSE'
+    df_to_save[COLUNA_ASSINATURA] = 'FALSE'
+    df_to_save[COLUNA_DEVOLUCAO] = 'FALSE'
+    return texto_celulas(df_to_save)
+
+def _juntar(*frames):
+    """Concatena os DataFrames não vazios (ou devolve o primeiro, se todos estiverem vazios)."""
+    com_linhas = [f for f in frames if len(f)]
+    if len(com_linhas) < 2:
+        return com_linhas[0] if com_linhas else frames[0]
+    return pd.concat(com_linhas)
+
+@cronometrado("admin.salvar")
+def update_tabela_sheets(_service, df_original, alteracoes):
+    """
+    Envia para a planilha só o registro de alterações do editor, em um único batchUpdate:
+    'editadas' (linhas com os valores novos, mesmos rótulos de 'df_original'), 'novas'
+    (linhas adicionadas) e 'removidas' (rótulos). Nada é comparado além das linhas tocadas.
+    """
     if not _service: return False
     try:
-        sheet = _service.spreadsheets()
-        df_to_save = df_atualizado.copy()
-        if COLUNA_ASSINATURA in df_to_save.columns:
-             df_to_save[COLUNA_ASSINATURA] = df_to_save[COLUNA_ASSINATURA].apply(lambda x: 'TRUE' if x else 'FALSE')
-        if COLUNA_DEVOLUCAO in df_to_save.columns:
-             df_to_save[COLUNA_DEVOLUCAO] = df_to_save[COLUNA_DEVOLUCAO].apply(lambda x: 'TRUE' if x else 'FALSE')
-        if 'DT VENC' in df_to_save.columns:
-             df_to_save['DT VENC'] = pd.to_datetime(df_to_save['DT VENC']).dt.strftime('%d/%m/%Y').fillna('')
-        if 'DATA DEVOLUCAO' in df_to_save.columns:
-             df_to_save['DATA DEVOLUCAO'] = pd.to_datetime(df_to_save['DATA DEVOLUCAO']).dt.strftime('%d/%m/%Y').fillna('')
-        if 'ENTREGA GESTOR' in df_to_save.columns:
-             df_to_save['ENTREGA GESTOR'] = pd.to_datetime(df_to_save['ENTREGA GESTOR']).dt.strftime('%d/%m/%Y').fillna('')
-
-        # Garante que todas as colunas sejam string para evitar erros de tipo na API
-        df_to_save[COLUNA_ASSINATURA] = 'FALSE' 
-        df_to_save[COLUNA_DEVOLUCAO] = 'FALSE' 
-        data_to_write = [df_to_save.columns.tolist()] + df_to_save.values.tolist()
-        body = {"values": data_to_write}
-
-        # Limpa a aba antes de escrever (MAIS SEGURO com num_rows="dynamic")
-        st.warning("Limpando a aba antes de reescrever...")
-        sheet.values().clear(spreadsheetId=SPREADSHEET_ID, range=SHEET_NAME).execute()
-
-        result = (sheet.values().update(spreadsheetId=SPREADSHEET_ID, range=f"{SHEET_NAME}", valueInputOption="USER_ENTERED", body=body).execute())
-        st.info(f"{result.get('updatedCells')} células atualizadas.")
+        editadas, novas = alteracoes["editadas"], alteracoes["novas"]
+        removidas = list(alteracoes["removidas"])
+        antes = df_original.loc[editadas.index]
+
+        operacoes = operacoes_do_registro(
+            df_original.index.get_indexer(editadas.index),
+            _formatar_para_planilha(antes), _formatar_para_planilha(editadas),
+            remover=df_original.index.get_indexer(removidas),
+            texto_novas=_formatar_para_planilha(novas),
+        )
+        enviar_operacoes(_service, SHEET_NAME, operacoes, conferir=df_original) # Desiste se as linhas mudaram de posição
+        st.info(
+            f"{len(operacoes['atualizar'])} células atualizadas, "
+            f"{len(operacoes['adicionar'])} linhas adicionadas, "
+            f"{len(operacoes['remover'])} linhas removidas."
+        )
         return True
     except Exception as error:
         st.error(f"Erro ao atualizar planilha: {error}")
         return False
 
+# --- Edição paginada (visão GERAL) ---
+# O DataFrame completo fica no servidor (cache compartilhado). O editor recebe só a
+# página atual, já filtrada e ordenada aqui. As alterações de cada página vão para
+# um buffer de pendentes na sessão e são salvas todas juntas em um único envio.
+# O buffer guarda as linhas pelo rótulo (posição na aba) e a NF de cada uma: quando
+# a aba muda de versão, os rótulos são refeitos pela NF (_remapear_pendentes).
+
+TAMANHOS_PAGINA = (50, 100, 250, 500)
+ORDEM_PLANILHA = "(ordem da planilha)"
+TODOS_GESTORES = "(todos)"
+COLUNAS_BUSCA = ("NF", "FORNECEDOR")
+CHAVE_PENDENTES = "adm_pendentes" # Alterações acumuladas de todas as páginas
+CHAVE_PAGINA = "adm_pagina_atual" # Alterações da página que está no editor
+CHAVE_GERACAO = "adm_geracao" # Muda a chave do editor sempre que a página exibida muda
+
+def _pendentes():
+    """Buffer de alterações ainda não salvas da visão GERAL (por sessão)."""
+    if CHAVE_PENDENTES not in st.session_state:
+        st.session_state[CHAVE_PENDENTES] = {
+            "editadas": None, "novas": [], "removidas": set(), "chaves": {}, "versao": None,
+        }
+    return st.session_state[CHAVE_PENDENTES]
+
+def _guardar_pagina():
+    """Passa as alterações da página atual para o buffer (antes de trocar de página, filtro ou ordem)."""
+    pendentes = _pendentes()
+    pagina = st.session_state.pop(CHAVE_PAGINA, None)
+    if pagina:
+        removidas = pendentes["removidas"] | set(pagina["removidas"])
+        editadas = pendentes["editadas"]
+        if editadas is not None:
+            editadas = editadas.drop(index=pagina["editadas"].index.union(list(removidas)), errors="ignore")
+            editadas = pd.concat([editadas, pagina["editadas"]])
+        elif len(pagina["editadas"]):
+            editadas = pagina["editadas"]
+        if editadas is not None:
+            editadas = editadas.drop(index=list(removidas), errors="ignore")
+        pendentes["editadas"] = editadas
+        pendentes["removidas"] = removidas
+        if len(pagina["novas"]):
+            pendentes["novas"].append(pagina["novas"])
+        pendentes["chaves"].update(pagina["chaves"])
+    _novo_editor()
+
+def _novo_editor():
+    """O estado do editor guarda posições da página exibida; outra página precisa de outro editor."""
+    st.session_state[CHAVE_GERACAO] = st.session_state.get(CHAVE_GERACAO, 0) + 1
+
+def _mudou_filtro():
+    _guardar_pagina()
+    st.session_state["adm_pagina_num"] = 1
+
+def _descartar_pendentes():
+    st.session_state.pop(CHAVE_PENDENTES, None)
+    st.session_state.pop(CHAVE_PAGINA, None)
+    _novo_editor()
+
+def _chaves(df, rotulos):
+    """NF (texto) de cada rótulo da versão 'df' da aba; None se a linha não tiver NF."""
+    if COLUNA_NF not in df.columns:
+        return dict.fromkeys(rotulos)
+    return {r: (None if pd.isna(nf) else str(nf)) for r, nf in df[COLUNA_NF].reindex(list(rotulos)).items()}
+
+def _remapear_pendentes(pendentes, df):
+    """
+    Leva as alterações pendentes para a versão 'df' da aba. Os rótulos da versão anterior
+    podem apontar para outras linhas (linhas incluídas, removidas ou arquivadas), então cada
+    linha é procurada pela NF. Descarta as linhas cuja NF sumiu ou ficou repetida e
+    retorna quantas foram descartadas.
+    """
+    novo_rotulo = {}
+    if COLUNA_NF in df.columns:
+        nfs = df[COLUNA_NF].dropna().astype(str)
+        unicas = nfs[~nfs.duplicated(keep=False)]
+        novo_rotulo = dict(zip(unicas.to_numpy(), unicas.index))
+    mapa = {r: novo_rotulo.get(nf) for r, nf in pendentes["chaves"].items()}
+    mapa = {r: novo for r, novo in mapa.items() if novo is not None}
+
+    editadas, removidas = pendentes["editadas"], pendentes["removidas"]
+    descartadas = (0 if editadas is None else len(editadas)) + len(removidas)
+    if editadas is not None:
+        editadas = editadas[editadas.index.isin(list(mapa))]
+        editadas.index = pd.Index([mapa[r] for r in editadas.index])
+    removidas = {mapa[r] for r in removidas if r in mapa}
+    descartadas -= (0 if editadas is None else len(editadas)) + len(removidas)
+
+    pendentes["editadas"] = editadas if editadas is not None and len(editadas) else None
+    pendentes["removidas"] = removidas
+    pendentes["chaves"] = {mapa[r]: pendentes["chaves"][r] for r in mapa}
+    return descartadas
+
+def _rotulos_visao(df, removidas, busca, gestor, coluna, crescente):
+    """Rótulos das linhas visíveis (sem as removidas), filtrados e ordenados no servidor."""
+    mascara = ~df.index.isin(list(removidas))
+    if gestor != TODOS_GESTORES:
+        mascara &= (df[COLUNA_GESTOR_RESP] == gestor).to_numpy()
+    if busca:
+        encontrada = False
+        for col in COLUNAS_BUSCA:
+            if col in df.columns:
+                encontrada = encontrada | df[col].astype(str).str.contains(busca, case=False, regex=False).to_numpy()
+        mascara &= encontrada
+    rotulos = df.index[mascara]
+    if coluna != ORDEM_PLANILHA:
+        rotulos = df.loc[rotulos, coluna].sort_values(ascending=crescente, kind="stable").index
+    return rotulos
+
+def _aplicar_pendentes(pagina, editadas):
+    """Mostra na página os valores editados em páginas anteriores e ainda não salvos."""
+    if editadas is None:
+        return pagina
+    trocar = pagina.index.intersection(editadas.index, sort=False)
+    if not len(trocar):
+        return pagina
+    return pd.concat([pagina.drop(index=trocar), editadas.loc[trocar]]).loc[pagina.index]
+
+def _alteracoes_pagina(rotulos, edited_df, estado_editor):
+    """
+    Alterações feitas no editor da página atual. O editor recebe a página com índice
+    0..n-1, então as posições do estado do editor são convertidas de volta nos rótulos.
+    """
+    estado_editor = estado_editor or {}
+    removidas = [rotulos[p] for p in estado_editor.get("deleted_rows", [])]
+    posicoes = [int(p) for p in estado_editor.get("edited_rows", {}) if int(p) in edited_df.index]
+    editadas = edited_df.loc[posicoes]
+    editadas.index = rotulos[posicoes]
+    novas = edited_df[edited_df.index >= len(rotulos)] if estado_editor.get("added_rows") else edited_df.iloc[:0]
+    return {"editadas": editadas, "novas": novas, "removidas": removidas}
+
 # --- Lógica da Página PCM ---
 
 def show_pcm_page_1():
@@ -158,12 +225,14 @@ def show_pcm_page_1():
     st.title("PAINEL DO ADMINISTRADOR - CONTROLE DE NOTAS ⚙️📝")
     st.sidebar.success("Logado como: Administrador!")
     add_logout_button()
+    mostrar_status(service, SHEET_NAME)
+    mostrar_painel_medicoes(ADM_USERNAME)
 
     if st.button("🔄 Recarregar Dados da Planilha"):
-        get_tabela_sheets.clear()
+        verificar_alteracoes(service, SHEET_NAME, forcar=True) # Só recarrega se a planilha mudou
         st.rerun()
 
-    df_original = get_tabela_sheets(service)
+    df_original = get_tabela_sheets(service, SHEET_NAME)
 
     if df_original is None:
         st.error("Não foi possível carregar os dados.")
@@ -171,50 +240,101 @@ def show_pcm_page_1():
 
     st.subheader("Visão Geral - Todas as Notas")
 
-    # O ADM vê e edita o DataFrame COMPLETO
-    edited_df = st.data_editor(
-        df_original, # Mostra o DF original completo
-        disabled=COLUNAS_DESABILITADAS, # Permite editar (ou não)
-        num_rows="dynamic",
-        use_container_width=True,
-        key="editor_adm", # Chave única para o editor do ADM
-        column_config={
-            COLUNA_ASSINATURA: st.column_config.CheckboxColumn("Assinar?", default=False),
-            COLUNA_DEVOLUCAO: st.column_config.CheckboxColumn("Assinar?", default=False),
-            "VALOR": st.column_config.NumberColumn("Valor (R$)", format="%.2f"),
-            "DT VENC": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
-            "ENTREGA GESTOR": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
-            COLUNA_GESTOR_RESP: st.column_config.SelectboxColumn( # Ou TextColumn
-                "Gestor",
-                options=df_original[COLUNA_GESTOR_RESP].unique().tolist(), # Pega gestores existentes
-                required=True, # Garante que o ADM preencha
+    pendentes = _pendentes()
+    versao = versao_aba(SHEET_NAME)
+    if pendentes["versao"] is not None and pendentes["versao"] != versao:
+        # A página no editor ainda é da versão anterior: entra no buffer antes de remapear
+        _guardar_pagina()
+        descartadas = _remapear_pendentes(pendentes, df_original)
+        if descartadas:
+            st.warning(
+                f"A planilha mudou: {descartadas} linhas com alterações pendentes não foram encontradas "
+                "pela NF e as alterações delas foram descartadas."
             )
-        }
+    pendentes["versao"] = versao
+
+    # Filtro, ordem e paginação feitos no servidor sobre os dados em cache
+    gestores = sorted(g for g in df_original[COLUNA_GESTOR_RESP].dropna().unique().tolist() if g)
+    f1, f2, f3, f4 = st.columns([3, 2, 2, 1])
+    busca = f1.text_input("Buscar (NF ou fornecedor)", key="adm_busca", on_change=_mudou_filtro)
+    gestor = f2.selectbox("Gestor", (TODOS_GESTORES, *gestores), key="adm_gestor", on_change=_mudou_filtro)
+    coluna = f3.selectbox("Ordenar por", (ORDEM_PLANILHA, *df_original.columns), key="adm_ordem", on_change=_mudou_filtro)
+    crescente = f4.toggle("Crescente", value=True, key="adm_crescente", on_change=_mudou_filtro)
+
+    rotulos = _rotulos_visao(df_original, pendentes["removidas"], busca, gestor, coluna, crescente)
+
+    p1, p2 = st.columns([1, 3])
+    tamanho = p1.selectbox("Linhas por página", TAMANHOS_PAGINA, key="adm_tamanho", on_change=_mudou_filtro)
+    total_paginas = max(1, -(-len(rotulos) // tamanho))
+    if st.session_state.get("adm_pagina_num", 1) > total_paginas:
+        st.session_state["adm_pagina_num"] = total_paginas
+    pagina_num = p2.number_input(
+        f"Página (de {total_paginas}, {len(rotulos)} linhas)", min_value=1, max_value=total_paginas,
+        key="adm_pagina_num", on_change=_guardar_pagina,
     )
 
-    if st.button("Salvar Alterações", type="primary"):
-        try:
-            # Para o ADM, o edited_df É o novo estado da planilha.
-            # A lógica de GESTORASSINATURA ainda pode ser útil.
-            indices_comuns = df_original.index.intersection(edited_df.index)
-            df_original_comum = df_original.loc[indices_comuns]
-            edited_comum = edited_df.loc[indices_comuns]
+    rotulos_pagina = rotulos[(pagina_num - 1) * tamanho: pagina_num * tamanho]
+    pagina = _aplicar_pendentes(df_original.loc[rotulos_pagina], pendentes["editadas"])
 
-            mudancas_mask = (edited_comum[COLUNA_ASSINATURA] == True) & \
-                            (df_original_comum[COLUNA_ASSINATURA] == False)
+    chave_editor = f"editor_adm_{st.session_state.get(CHAVE_GERACAO, 0)}" # Um editor por página visitada
+    with medir("render.editor", aba=SHEET_NAME, linhas=len(pagina)):
+        edited_df = st.data_editor(
+            pagina.reset_index(drop=True), # Só a página atual vai para o navegador
+            disabled=COLUNAS_DESABILITADAS, # Permite editar (ou não)
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            key=chave_editor,
+            column_config={
+                COLUNA_ASSINATURA: st.column_config.CheckboxColumn("Assinar?", default=False),
+                COLUNA_DEVOLUCAO: st.column_config.CheckboxColumn("Assinar?", default=False),
+                "VALOR": st.column_config.NumberColumn("Valor (R$)", format="%.2f", step=0.01), # Decimal de 2 casas
+                "DT VENC": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
+                "ENTREGA GESTOR": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
+                COLUNA_GESTOR_RESP: st.column_config.SelectboxColumn( # Ou TextColumn
+                    "Gestor",
+                    options=gestores, # Pega gestores existentes
+                    required=True, # Garante que o ADM preencha
+                )
+            }
+        )
+    alteracoes_pagina = _alteracoes_pagina(rotulos_pagina, edited_df, st.session_state.get(chave_editor))
+    alteracoes_pagina["chaves"] = _chaves(df_original, alteracoes_pagina["editadas"].index.union(alteracoes_pagina["removidas"]))
+    st.session_state[CHAVE_PAGINA] = alteracoes_pagina
+
+    n_editadas = 0 if pendentes["editadas"] is None else len(pendentes["editadas"])
+    n_novas = sum(len(n) for n in pendentes["novas"])
+    if n_editadas or n_novas or pendentes["removidas"]:
+        st.caption(
+            f"Pendentes de outras páginas: {n_editadas} linhas editadas, "
+            f"{n_novas} linhas novas, {len(pendentes['removidas'])} linhas removidas."
+        )
+        st.button("Descartar alterações pendentes", on_click=_descartar_pendentes)
 
-            indices_para_atualizar = indices_comuns[mudancas_mask]
+    if st.button("Salvar Alterações", type="primary"):
+        try:
+            # O registro de alterações do editor (todas as páginas) é o que vai para a planilha
+            _guardar_pagina()
+            editadas = pendentes["editadas"] if pendentes["editadas"] is not None else df_original.iloc[:0]
+            editadas = editadas.copy() # Só as linhas editadas: o buffer de pendentes não é alterado
+            novas = pd.concat(pendentes["novas"], ignore_index=True) if pendentes["novas"] else df_original.iloc[:0]
+
+            # GESTORASSINATURA recebe o horário nas linhas marcadas em 'Assinar?' agora
+            mudancas_mask = (editadas[COLUNA_ASSINATURA] == True) & \
+                            (df_original.loc[editadas.index, COLUNA_ASSINATURA] == False)
+            indices_para_atualizar = editadas.index[mudancas_mask.to_numpy()]
             now_str = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            edited_df.loc[indices_para_atualizar, COLUNA_GESTOR_ASSINATURA] = now_str
+            editadas.loc[indices_para_atualizar, COLUNA_GESTOR_ASSINATURA] = now_str
 
-
-            if edited_df[COLUNA_GESTOR_RESP].isnull().any() or (edited_df[COLUNA_GESTOR_RESP] == '').any():
+            tocadas = _juntar(editadas, novas)
+            if tocadas[COLUNA_GESTOR_RESP].isnull().any() or (tocadas[COLUNA_GESTOR_RESP] == '').any():
                 st.error("ERRO: Existem linhas sem 'GESTOR_RESP' definido. Preencha antes de salvar.")
             else:
-                if update_tabela_sheets(service, edited_df):
+                alteracoes = {"editadas": editadas, "novas": novas, "removidas": pendentes["removidas"]}
+                if update_tabela_sheets(service, df_original, alteracoes):
+                    _descartar_pendentes()
                     st.success("As alterações foram salvas com sucesso!")
                     st.balloons()
-                    get_tabela_sheets.clear()
                     st.rerun()
                 else:
                     st.error("Falha ao salvar as alterações.")
@@ -234,10 +354,10 @@ def show_pcm_page_2():
     #add_logout_button() # Adiciona botão de sair na sidebar
 
     if st.button("🔄 Recarregar Dados da Planilha!"):
-        get_tabela_sheets.clear()
+        verificar_alteracoes(service, SHEET_NAME, forcar=True) # Só recarrega se a planilha mudou
         st.rerun()
 
-    df_original = get_tabela_sheets(service)
+    df_original = get_tabela_sheets(service, SHEET_NAME)
 
     if df_original is None:
         st.error("Não foi possível carregar os dados.")
@@ -245,35 +365,38 @@ def show_pcm_page_2():
 
     # Filtra pelo usuário logado AQUI
     if COLUNA_GESTOR_RESP in df_original.columns:
-        df_filtrado_usuario = df_original.copy()
-
-        edited_df = st.data_editor(
-            df_filtrado_usuario, # Usa o DF filtrado pelo usuário
-            disabled=COLUNAS_DESABILITADAS,
-            use_container_width=True,
-            column_config={
-                COLUNA_ASSINATURA: st.column_config.CheckboxColumn("Assinar?", default=False),
-                COLUNA_DEVOLUCAO: st.column_config.CheckboxColumn("Assinar?", default=False),
-                "DEVOLUCAO":st.column_config.CheckboxColumn("Devolucão?", default=False),
-                "VALOR": st.column_config.NumberColumn("Valor (R$)", format="%.2f"),
-                "DT VENC": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
-                "DATA DEVOLUCAO": st.column_config.DateColumn("Data Devolução", format="DD/MM/YYYY"),
-            }
-        )
+        df_filtrado_usuario = df_original.copy(deep=False)
+
+        with medir("render.editor", aba=SHEET_NAME, linhas=len(df_filtrado_usuario)):
+            edited_df = st.data_editor(
+                df_filtrado_usuario, # Usa o DF filtrado pelo usuário
+                disabled=COLUNAS_DESABILITADAS,
+                use_container_width=True,
+                key="editor_devolucao",
+                column_config={
+                    COLUNA_ASSINATURA: st.column_config.CheckboxColumn("Assinar?", default=False),
+                    COLUNA_DEVOLUCAO: st.column_config.CheckboxColumn("Assinar?", default=False),
+                    "DEVOLUCAO":st.column_config.CheckboxColumn("Devolucão?", default=False),
+                    "VALOR": st.column_config.NumberColumn("Valor (R$)", format="%.2f", step=0.01), # Decimal de 2 casas
+                    "DT VENC": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
+                    "DATA DEVOLUCAO": st.column_config.DateColumn("Data Devolução", format="DD/MM/YYYY"),
+                }
+            )
 
         if st.button("Salvar Alterações!", type="primary"):
             try:
 
-                mudancas = edited_df[COLUNA_DEVOLUCAO] & ~df_filtrado_usuario.loc[edited_df.index, COLUNA_DEVOLUCAO]
-                now_str = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-                edited_df.loc[mudancas, "DATA DEVOLUCAO"] = now_str
-                edited_df.loc[mudancas & edited_df["DATA DEVOLUCAO"].isna(), "DATA DEVOLUCAO"] = now_str
-                df_original.update(edited_df)
+                # Só as linhas que o editor registrou como editadas entram no salvamento
+                alteracoes = _alteracoes_pagina(
+                    df_filtrado_usuario.index, edited_df.reset_index(drop=True), st.session_state.get("editor_devolucao"),
+                )
+                editadas = alteracoes["editadas"]
+                mudancas = editadas[COLUNA_DEVOLUCAO].astype(bool) & ~df_original.loc[editadas.index, COLUNA_DEVOLUCAO]
+                editadas.loc[mudancas.to_numpy(), "DATA DEVOLUCAO"] = pd.Timestamp(datetime.now())
                 
-                if update_tabela_sheets(service, df_original): # Salva o DF *COMPLETO*
+                if update_tabela_sheets(service, df_original, alteracoes): # Envia só as diferenças
                     st.success("As alterações foram salvas com sucesso!")
                     st.balloons()
-                    get_tabela_sheets.clear()
                     st.rerun()
                 else:
                     st.error("Falha ao salvar as alterações.")
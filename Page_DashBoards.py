@@ -1,15 +1,18 @@
 # Page_DashBoards.py
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-import os.path
 import plotly.express as px
 import plotly.graph_objects as go
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from sheets import (
+    get_sheets_service, get_indice_gestores, verificar_alteracoes,
+    ABA_NOTAS, COLUNA_GESTOR_ASSINATURA,
+)
+from prefetch import mostrar_status
+from agregados import get_agregados, FAIXAS_ATRASO
+from analises import get_analises, FAIXAS_ENVELHECIMENTO
+from arquivamento import data_resolucao, ler_arquivo, meses_arquivados
+from medicao import medir, mostrar_painel_medicoes
 
 
 
@@ -46,107 +49,83 @@ layout=go.Layout(
 ADM_USERNAME = "admin" # <--- MUDE AQUI SE O SEU ADM TIVER OUTRO NOME
 
 # --- Configurações ---
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-SPREADSHEET_ID = "1Lpjc8Zb9_P8vZjt8pjjft66LpGqTE4g7uUy0hlOnUO8"
-SHEET_NAME = "Notas"
-RANGE_NAME = f"{SHEET_NAME}"
-COLUNA_GESTOR_RESP = 'GESTOR_RESP'
-COLUNA_ASSINATURA = 'ASSINATURA'
-COLUNA_GESTOR_ASSINATURA = 'GESTORASSINATURA'
-
-
-@st.cache_resource # Cacheia o objeto 'service'
-def get_sheets_service():
-    """Autentica com a API do Google Sheets usando st.secrets e retorna o objeto 'service'."""
-    creds = None
-    if "google_token" not in st.secrets:
-        st.error("Configuração '[google_token]' não encontrada em st.secrets.")
-        return None
-    try:
-        token_info = st.secrets["google_token"].to_dict()
-        creds = Credentials.from_authorized_user_info(token_info, SCOPES)
-    except Exception as e:
-        st.error(f"Erro ao carregar credenciais: {e}")
-        return None
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            #st.info("Token expirado. Tentando atualizar...")
-            try:
-                creds.refresh(Request())
-                st.success("Token atualizado!")
-            except Exception as e:
-                st.error(f"Erro ao atualizar o token: {e}")
-                return None
-        else:
-            st.error("Credenciais inválidas.")
-            return None
-    try:
-        service = build("sheets", "v4", credentials=creds)
-        return service
-    except Exception as e:
-        st.error(f"Erro ao construir serviço: {e}")
-        return None
-
-@st.cache_data(ttl=300) # Cacheia por 5 minutos
-def get_tabela_sheets(_service):
-    """Busca os dados da planilha e retorna um DataFrame Pandas."""
-    if not _service:
-        st.error("Serviço Google Sheets não disponível.")
-        return None
-    try:
-        sheet = _service.spreadsheets()
-        result = (sheet.values().get(spreadsheetId=SPREADSHEET_ID, range=SHEET_NAME).execute())
-        values = result.get("values", [])
-
-        if not values: # Se não houver nada, retorna um DF vazio com colunas
-            st.warning(f"Planilha '{SHEET_NAME}' vazia ou não encontrada. Criando DF vazio.")
-            # Defina as colunas esperadas aqui, caso a planilha esteja realmente vazia
-            expected_cols = ["NF", "FORNECEDOR", "VALOR", "DT VENC", "GESTOR_RESP", "ASSINATURA", "GESTORASSINATURA"]
-            return pd.DataFrame(columns=expected_cols)
-
-        header = values[0]
-        data = values[1:] if len(values) > 1 else []
-        df = pd.DataFrame(data, columns=header)
-
-        # --- Garante Colunas e Conversão de Tipos ---
-        if COLUNA_ASSINATURA not in df.columns: df[COLUNA_ASSINATURA] = 'FALSE'
-        if COLUNA_GESTOR_ASSINATURA not in df.columns: df[COLUNA_GESTOR_ASSINATURA] = ''
-        if COLUNA_GESTOR_RESP not in df.columns: df[COLUNA_GESTOR_RESP] = ''
-        
-        df[COLUNA_ASSINATURA] = df[COLUNA_ASSINATURA].astype(str).str.upper()
-        df[COLUNA_ASSINATURA] = df[COLUNA_ASSINATURA].map({'TRUE': True, 'VERDADEIRO': True}).fillna(False).astype(bool)
-
-        if 'VALOR' in df.columns:
-            df['VALOR'] = pd.to_numeric(df['VALOR'].astype(str).str.replace(',', '.', regex=False), errors='coerce').fillna(0)
-        if 'DT VENC' in df.columns:
-            df['DT VENC'] = pd.to_datetime(df['DT VENC'], errors='coerce', dayfirst=True)
-        if 'ENTREGA GESTOR' in df.columns:
-            df['ENTREGA GESTOR'] = pd.to_datetime(df['ENTREGA GESTOR'], errors='coerce', dayfirst=True)
-
-        return df
-    except Exception as err:
-        st.error(f"Erro ao buscar dados: {err}")
+SHEET_NAME = ABA_NOTAS
+LINHAS_PAGINA_ARQUIVO = 100 # Notas arquivadas por página no histórico
 
-def show_pcm_page():
-    """Mostra o conteúdo da página de DashBoard"""
-    service = get_sheets_service()
-    if not service:
-        st.stop()
 
-    if st.button("🔄 Recarregar Dados da Planilha"):
-        get_tabela_sheets.clear()
-        st.rerun()
+@st.cache_resource(max_entries=8) # Figuras prontas por (aba, versão dos dados); só são montadas de novo quando os dados mudam
+def _montar_figuras(_agregados, sheet_name, versao_dados):
+    """Monta os gráficos do painel a partir dos agregados da versão 'versao_dados'."""
+    pendentes = _agregados["pendentes"]
+    df_fig1 = pendentes[pendentes > 0].sort_values(ascending=False).reset_index()
+    df_fig1.columns = ["Gestor","Qtd"]
     
-    df_original = get_tabela_sheets(service)
+    fig1 = px.bar(data_frame=df_fig1,x="Gestor",y='Qtd',title="Notas não assinadas",template=template_3
+                ,color_discrete_sequence=["#164F2F"], text_auto=True)
 
-    if df_original is None:
-        st.error("Não foi possível carregar os dados.")
-        st.stop()
-    
-    st.title("DASHBORDS 💹")
-    df_sem_data = df_original[df_original['GESTORASSINATURA'].isnull() | (df_original['GESTORASSINATURA'] == '') | (df_original['GESTORASSINATURA'] == pd.NA)]
-    
+    fig2 = px.pie(data_frame=df_fig1, values='Qtd',names="Gestor",color_discrete_sequence=["#164F2F","#20864C","#186439","#31CA73"],title="Notas não assinadas")
+
+    df_fig3 = _agregados[[rotulo for rotulo, _, _ in FAIXAS_ATRASO]].sum().reset_index()
+    df_fig3.columns = ["Atraso","Qtd"]
+
+    fig3 = px.bar(data_frame=df_fig3,x="Atraso",y='Qtd',title="Notas vencidas sem assinatura",template=template_3
+                ,color_discrete_sequence=["#164F2F"], text_auto=True)
+    return fig1, fig2, fig3
+
+
+def _rotulo_semana(semanas):
+    return [s.start_time.strftime("%d/%m") for s in semanas]
+
+
+@st.cache_resource(max_entries=8) # Como os gráficos acima: montados de novo só quando os dados mudam
+def _montar_figuras_analises(_analises, sheet_name, versao_dados):
+    """Monta os gráficos de envelhecimento, latência e valor em risco das análises semanais."""
+    envelhecimento = _analises["envelhecimento"]
+    df_fig4 = envelhecimento.assign(Semana=_rotulo_semana(envelhecimento.index)).melt(
+        id_vars="Semana", value_vars=list(FAIXAS_ENVELHECIMENTO), var_name="Faixa", value_name="Qtd")
+    fig4 = px.bar(data_frame=df_fig4, x="Semana", y="Qtd", color="Faixa", title="Pendentes no fim de cada semana (atraso)",
+                  template=template_3, color_discrete_sequence=["#31CA73", "#20864C", "#186439", "#164F2F", "#0B2918"])
+
+    latencia = _analises["latencia_semana"]
+    df_fig5 = pd.DataFrame({"Semana": _rotulo_semana(latencia.index), "Mediana": latencia["mediana"].round(1),
+                            "Média": latencia["media"].round(1)})
+    fig5 = px.line(data_frame=df_fig5, x="Semana", y=["Mediana", "Média"], markers=True, template=template_3,
+                   title="Dias da entrega até a assinatura", color_discrete_sequence=["#164F2F", "#31CA73"])
+
+    risco = _analises["risco"]
+    df_fig6 = pd.DataFrame({"Semana": _rotulo_semana(risco.index), "Valor em risco": risco["em_risco"],
+                            "Situação": ["Em aberto" if aberta else "Encerrada" for aberta in risco["aberta"]]})
+    fig6 = px.bar(data_frame=df_fig6, x="Semana", y="Valor em risco", color="Situação", template=template_3,
+                  title="Valor (R$) vencendo sem assinatura, por semana do vencimento",
+                  color_discrete_sequence=["#164F2F", "#31CA73"])
+    return fig4, fig5, fig6
+
+
+def mostrar_analises(analises, versao_dados):
+    """Envelhecimento das pendentes, latência de assinatura por gestor e valor em risco por semana."""
+    st.markdown("### Envelhecimento, latência e valor em risco (por semana)")
+    with medir("render.analises", aba=SHEET_NAME):
+        fig4, fig5, fig6 = _montar_figuras_analises(analises, SHEET_NAME, versao_dados)
+        st.plotly_chart(fig4)
+
+        pg1, pg2 = st.columns(2)
+        pg1.plotly_chart(fig5)
+        # Média do período por gestor, ponderada pela quantidade de assinaturas de cada semana
+        por_gestor = analises["latencia_gestor"].assign(dias=lambda t: t["qtd"] * t["media"]).groupby(level="gestor")[["qtd", "dias"]].sum()
+        por_gestor = pd.DataFrame({
+            "Assinaturas": por_gestor["qtd"].astype(int),
+            "Média de dias": (por_gestor["dias"] / por_gestor["qtd"]).round(1),
+        }).sort_values("Média de dias", ascending=False)
+        pg2.markdown("**Latência por gestor** (semanas do gráfico)")
+        pg2.dataframe(por_gestor, use_container_width=True)
+
+        st.plotly_chart(fig6)
+
+
+@st.fragment # Trocar o gestor nas tabelas reexecuta só este trecho, sem refazer os gráficos
+def mostrar_tabelas(df_original, indice_gestores):
+    """Mostra as tabelas de notas filtradas por gestor."""
+    gestores = ("GERAL", *sorted(g for g in indice_gestores if g))
 
     with st.expander("Tabela de Dados"):
         tab1, tab2 = st.tabs(["SEM ASSINATURA", "GERAL"])
@@ -154,36 +133,133 @@ def show_pcm_page():
         with tab1:
             option = st.selectbox(
                 "SELECIONE O GESTOR",
-                ("GERAL","KATIA","DANILO", "HEBERTON","DANILO"))
+                gestores)
             if option == 'GERAL':
-                df_sem_data
+                df_original[df_original[COLUNA_GESTOR_ASSINATURA].isna()] # GESTORASSINATURA já vem como data (NaT = vazio)
             else:
-                df_sem_data[df_sem_data['GESTOR_RESP']==option]
+                df_gestor = df_original.iloc[indice_gestores.get(option, [])]
+                df_gestor[df_gestor[COLUNA_GESTOR_ASSINATURA].isna()]
 
         with tab2:
             option1 = st.selectbox(
                 "SELECIONE O GESTOR:",
-                ("GERAL","KATIA","DANILO", "HEBERTON","DANILO"))
+                gestores)
             if option1 == 'GERAL':
                 df_original
             else:
-                df_original[df_original['GESTOR_RESP']==option1]
+                df_original.iloc[indice_gestores.get(option1, [])]
+
+
+@st.fragment # Mexer no período reexecuta só o histórico
+def mostrar_historico(df_original):
+    """
+    Notas assinadas por mês, somando as da planilha com as arquivadas (arquivamento.py).
+    O arquivo só é lido quando o histórico é aberto, e só nos meses do período escolhido.
+    """
+    meses_arquivo = meses_arquivados(SHEET_NAME)
+    if not meses_arquivo:
+        return
+    if not st.toggle("📚 Consultar histórico (inclui notas arquivadas)"):
+        return
+
+    assinatura_quente = data_resolucao(df_original, SHEET_NAME)
+    meses_quentes = assinatura_quente.dropna().dt.strftime("%Y-%m").unique().tolist()
+    meses = sorted(set(meses_arquivo) | set(meses_quentes))
+    inicio, fim = st.select_slider("Período (mês da assinatura)", options=meses, value=(meses_arquivo[0], meses[-1]))
+
+    arquivadas = ler_arquivo(SHEET_NAME, inicio, fim)
+    partes = []
+    for origem, df in (("Planilha", df_original), ("Arquivo", arquivadas)):
+        if df is None or df.empty:
+            continue
+        mes = data_resolucao(df, SHEET_NAME).dt.strftime("%Y-%m")
+        no_periodo = ((mes >= inicio) & (mes <= fim)).to_numpy()
+        partes.append(pd.DataFrame({
+            "Mês": mes[no_periodo].to_numpy(),
+            "Valor": df["VALOR"][no_periodo].astype(float).to_numpy(),
+            "Origem": origem,
+        }))
+    if not partes:
+        st.caption("Nenhuma nota assinada no período.")
+        return
+    historico = pd.concat(partes, ignore_index=True)
+
+    h1, h2, h3 = st.columns(3)
+    h1.metric("Notas assinadas no período", len(historico))
+    h2.metric("Valor assinado (R$)", f"{historico['Valor'].sum():,.2f}")
+    h3.metric("Vindas do arquivo", int((historico["Origem"] == "Arquivo").sum()))
+
+    por_mes = historico.groupby(["Mês", "Origem"]).size().reset_index(name="Qtd")
+    st.plotly_chart(px.bar(data_frame=por_mes, x="Mês", y="Qtd", color="Origem", title="Notas assinadas por mês",
+                           template=template_3, color_discrete_sequence=["#164F2F", "#31CA73"]))
+    if arquivadas is not None:
+        with st.expander("Notas arquivadas do período"):
+            # Só uma página vai para o navegador: o período pode ter meses de notas arquivadas
+            total_paginas = max(1, -(-len(arquivadas) // LINHAS_PAGINA_ARQUIVO))
+            if st.session_state.get("historico_pagina", 1) > total_paginas:
+                st.session_state["historico_pagina"] = total_paginas
+            pagina = st.number_input(
+                f"Página (de {total_paginas}, {len(arquivadas)} notas)", min_value=1, max_value=total_paginas,
+                key="historico_pagina",
+            )
+            primeira = (pagina - 1) * LINHAS_PAGINA_ARQUIVO
+            st.dataframe(arquivadas.iloc[primeira:primeira + LINHAS_PAGINA_ARQUIVO], hide_index=True, use_container_width=True)
 
 
-    st.markdown("### :green[Novo Gráficos à caminho  🛺]")
+def show_pcm_page():
+    """Mostra o conteúdo da página de DashBoard"""
+    service = get_sheets_service()
+    if not service:
+        st.stop()
+    mostrar_status(service, SHEET_NAME)
+    mostrar_painel_medicoes(ADM_USERNAME)
 
-    df_fig1 = df_sem_data.iloc[:,4].value_counts().reset_index()
-    df_fig1.columns = ["Gestor","Qtd"]
+    if st.button("🔄 Recarregar Dados da Planilha"):
+        verificar_alteracoes(service, SHEET_NAME, forcar=True) # Só recarrega se a planilha mudou
+        st.rerun()
     
-    fig1 = px.bar(data_frame=df_fig1,x="Gestor",y='Qtd',title="Notas não assinadas",template=template_3
-                ,color_discrete_sequence=["#164F2F"], text_auto=True)
+    # DataFrame da aba + índice GESTOR_RESP -> posições das linhas
+    df_original, indice_gestores = get_indice_gestores(service, SHEET_NAME)
 
-    fig2 = px.pie(data_frame=df_fig1, values='Qtd',names="Gestor",color_discrete_sequence=["#164F2F","#20864C","#186439","#31CA73"],title="Notas não assinadas")
+    if df_original is None:
+        st.error("Não foi possível carregar os dados.")
+        st.stop()
+    
+    # Contagens e somas por gestor (calculadas uma vez por versão da aba)
+    agregados, versao_dados = get_agregados(service, SHEET_NAME)
+    if agregados is None:
+        st.error("Não foi possível carregar os dados.")
+        st.stop()
+
+    st.title("DASHBORDS 💹")
+    
+    mostrar_tabelas(df_original, indice_gestores)
+
+
+    st.markdown("### :green[Novo Gráficos à caminho  🛺]")
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Notas sem assinatura", int(agregados["pendentes"].sum()))
+    m2.metric("Notas assinadas", int(agregados["assinadas"].sum()))
+    m3.metric("Valor pendente (R$)", f"{float(agregados['valor_pendente'].sum()):,.2f}")
+    m4.metric("Vencidas sem assinatura", int(agregados[[rotulo for rotulo, _, _ in FAIXAS_ATRASO]].sum().sum()))
+
+    with medir("render.graficos", aba=SHEET_NAME):
+        fig1, fig2, fig3 = _montar_figuras(agregados, SHEET_NAME, versao_dados)
+
+        pg1, pg2 = st.columns(2)
+
+        pg1.plotly_chart(fig1)
+        pg2.plotly_chart(fig2)  
+
+        st.plotly_chart(fig3)
 
-    pg1, pg2 = st.columns(2)
+    # Semanas encerradas vêm do cache; só a semana atual e as próximas são recalculadas
+    analises, versao_analises = get_analises(service, SHEET_NAME)
+    if analises is not None:
+        mostrar_analises(analises, versao_analises)
 
-    pg1.plotly_chart(fig1)
-    pg2.plotly_chart(fig2)  
+    mostrar_historico(df_original)
 
 
 show_pcm_page()
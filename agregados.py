@@ -0,0 +1,99 @@
+# agregados.py
+"""
+Agregados do painel por GESTOR_RESP: notas pendentes/assinadas, soma de VALOR
+e pendentes vencidas por faixa de atraso (DT VENC).
+
+A tabela de agregados (uma linha por gestor, poucas centenas de bytes) é
+calculada uma vez por versão da aba e por dia, sempre a partir do DataFrame
+daquela versão. Os agregados não são levados de uma versão para a outra só com
+as linhas que a aplicação gravou: a versão nova é baixada de novo e pode trazer
+alterações feitas direto na planilha, então depois de uma escrita eles são
+recalculados uma vez.
+"""
+import threading
+from datetime import date
+
+import pandas as pd
+import streamlit as st
+
+from sheets import (
+    get_tabela_versao, versao_atual,
+    SPREADSHEET_ID, COLUNA_GESTOR_RESP, COLUNA_GESTOR_ASSINATURA,
+)
+
+# (rótulo, dias de atraso mínimo, máximo ou None)
+FAIXAS_ATRASO = (
+    ("1-30 dias", 1, 30),
+    ("31-60 dias", 31, 60),
+    ("61-90 dias", 61, 90),
+    ("+90 dias", 91, None),
+)
+
+
+def _preenchida(serie):
+    """True nas células com valor (datas válidas ou texto não vazio)."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.notna()
+    return serie.notna() & (serie.astype(str).str.strip() != '')
+
+
+def _datas(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    return pd.to_datetime(serie, errors='coerce', dayfirst=True)
+
+
+def calcular_agregados(df, hoje):
+    """Agrega as linhas de 'df' por GESTOR_RESP (uma linha por gestor, em ordem alfabética)."""
+    assinada = _preenchida(df[COLUNA_GESTOR_ASSINATURA]).to_numpy()
+    pendente = ~assinada
+    valor = df["VALOR"] if "VALOR" in df.columns else pd.Series(0, index=df.index)
+
+    colunas = {
+        "pendentes": pendente,
+        "assinadas": assinada,
+        "valor_pendente": valor.where(pendente, 0),
+        "valor_assinado": valor.where(assinada, 0),
+    }
+    if "DT VENC" in df.columns:
+        atraso = (hoje - _datas(df["DT VENC"])).dt.days
+        for rotulo, minimo, maximo in FAIXAS_ATRASO:
+            na_faixa = atraso >= minimo if maximo is None else atraso.between(minimo, maximo)
+            colunas[rotulo] = pendente & na_faixa.to_numpy()
+
+    base = pd.DataFrame(colunas, index=df.index)
+    gestores = df[COLUNA_GESTOR_RESP].astype(object).rename(COLUNA_GESTOR_RESP)
+    return base.groupby(gestores, sort=True).sum()
+
+
+@st.cache_resource
+def _agregados():
+    """Dicionário (planilha, aba) -> {'versao', 'dia', 'tabela'}, compartilhado por todas as sessões."""
+    return {"lock": threading.Lock(), "itens": {}}
+
+
+def get_agregados(_service, sheet_name, spreadsheet_id=SPREADSHEET_ID, hoje=None):
+    """
+    Retorna (tabela, versao), onde 'tabela' são os agregados da aba, recalculados só quando
+    a versão ou o dia mudam, e 'versao' identifica os dados usados (ex.: chave de cache
+    de gráficos). Retorna (None, None) se a aba não puder ser carregada.
+    """
+    hoje = pd.Timestamp(hoje or date.today()).normalize()
+    chave = (spreadsheet_id, sheet_name)
+    versao = versao_atual(_service, sheet_name, spreadsheet_id)
+
+    estado = _agregados()
+    with estado["lock"]:
+        item = estado["itens"].get(chave)
+        if item is not None and item["versao"] == versao and item["dia"] == hoje:
+            return item["tabela"], (item["versao"], item["dia"])
+
+    # A versão pode ter mudado enquanto a aba carregava: vale a do DataFrame usado
+    df, versao = get_tabela_versao(_service, sheet_name, spreadsheet_id)
+    if df is None:
+        return None, None
+    tabela = calcular_agregados(df, hoje)
+    with estado["lock"]:
+        estado["itens"][chave] = {"versao": versao, "dia": hoje, "tabela": tabela}
+    return tabela, (versao, hoje)
+
@@ -0,0 +1,225 @@
+# analises.py
+"""
+Análises do painel por janelas semanais (segunda a domingo):
+
+  envelhecimento   notas pendentes no fim de cada semana, por faixa de atraso em
+                   relação ao DT VENC (a vencer, 1-30, 31-60, 61-90, +90 dias)
+  latência         dias entre ENTREGA GESTOR e GESTORASSINATURA das notas assinadas
+                   em cada semana, por GESTOR_RESP
+  valor em risco   VALOR das notas que vencem em cada semana e não estavam assinadas
+                   no fim dela (na semana atual e nas próximas: as pendentes hoje)
+
+O resultado de uma semana encerrada não muda quando alguém assina uma nota hoje
+(a assinatura cai na semana atual). Por isso as semanas encerradas são calculadas
+uma vez e guardadas, e a cada versão nova da aba só a semana atual e as que ainda
+vão vencer são recalculadas. As encerradas só são refeitas se o histórico mudar
+(edição direta na planilha), o que uma impressão digital das linhas e colunas
+que elas usam detecta sem recalcular nada. A impressão é feita pela NF e não
+depende da ordem das linhas: notas novas no fim da aba ou linhas deslocadas
+não a alteram.
+
+As SEMANAS_ENCERRADAS ficam dentro da camada quente: o arquivamento só tira da
+planilha notas resolvidas há mais de arquivamento.IDADE_ARQUIVAMENTO dias.
+"""
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from agregados import FAIXAS_ATRASO
+from medicao import medir
+from sheets import (
+    get_tabela_versao, versao_atual,
+    SPREADSHEET_ID, COLUNA_NF, COLUNA_GESTOR_RESP, COLUNA_GESTOR_ASSINATURA,
+)
+
+SEMANAS_ENCERRADAS = 12
+SEMANAS_A_VENCER = 4 # Semanas futuras no valor em risco
+FREQUENCIA = "W-SUN" # Semanas de segunda a domingo
+COLUNA_ENTREGA = "ENTREGA GESTOR"
+FAIXA_A_VENCER = "A vencer"
+FAIXAS_ENVELHECIMENTO = (FAIXA_A_VENCER,) + tuple(rotulo for rotulo, _, _ in FAIXAS_ATRASO)
+_LIMITES_FAIXAS = [-np.inf, 0] + [maximo for _, _, maximo in FAIXAS_ATRASO if maximo is not None] + [np.inf]
+
+
+def _data(df, coluna):
+    if coluna not in df.columns:
+        return pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    serie = df[coluna]
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    return pd.to_datetime(serie.astype(object), errors="coerce", dayfirst=True)
+
+
+def colunas_analise(df):
+    """Colunas tipadas usadas pelas análises (datas em datetime64, VALOR em float)."""
+    return pd.DataFrame({
+        "entrega": _data(df, COLUNA_ENTREGA),
+        "vencimento": _data(df, "DT VENC"),
+        "assinatura": _data(df, COLUNA_GESTOR_ASSINATURA),
+        # Pelo Arrow: bem mais rápido que converter os decimais um a um
+        "valor": df["VALOR"].astype("float64[pyarrow]").to_numpy(dtype=float, na_value=0.0) if "VALOR" in df.columns else 0.0,
+        "gestor": df[COLUNA_GESTOR_RESP].astype(object),
+        "nf": df[COLUNA_NF].astype(object) if COLUNA_NF in df.columns else "",
+    }, index=df.index)
+
+
+# --- Cálculo por janela ---
+
+def envelhecimento(c, corte):
+    """Pendentes no instante 'corte' (meia-noite depois do dia de referência) por faixa de atraso."""
+    entrada = c["entrega"].fillna(c["vencimento"]) # Sem ENTREGA GESTOR: entrou na fila no vencimento
+    pendente = ((entrada < corte) & (c["assinatura"].isna() | (c["assinatura"] >= corte))).to_numpy()
+    atraso = ((corte - pd.Timedelta(days=1)) - c["vencimento"][pendente]).dt.days
+    faixas = pd.cut(atraso, _LIMITES_FAIXAS, labels=FAIXAS_ENVELHECIMENTO)
+    return faixas.value_counts().reindex(FAIXAS_ENVELHECIMENTO, fill_value=0)
+
+
+def latencia(c, semanas):
+    """
+    Dias de ENTREGA GESTOR até GESTORASSINATURA das notas assinadas nas 'semanas':
+    retorna (por semana e gestor, por semana), ambos com qtd, média e mediana.
+    """
+    semana = c["assinatura"].dt.to_period(FREQUENCIA)
+    selecionadas = (semana.isin(semanas) & c["entrega"].notna()).to_numpy()
+    dias = ((c["assinatura"] - c["entrega"])[selecionadas].dt.total_seconds() / 86400).rename("dias")
+    semana = semana[selecionadas].rename("semana")
+    estatisticas = {"qtd": "count", "media": "mean", "mediana": "median"}
+    por_gestor = dias.groupby([semana, c["gestor"][selecionadas].rename("gestor")]).agg(list(estatisticas.values()))
+    por_semana = dias.groupby(semana).agg(list(estatisticas.values()))
+    por_gestor.columns = por_semana.columns = list(estatisticas)
+    return por_gestor, por_semana
+
+
+def valor_em_risco(c, semanas):
+    """VALOR que vence em cada uma das 'semanas' e quanto dele não estava assinado no fim da semana."""
+    semana = c["vencimento"].dt.to_period(FREQUENCIA)
+    selecionadas = semana.isin(semanas).to_numpy()
+    semana = semana[selecionadas].rename("semana")
+    assinatura = c["assinatura"][selecionadas]
+    em_risco = (assinatura.isna() | (assinatura > semana.dt.end_time)).to_numpy()
+    valor = c["valor"][selecionadas]
+    tabela = pd.DataFrame({
+        "vencendo": valor,
+        "em_risco": valor.where(em_risco, 0),
+        "notas_em_risco": em_risco,
+    }).groupby(semana).sum()
+    return tabela.reindex(pd.PeriodIndex(semanas, freq=FREQUENCIA, name="semana"), fill_value=0)
+
+
+def calcular_semanas(c, semanas, corte_atual=None):
+    """
+    Resultados das 'semanas' (PeriodIndex). O envelhecimento de cada semana é o do fim
+    dela; 'corte_atual' limita o da semana que ainda não acabou (meia-noite depois de hoje).
+    """
+    fim = {s: s.end_time.normalize() + pd.Timedelta(days=1) for s in semanas}
+    if corte_atual is not None: # Semanas futuras só entram no valor em risco
+        fim = {s: min(corte, corte_atual) for s, corte in fim.items() if s.start_time < corte_atual}
+    iniciadas = pd.PeriodIndex(list(fim), freq=FREQUENCIA, name="semana")
+    por_gestor, por_semana = latencia(c, iniciadas)
+    faixas = pd.DataFrame([envelhecimento(c, corte) for corte in fim.values()], index=iniciadas,
+                          columns=list(FAIXAS_ENVELHECIMENTO))
+    return {
+        "envelhecimento": faixas,
+        "latencia_gestor": por_gestor,
+        "latencia_semana": por_semana,
+        "risco": valor_em_risco(c, semanas),
+    }
+
+
+def _impressao(c, inicio, inicio_atual):
+    """
+    Impressão digital das linhas e colunas de que dependem as semanas encerradas (de 'inicio'
+    até 'inicio_atual'), pela NF e sem depender da ordem das linhas: notas incluídas depois
+    do período, notas resolvidas antes dele e linhas que só mudaram de posição na planilha
+    não a alteram. Assinaturas feitas a partir de 'inicio_atual' contam como pendentes:
+    assinar hoje também não muda a impressão.
+    """
+    assinatura = c["assinatura"].where(c["assinatura"] < inicio_atual)
+    entrada = c["entrega"].fillna(c["vencimento"])
+
+    def no_periodo(datas):
+        return (datas >= inicio) & (datas < inicio_atual)
+
+    usadas = (
+        ((entrada < inicio_atual) & (assinatura.isna() | (assinatura >= inicio))) # Envelhecimento
+        | no_periodo(assinatura) # Latência
+        | no_periodo(c["vencimento"]) # Valor em risco
+    ).to_numpy()
+    linhas = pd.DataFrame({
+        "nf": c["nf"],
+        "entrega": c["entrega"],
+        "vencimento": c["vencimento"],
+        "assinatura": assinatura,
+        "valor": np.round(np.asarray(c["valor"], dtype=float) * 100).astype(np.int64),
+        "gestor": c["gestor"],
+    })[usadas]
+    hashes = pd.util.hash_pandas_object(linhas, index=False).to_numpy()
+    return len(hashes), int(hashes.sum()) # Soma módulo 2**64: não depende da ordem
+
+
+def _juntar(guardadas, novas, semanas):
+    """Junta os resultados guardados com os novos e mantém só as 'semanas'."""
+    if not guardadas:
+        juntas = novas
+    else:
+        juntas = {painel: pd.concat([guardadas[painel], novas[painel]]) for painel in novas}
+    return {
+        painel: tabela[tabela.index.get_level_values(0).isin(semanas)].sort_index()
+        for painel, tabela in juntas.items()
+    }
+
+
+# --- Cache por semana ---
+
+@st.cache_resource
+def _analises():
+    """Dicionário (planilha, aba) -> semanas encerradas já calculadas e o último resultado."""
+    return {"lock": threading.Lock(), "itens": {}}
+
+
+def get_analises(_service, sheet_name, spreadsheet_id=SPREADSHEET_ID, hoje=None):
+    """
+    Retorna (analises, versao): 'analises' tem as tabelas 'envelhecimento', 'latencia_gestor',
+    'latencia_semana' e 'risco' (índice 'semana'), e a coluna 'aberta' no risco marca as
+    semanas que ainda podem mudar. Retorna (None, None) se a aba não puder ser carregada.
+    """
+    hoje = pd.Timestamp(hoje or date.today()).normalize()
+    atual = hoje.to_period(FREQUENCIA)
+    encerradas = pd.period_range(end=atual - 1, periods=SEMANAS_ENCERRADAS, freq=FREQUENCIA, name="semana")
+    abertas = pd.period_range(start=atual, periods=SEMANAS_A_VENCER + 1, freq=FREQUENCIA, name="semana")
+    chave = (spreadsheet_id, sheet_name)
+    versao = versao_atual(_service, sheet_name, spreadsheet_id)
+
+    estado = _analises()
+    with estado["lock"]:
+        item = estado["itens"].get(chave)
+        if item is not None and item["versao"] == versao and item["dia"] == hoje:
+            return item["resultado"], (versao, hoje)
+
+    # A versão pode ter mudado enquanto a aba carregava: vale a do DataFrame usado
+    df, versao = get_tabela_versao(_service, sheet_name, spreadsheet_id)
+    if df is None:
+        return None, None
+
+    with medir("analises.calcular", aba=sheet_name, linhas=len(df)) as m:
+        c = colunas_analise(df)
+        impressao = _impressao(c, encerradas[0].start_time, atual.start_time)
+        guardadas = item["encerradas"] if item is not None and item["impressao"] == impressao else {}
+        calculadas = guardadas["risco"].index if guardadas else pd.PeriodIndex([], freq=FREQUENCIA)
+        faltando = encerradas.difference(calculadas)
+        if len(faltando):
+            guardadas = _juntar(guardadas, calcular_semanas(c, faltando), encerradas)
+        m["semanas_recalculadas"] = len(faltando) + len(abertas)
+
+        correntes = calcular_semanas(c, abertas, corte_atual=hoje + pd.Timedelta(days=1))
+        resultado = _juntar(guardadas, correntes, encerradas.union(abertas))
+        resultado["risco"]["aberta"] = resultado["risco"].index >= atual
+
+    with estado["lock"]:
+        estado["itens"][chave] = {
+            "versao": versao, "dia": hoje, "impressao": impressao, "encerradas": guardadas, "resultado": resultado,
+        }
+    return resultado, (versao, hoje)
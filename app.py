@@ -16,4 +16,7 @@ test = st.Page("Page_Main.py", title="INICIO", icon="✨")
 
 pg = st.navigation([test,login_page, dash_page, pcm_page])
 
-pg.run()
\ No newline at end of file
+# O cliente da API e o prefetch são iniciados pelas páginas que usam a planilha
+# (get_sheets_service e mostrar_status): a página inicial não carrega o pandas nem
+# as bibliotecas do Google, e não mostra erro de credenciais ausentes.
+pg.run()
@@ -0,0 +1,234 @@
+# arquivamento.py
+"""
+Arquivamento das notas antigas já resolvidas (camada fria).
+
+As abas 'Notas' e 'Devolução' só crescem, e cada leitura, conversão, editor e
+escrita paga por anos de linhas que ninguém mais altera. O arquivamento tira da
+planilha as linhas resolvidas há mais de IDADE_ARQUIVAMENTO dias e as grava em
+arquivos Parquet (zstd) particionados pelo mês em que foram resolvidas:
+
+    <pasta>/<aba>/mes=AAAA-MM/lote-<horário>.parquet
+
+  Notas      assinadas (GESTORASSINATURA) há mais de N dias
+  Devolução  devolvidas (DEVOLUCAO) com DATA DEVOLUCAO há mais de N dias
+
+As páginas continuam lendo só a planilha (a camada quente). O painel lê o
+arquivo apenas quando um período do histórico é escolhido (ler_arquivo), e só
+as partições dos meses pedidos. Com várias réplicas do app, a pasta precisa
+estar num volume compartilhado.
+
+Configuração opcional em secrets.toml:
+
+    [arquivamento]
+    pasta = "/mnt/compartilhado/arquivo_notas"
+    idade_dias = 180
+
+Rode periodicamente (ex.: cron uma vez por dia); --simular só conta as linhas:
+
+    python arquivamento.py [--idade-dias 180] [--simular]
+"""
+import argparse
+import os
+import secrets
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from medicao import medir
+from sheets import (
+    get_tabela_sheets, enviar_operacoes, verificar_alteracoes, ler_coluna_nf,
+    SPREADSHEET_ID, ABA_NOTAS, ABA_DEVOLUCAO, COLUNA_NF, COLUNA_GESTOR_ASSINATURA, COLUNA_DEVOLUCAO,
+)
+
+PASTA_ARQUIVO = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".arquivo")
+IDADE_ARQUIVAMENTO = 180 # Dias desde a assinatura/devolução até a linha sair da planilha
+
+# Aba -> (coluna com a data em que a linha foi resolvida, coluna booleana que também precisa estar marcada)
+REGRAS_ARQUIVAMENTO = {
+    ABA_NOTAS: (COLUNA_GESTOR_ASSINATURA, None),
+    ABA_DEVOLUCAO: ("DATA DEVOLUCAO", COLUNA_DEVOLUCAO),
+}
+
+
+def _config_arquivamento():
+    """(pasta, idade_dias) da seção [arquivamento] de st.secrets, ou os padrões."""
+    config = {}
+    try:
+        if "arquivamento" in st.secrets:
+            config = st.secrets["arquivamento"].to_dict()
+    except Exception: # Sem secrets.toml
+        pass
+    return config.get("pasta", PASTA_ARQUIVO), int(config.get("idade_dias", IDADE_ARQUIVAMENTO))
+
+
+def data_resolucao(df, aba):
+    """Data em que cada linha foi resolvida (assinatura ou devolução); NaT nas pendentes."""
+    coluna = REGRAS_ARQUIVAMENTO[aba][0]
+    if coluna not in df.columns:
+        return pd.Series(pd.NaT, index=df.index)
+    serie = df[coluna]
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    return pd.to_datetime(serie.astype(object), errors="coerce", dayfirst=True) # Devolução guarda texto
+
+
+def selecionar_frias(df, aba, limite):
+    """Máscara das linhas resolvidas antes de 'limite' (as que podem sair da planilha)."""
+    frias = (data_resolucao(df, aba) < limite).to_numpy()
+    coluna_marcada = REGRAS_ARQUIVAMENTO[aba][1]
+    if coluna_marcada is None:
+        return frias
+    if coluna_marcada not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return frias & df[coluna_marcada].fillna(False).astype(bool).to_numpy()
+
+
+# --- Parquet ---
+
+def _pasta_aba(pasta, aba):
+    return os.path.join(pasta, aba)
+
+
+def _para_parquet(df):
+    # 'category' vira texto: cada lote teria o seu dicionário, e os lotes são lidos juntos
+    colunas = {c: pd.StringDtype("pyarrow") for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)}
+    return pa.Table.from_pandas(df.astype(colunas), preserve_index=False)
+
+
+def gravar_lotes(df, aba, pasta=PASTA_ARQUIVO):
+    """Grava as linhas em um arquivo Parquet novo por mês de resolução. Retorna os caminhos."""
+    meses = data_resolucao(df, aba).dt.strftime("%Y-%m")
+    lote = f"lote-{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}.parquet"
+    caminhos = []
+    for mes, linhas in df.groupby(meses.to_numpy(), sort=True):
+        destino = os.path.join(_pasta_aba(pasta, aba), f"mes={mes}")
+        os.makedirs(destino, exist_ok=True)
+        caminho = os.path.join(destino, lote)
+        pq.write_table(_para_parquet(linhas), caminho + ".tmp", compression="zstd")
+        os.replace(caminho + ".tmp", caminho) # Leitores nunca veem um arquivo pela metade
+        caminhos.append(caminho)
+    return caminhos
+
+
+def meses_arquivados(aba, pasta=None):
+    """Meses ('AAAA-MM') que têm notas arquivadas, em ordem."""
+    pasta = pasta or _config_arquivamento()[0]
+    try:
+        nomes = os.listdir(_pasta_aba(pasta, aba))
+    except FileNotFoundError:
+        return []
+    return sorted(n.split("=", 1)[1] for n in nomes if n.startswith("mes="))
+
+
+def _arquivos_periodo(aba, inicio, fim, pasta):
+    arquivos = []
+    for mes in meses_arquivados(aba, pasta):
+        if inicio <= mes <= fim:
+            destino = os.path.join(_pasta_aba(pasta, aba), f"mes={mes}")
+            arquivos += sorted(os.path.join(destino, n) for n in os.listdir(destino) if n.endswith(".parquet"))
+    return tuple(arquivos)
+
+
+def _tipo_pandas(tipo):
+    return pd.ArrowDtype(tipo) if pa.types.is_decimal(tipo) else None
+
+
+@st.cache_resource(max_entries=8) # Por conjunto de arquivos: um lote novo muda a chave
+def _ler_lotes(arquivos):
+    with medir("arquivo.ler", arquivos=len(arquivos)) as m:
+        partes = [pq.read_table(a).to_pandas(types_mapper=_tipo_pandas) for a in arquivos]
+        df = pd.concat(partes, ignore_index=True) if partes else None
+        m["linhas"] = 0 if df is None else len(df)
+    return df
+
+
+def ler_arquivo(aba, inicio, fim, pasta=None):
+    """
+    Linhas arquivadas da aba resolvidas entre os meses 'inicio' e 'fim' ('AAAA-MM',
+    inclusive), lendo só as partições desses meses. Retorna None se não houver nenhuma.
+    O DataFrame é compartilhado (cache): não altere sem copiar.
+    """
+    pasta = pasta or _config_arquivamento()[0]
+    arquivos = _arquivos_periodo(aba, inicio, fim, pasta)
+    return _ler_lotes(arquivos) if arquivos else None
+
+
+# --- Job de arquivamento ---
+
+def _removidas(service, aba, df, posicoes, spreadsheet_id):
+    """
+    Máscara (sobre as 'posicoes') das linhas que saíram mesmo da planilha, contando cada NF
+    antes e agora: uma remoção com erro pode ter sido aplicada inteira, em parte ou nada.
+    Na dúvida (ex.: NF repetida), a linha conta como removida e fica no arquivo.
+    """
+    nfs = df[COLUNA_NF].astype(object).fillna("").astype(str)
+    frias = nfs.iloc[posicoes]
+    por_nf = frias.value_counts()
+    restantes = nfs.value_counts().sub(por_nf, fill_value=0).reindex(por_nf.index) # Depois de remover todas
+    atuais = pd.Series(ler_coluna_nf(service, aba, df, spreadsheet_id), dtype=object).value_counts()
+    ficaram = (atuais.reindex(por_nf.index, fill_value=0) - restantes).clip(0, por_nf)
+    return frias.groupby(frias).cumcount().to_numpy() < (por_nf - ficaram).reindex(frias).to_numpy()
+
+
+def arquivar_aba(service, aba, idade_dias=None, pasta=None, hoje=None, simular=False, spreadsheet_id=SPREADSHEET_ID):
+    """
+    Move para o arquivo Parquet as linhas da aba resolvidas há mais de 'idade_dias' e as
+    remove da planilha. Os arquivos são gravados antes da remoção; se ela falhar, são
+    regravados só com as linhas que saíram da planilha, então uma linha nunca se perde
+    nem fica ao mesmo tempo na planilha e no arquivo.
+    Retorna quantas linhas foram (ou, com 'simular', seriam) arquivadas.
+    """
+    pasta_padrao, idade_padrao = _config_arquivamento()
+    pasta = pasta or pasta_padrao
+    idade_dias = idade_padrao if idade_dias is None else idade_dias
+    limite = pd.Timestamp(hoje or date.today()).normalize() - pd.Timedelta(days=idade_dias)
+
+    verificar_alteracoes(service, aba, spreadsheet_id, forcar=True)
+    df = get_tabela_sheets(service, aba, spreadsheet_id)
+    if df is None:
+        raise RuntimeError(f"não foi possível carregar a aba '{aba}'")
+    if COLUNA_NF not in df.columns:
+        raise RuntimeError(f"a aba '{aba}' não tem a coluna {COLUNA_NF}")
+    posicoes = np.flatnonzero(selecionar_frias(df, aba, limite))
+    if simular or not len(posicoes):
+        return len(posicoes)
+
+    with medir("arquivo.arquivar", aba=aba, linhas=len(posicoes)):
+        frias = df.iloc[posicoes]
+        caminhos = gravar_lotes(frias, aba, pasta)
+
+        try:
+            # Confere antes (pela coluna NF) se as linhas continuam nas mesmas posições
+            enviar_operacoes(service, aba, {"atualizar": [], "adicionar": [], "remover": posicoes.tolist()},
+                             spreadsheet_id, conferir=df)
+        except Exception:
+            # A remoção pode ter sido aplicada mesmo com erro (ex.: tempo esgotado na resposta)
+            removidas = _removidas(service, aba, df, posicoes, spreadsheet_id)
+            for caminho in caminhos:
+                os.remove(caminho)
+            if removidas.any():
+                gravar_lotes(frias[removidas], aba, pasta)
+            raise
+    return len(posicoes)
+
+
+if __name__ == "__main__":
+    from sheets import get_sheets_service
+
+    parser = argparse.ArgumentParser(description="Arquiva as notas antigas já resolvidas em Parquet.")
+    parser.add_argument("--idade-dias", type=int, help=f"padrão: [arquivamento] idade_dias ou {IDADE_ARQUIVAMENTO}")
+    parser.add_argument("--pasta", help="padrão: [arquivamento] pasta ou .arquivo/")
+    parser.add_argument("--simular", action="store_true", help="só conta as linhas que seriam arquivadas")
+    args = parser.parse_args()
+
+    service = get_sheets_service()
+    if service is None:
+        raise SystemExit("Serviço Google Sheets não disponível.")
+    for aba in REGRAS_ARQUIVAMENTO:
+        total = arquivar_aba(service, aba, args.idade_dias, args.pasta, simular=args.simular)
+        print(f"{aba}: {total} linhas {'a arquivar' if args.simular else 'arquivadas'}.")
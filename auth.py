@@ -1,19 +1,129 @@
 # auth.py
-import streamlit as st
+"""
+Login das páginas.
+
+As senhas ficam em st.secrets como hashes PBKDF2 com sal, na seção [users_hash]
+(gere com 'python auth.py <senha>'). A seção antiga [users], com as senhas em
+texto, ainda é aceita enquanto os hashes não são cadastrados.
+
+Depois do login a sessão recebe um token assinado (HMAC) com validade, que vale
+para todas as páginas: trocar de página não pede a senha de novo.
+"""
+import base64
+import hashlib
+import hmac
 import os
+import secrets
+import sys
+import threading
+import time
+
+import streamlit as st
+
+ITERACOES_HASH = 200_000
+VALIDADE_SESSAO = 8 * 3600 # Segundos até o token expirar e o login ser pedido de novo
+CHAVE_TOKEN = "auth_token"
+
+
+def gerar_hash(senha, sal=None, iteracoes=ITERACOES_HASH):
+    """Hash 'pbkdf2_sha256$iterações$sal$hash' para colocar em [users_hash]."""
+    sal = sal or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", senha.encode(), bytes.fromhex(sal), iteracoes)
+    return f"pbkdf2_sha256${iteracoes}${sal}${digest.hex()}"
+
+
+def _confere_hash(senha, registro):
+    try:
+        _, iteracoes, sal, _ = registro.split("$")
+        return hmac.compare_digest(gerar_hash(senha, sal, int(iteracoes)), registro)
+    except ValueError:
+        return False
+
+
+@st.cache_resource # Chave de assinatura e verificações já feitas (por processo)
+def _estado_auth():
+    chave = st.secrets.get("session_key") # Compartilhada entre réplicas, se configurada
+    return {
+        "chave": chave.encode() if chave else secrets.token_bytes(32),
+        "verificadas": set(),
+        "lock": threading.Lock(),
+    }
+
+
+@st.cache_resource # Lida uma vez por processo: check_password roda a cada rerun
+def _usuarios():
+    """
+    Dicionário usuário -> ('hash' | 'texto', valor) com os usuários de st.secrets.
+    É compartilhado (cache): não altere. Usuários novos valem depois de reiniciar o app.
+    """
+    usuarios = {}
+    if "users" in st.secrets:
+        usuarios.update({u: ("texto", str(s)) for u, s in st.secrets["users"].to_dict().items()})
+    if "users_hash" in st.secrets:
+        usuarios.update({u: ("hash", str(h)) for u, h in st.secrets["users_hash"].to_dict().items()})
+    return usuarios
+
+
+def verificar_senha(user, pwd):
+    """
+    Confere a senha do usuário. As senhas corretas ficam guardadas por (usuário, HMAC da
+    senha com a chave do processo), então o PBKDF2 só roda no primeiro login de cada uma.
+    """
+    usuarios = _usuarios()
+    if not user or not pwd or user not in usuarios:
+        return False
+    tipo, valor = usuarios[user]
+    estado = _estado_auth()
+    chave_cache = (user, valor, hmac.new(estado["chave"], pwd.encode(), hashlib.sha256).digest())
+    with estado["lock"]:
+        if chave_cache in estado["verificadas"]:
+            return True
+    if tipo == "hash":
+        correta = _confere_hash(pwd, valor)
+    else:
+        correta = hmac.compare_digest(pwd.encode(), valor.encode())
+    if correta: # Só as corretas: tentativas erradas não fazem o cache crescer
+        with estado["lock"]:
+            estado["verificadas"].add(chave_cache)
+    return correta
+
+
+def _assinar(conteudo):
+    return hmac.new(_estado_auth()["chave"], conteudo, hashlib.sha256).hexdigest()
+
+
+def emitir_token(user, validade=VALIDADE_SESSAO):
+    """Token 'usuário|expira_em' em base64 + assinatura HMAC."""
+    conteudo = base64.urlsafe_b64encode(f"{user}|{int(time.time() + validade)}".encode())
+    return f"{conteudo.decode()}.{_assinar(conteudo)}"
+
+
+def usuario_do_token(token):
+    """Usuário do token se a assinatura confere e ele não expirou; senão None."""
+    try:
+        conteudo, assinatura = token.split(".")
+        if not hmac.compare_digest(_assinar(conteudo.encode()), assinatura):
+            return None
+        user, expira_em = base64.urlsafe_b64decode(conteudo).decode().rsplit("|", 1)
+    except (AttributeError, ValueError):
+        return None
+    if time.time() > int(expira_em):
+        return None
+    return user
+
 
 def check_password():
-    """Verifica a senha usando st.secrets."""
-    if "users" not in st.secrets:
-        st.error("Configuração '[users]' não encontrada em st.secrets.")
+    """Verifica o token da sessão ou, se não houver um válido, mostra o formulário de login."""
+    if not _usuarios():
+        st.error("Configuração '[users_hash]' (ou '[users]') não encontrada em st.secrets.")
         return False
 
     def password_entered():
         user = st.session_state.get("username")
         pwd = st.session_state.get("password")
-        users_dict = st.secrets["users"].to_dict()
 
-        if user and pwd and user in users_dict and pwd == users_dict[user]:
+        if verificar_senha(user, pwd):
+            st.session_state[CHAVE_TOKEN] = emitir_token(user)
             st.session_state["password_correct"] = True
             st.session_state["logged_in_user"] = user
             if "password" in st.session_state:
@@ -21,52 +131,51 @@ def check_password():
         else:
             st.session_state["password_correct"] = False
 
-    if "password_correct" not in st.session_state:
-        st.session_state["password_correct"] = False
+    user = usuario_do_token(st.session_state.get(CHAVE_TOKEN))
+    if user is not None and user in _usuarios():
+        st.session_state["password_correct"] = True
+        st.session_state["logged_in_user"] = user
+        return True
 
-    if not st.session_state["password_correct"]:
-        st.title("Login :closed_lock_with_key:")
-        usernames = list(st.secrets["users"].keys())
-        st.selectbox("Selecione seu nome de usuário:", usernames, key="username")
-        st.text_input("Senha:", type="password", on_change=password_entered, key="password")
+    if st.session_state.get(CHAVE_TOKEN):
+        st.toast("Sessão expirada. Faça login novamente.")
+        del st.session_state[CHAVE_TOKEN]
+    st.session_state["password_correct"] = False
+    st.session_state.pop("logged_in_user", None)
 
-        if "password" in st.session_state and st.session_state["password"] and not st.session_state["password_correct"]:
-            st.error("Usuário ou senha incorretos.")
-        return False
+    st.title("Login :closed_lock_with_key:")
+    usernames = list(_usuarios().keys())
+    st.selectbox("Selecione seu nome de usuário:", usernames, key="username")
+    st.text_input("Senha:", type="password", on_change=password_entered, key="password")
 
-    return True
+    if "password" in st.session_state and st.session_state["password"] and not st.session_state["password_correct"]:
+        st.error("Usuário ou senha incorretos.")
+    return False
 
 def force_relogin_on_navigate(current_script_file):
     """
-    Verifica a navegação e força o relogin se a página mudou.
-    Retorna True se o usuário está logado (após a verificação), False caso contrário.
+    Garante que o usuário está logado na página 'current_script_file'.
+    O token da sessão vale para todas as páginas, então a navegação não pede login de novo.
+    Retorna True se o usuário está logado, False caso contrário.
     """
-    current_path = os.path.abspath(current_script_file)
-    last_path = st.session_state.get("last_script_path")
-
-    if last_path and current_path != last_path:
-        if "password_correct" in st.session_state:
-            del st.session_state["password_correct"]
-        if "logged_in_user" in st.session_state:
-            del st.session_state["logged_in_user"]
-        del st.session_state["last_script_path"]
-        st.toast("Navegação detectada. Faça login novamente.") # Usando toast para ser menos intrusivo
-
     is_logged_in = check_password()
-
     if is_logged_in:
-        st.session_state["last_script_path"] = current_path
-        return True
-    else:
-        if "last_script_path" in st.session_state:
-            del st.session_state["last_script_path"]
-        return False
+        st.session_state["last_script_path"] = os.path.abspath(current_script_file)
+    return is_logged_in
 
 def add_logout_button():
     """Adiciona um botão de logout à barra lateral."""
     if st.sidebar.button("🚪 Sair"):
-        keys_to_delete = ["password_correct", "logged_in_user", "last_script_path"]
+        keys_to_delete = [CHAVE_TOKEN, "password_correct", "logged_in_user", "last_script_path"]
         for key in keys_to_delete:
             if key in st.session_state:
                 del st.session_state[key]
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+
+if __name__ == "__main__":
+    # Uso: python auth.py <senha>  -> linha para a seção [users_hash] do secrets.toml
+    if len(sys.argv) != 2:
+        print("Uso: python auth.py <senha>")
+        sys.exit(1)
+    print(f'usuario = "{gerar_hash(sys.argv[1])}"')
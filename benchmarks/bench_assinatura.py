@@ -0,0 +1,76 @@
+# benchmarks/bench_assinatura.py
+"""
+Compara o salvamento de assinaturas antigo (iterrows + .loc por linha) com o
+vetorizado de notas.aplicar_assinaturas.
+
+    python benchmarks/bench_assinatura.py [tamanhos...]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notas import aplicar_assinaturas
+from sheets import COLUNA_ASSINATURA, COLUNA_GESTOR_ASSINATURA, COLUNA_GESTOR_RESP
+
+GESTORES = ["KATIA", "DANILO", "HEBERTON"]
+
+
+def gerar_notas(n, seed=0):
+    rng = np.random.default_rng(seed)
+    assinadas = rng.random(n) < 0.5
+    return pd.DataFrame({
+        "NF": np.arange(n).astype(str),
+        "FORNECEDOR": rng.choice(["F1", "F2", "F3", "F4"], n),
+        "VALOR": rng.random(n) * 1000,
+        "DT VENC": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+        COLUNA_GESTOR_RESP: rng.choice(GESTORES, n),
+        COLUNA_ASSINATURA: False,
+        COLUNA_GESTOR_ASSINATURA: pd.Series(pd.Timestamp("2025-01-01"), index=range(n)).where(assinadas),
+    })
+
+
+def salvar_iterrows(df_original, edited_df):
+    """Cópia do laço original de Page_Assinatura (referência)."""
+    df_para_salvar = df_original.copy()
+    for index, row in edited_df.iterrows():
+        if row[COLUNA_ASSINATURA] and pd.isna(df_para_salvar.loc[index, COLUNA_GESTOR_ASSINATURA]):
+            df_para_salvar.loc[index, COLUNA_GESTOR_ASSINATURA] = datetime.now()
+        df_para_salvar.loc[index, COLUNA_ASSINATURA] = row[COLUNA_ASSINATURA]
+    return df_para_salvar
+
+
+def medir(func, *args, repeticoes=3):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main(tamanhos):
+    print(f"{'linhas':>8} {'iterrows (s)':>14} {'vetorizado (s)':>16} {'ganho':>8}")
+    for n in tamanhos:
+        df = gerar_notas(n)
+        # O editor recebe só as notas de um gestor; metade delas marcada
+        edited_df = df[df[COLUNA_GESTOR_RESP] == GESTORES[0]].copy()
+        edited_df[COLUNA_ASSINATURA] = np.arange(len(edited_df)) % 2 == 0
+
+        antigo = salvar_iterrows(df, edited_df)
+        novo = aplicar_assinaturas(df, edited_df)
+        assert antigo[COLUNA_ASSINATURA].equals(novo[COLUNA_ASSINATURA])
+        assert antigo[COLUNA_GESTOR_ASSINATURA].isna().equals(novo[COLUNA_GESTOR_ASSINATURA].isna())
+
+        t_antigo = medir(salvar_iterrows, df, edited_df, repeticoes=1 if n > 10_000 else 3)
+        t_novo = medir(aplicar_assinaturas, df, edited_df)
+        print(f"{n:>8} {t_antigo:>14.4f} {t_novo:>16.4f} {t_antigo / t_novo:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,114 @@
+# benchmarks/bench_carga.py
+"""
+Compara a carga antiga (um values().get da aba inteira + DataFrame + conversão)
+com a carga em blocos paralelos de sheets_chunks.carregar_em_blocos.
+
+A planilha é simulada em memória com uma latência por requisição e um custo de
+transferência por célula, para representar a rede.
+
+    python benchmarks/bench_carga.py [tamanhos...]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sheets import ABA_NOTAS, CONVERSORES
+from sheets_chunks import carregar_em_blocos, montar_dataframe
+
+LATENCIA_REQUISICAO = 0.08 # Segundos por requisição
+SEGUNDOS_POR_CELULA = 2e-6 # Transferência
+
+
+class _Execucao:
+    def __init__(self, func):
+        self._func = func
+
+    def execute(self, **kwargs):
+        return self._func()
+
+
+class PlanilhaSimulada:
+    """Imitação mínima de service.spreadsheets() para uma aba, com latência."""
+
+    def __init__(self, values):
+        self._values = values
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, range=None, fields=None):
+        if fields is not None:
+            props = {"title": ABA_NOTAS, "gridProperties": {"rowCount": len(self._values)}}
+            return _Execucao(lambda: {"sheets": [{"properties": props}]})
+        _, _, faixa = range.partition("!")
+        if faixa:
+            inicio, fim = (int(x) for x in faixa.split(":"))
+            linhas = self._values[inicio - 1:fim]
+        else:
+            linhas = self._values
+
+        def executar():
+            time.sleep(LATENCIA_REQUISICAO + SEGUNDOS_POR_CELULA * sum(len(l) for l in linhas))
+            return {"values": [list(l) for l in linhas]}
+        return _Execucao(executar)
+
+
+def gerar_valores(n, seed=0):
+    """Cabeçalho + n linhas de texto no formato que a API devolve."""
+    rng = np.random.default_rng(seed)
+    gestores = rng.choice(["KATIA", "DANILO", "HEBERTON", "MARCOS", "ANA"], n)
+    fornecedores = rng.choice([f"FORNECEDOR {i}" for i in range(200)], n)
+    dias = rng.integers(1, 29, n)
+    meses = rng.integers(1, 13, n)
+    assinadas = rng.random(n) < 0.6
+    cabecalho = ["NF", "FORNECEDOR", "VALOR", "DT VENC", "GESTOR_RESP", "ASSINATURA", "GESTORASSINATURA", "ENTREGA GESTOR"]
+    linhas = []
+    for i in range(n):
+        data = f"{dias[i]:02d}/{meses[i]:02d}/2025"
+        linha = [str(100000 + i), fornecedores[i], f"{(i * 37) % 10000},{i % 100:02d}", data, gestores[i], "FALSE",
+                 f"{data} 10:00:00" if assinadas[i] else "", data]
+        linhas.append(linha)
+    return [cabecalho] + linhas
+
+
+def carga_antiga(service):
+    values = service.spreadsheets().values().get(spreadsheetId="", range=ABA_NOTAS).execute()["values"]
+    return CONVERSORES[ABA_NOTAS](montar_dataframe(values[1:], values[0]))
+
+
+def carga_em_blocos(service):
+    return carregar_em_blocos(service, "", ABA_NOTAS, CONVERSORES[ABA_NOTAS])[1]
+
+
+def medir(func, service):
+    inicio = time.perf_counter()
+    func(service)
+    tempo = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    func(service)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tempo, pico / 2**20
+
+
+def main(tamanhos):
+    print(f"{'linhas':>8} | {'antiga (s)':>10} {'pico MB':>8} | {'blocos (s)':>10} {'pico MB':>8}")
+    for n in tamanhos:
+        service = PlanilhaSimulada(gerar_valores(n))
+        assert carga_antiga(service).equals(carga_em_blocos(service))
+        t_antiga, m_antiga = medir(carga_antiga, service)
+        t_blocos, m_blocos = medir(carga_em_blocos, service)
+        print(f"{n:>8} | {t_antiga:>10.2f} {m_antiga:>8.1f} | {t_blocos:>10.2f} {m_blocos:>8.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 50_000, 100_000])
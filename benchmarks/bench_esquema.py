@@ -0,0 +1,54 @@
+# benchmarks/bench_esquema.py
+"""
+Mede a memória de uma cópia em cache da aba 'Notas' com a conversão antiga
+(textos como objetos Python e VALOR em float) e com o esquema de tipos de
+sheets.ESQUEMAS. Mostra o uso por coluna (memory_usage(deep=True)) e o tamanho
+do pickle, que é o que o st.cache_data guarda e copia a cada leitura.
+
+    python benchmarks/bench_esquema.py [tamanhos...]
+"""
+import os
+import pickle
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_carga import gerar_valores
+from sheets import ABA_NOTAS, COLUNA_ASSINATURA, COLUNA_GESTOR_ASSINATURA, aplicar_esquema
+from sheets_chunks import montar_dataframe
+
+
+def converter_antigo(df):
+    """Cópia da conversão anterior ao esquema (referência)."""
+    df[COLUNA_ASSINATURA] = df[COLUNA_ASSINATURA].astype(str).str.upper().isin(['TRUE', 'VERDADEIRO'])
+    df['VALOR'] = pd.to_numeric(df['VALOR'].astype(str).str.replace(',', '.', regex=False), errors='coerce').fillna(0)
+    for coluna in ('DT VENC', 'ENTREGA GESTOR', COLUNA_GESTOR_ASSINATURA):
+        df[coluna] = pd.to_datetime(df[coluna], errors='coerce', dayfirst=True)
+    return df
+
+
+def main(tamanhos):
+    for n in tamanhos:
+        values = gerar_valores(n)
+        antigo = converter_antigo(montar_dataframe(values[1:], values[0]))
+        novo = aplicar_esquema(montar_dataframe(values[1:], values[0]), ABA_NOTAS)
+
+        uso = pd.DataFrame({
+            "antigo": antigo.memory_usage(deep=True, index=False),
+            "esquema": novo.memory_usage(deep=True, index=False),
+        }) / 2**20
+        uso.loc["TOTAL"] = uso.sum()
+        uso["tipo"] = novo.dtypes.astype(str)
+        pickle_antigo = len(pickle.dumps(antigo)) / 2**20
+        pickle_novo = len(pickle.dumps(novo)) / 2**20
+
+        print(f"\n{n} linhas (MB)")
+        print(uso.to_string(float_format=lambda x: f"{x:.2f}", na_rep=""))
+        print(f"pickle: {pickle_antigo:.2f} -> {pickle_novo:.2f}"
+              f" ({1 - pickle_novo / pickle_antigo:.0%} menor por cópia em cache)")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,105 @@
+# benchmarks/bench_fila.py
+"""
+Simula várias sessões salvando assinaturas ao mesmo tempo e compara a escrita
+direta (um values().batchUpdate por sessão) com a fila de escrita do processo
+(fila_escrita.FilaEscrita), que junta tudo em um batchUpdate por janela.
+
+A planilha simulada atende uma escrita por vez (como a API faz com escritas na
+mesma planilha) e conta as requisições, que é o que consome a cota por minuto.
+
+    python benchmarks/bench_fila.py [sessões...]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sheets import ABA_NOTAS, escrever_celulas
+from fila_escrita import FilaEscrita
+
+LATENCIA_ESCRITA = 0.4 # Segundos por batchUpdate
+JANELA = 1.0
+
+
+class _Execucao:
+    def __init__(self, func):
+        self._func = func
+
+    def execute(self, **kwargs):
+        return self._func()
+
+
+class PlanilhaSimulada:
+    """Imitação mínima de service.spreadsheets().values().batchUpdate, uma escrita por vez."""
+
+    def __init__(self):
+        self.requisicoes = 0
+        self.celulas = {}
+        self._lock = threading.Lock()
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def batchUpdate(self, spreadsheetId, body):
+        def executar():
+            with self._lock:
+                time.sleep(LATENCIA_ESCRITA)
+                self.requisicoes += 1
+                for item in body["data"]:
+                    self.celulas[item["range"]] = item["values"]
+                return {"totalUpdatedCells": sum(len(l) for item in body["data"] for l in item["values"])}
+        return _Execucao(executar)
+
+
+def celulas_da_sessao(i):
+    linha = i + 2
+    return [{"range": f"{ABA_NOTAS}!F{linha}:G{linha}", "values": [["TRUE", "30/06/2025 10:00:00"]]}]
+
+
+def em_paralelo(n, salvar):
+    """Roda 'salvar(i)' em n threads e retorna (segundos, pior espera de uma sessão)."""
+    esperas = [0.0] * n
+
+    def sessao(i):
+        inicio = time.perf_counter()
+        salvar(i)
+        esperas[i] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=sessao, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - inicio, max(esperas)
+
+
+def direto(n):
+    service = PlanilhaSimulada()
+    tempo, pior = em_paralelo(n, lambda i: escrever_celulas(service, ABA_NOTAS, celulas_da_sessao(i)))
+    return service, tempo, pior
+
+
+def com_fila(n):
+    service = PlanilhaSimulada()
+    fila = FilaEscrita(janela=JANELA)
+    tempo, pior = em_paralelo(n, lambda i: fila.enviar(service, ABA_NOTAS, celulas_da_sessao(i)).aguardar())
+    return service, tempo, pior
+
+
+def main(sessoes):
+    print(f"{'sessões':>8} | {'direto req':>10} {'pior (s)':>8} | {'fila req':>8} {'pior (s)':>8}")
+    for n in sessoes:
+        s_direto, _, pior_direto = direto(n)
+        s_fila, _, pior_fila = com_fila(n)
+        assert s_direto.celulas == s_fila.celulas
+        print(f"{n:>8} | {s_direto.requisicoes:>10} {pior_direto:>8.1f} | {s_fila.requisicoes:>8} {pior_fila:>8.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [5, 20, 50])
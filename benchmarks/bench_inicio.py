@@ -0,0 +1,76 @@
+# benchmarks/bench_inicio.py
+"""
+Mede o tempo até a primeira renderização do app.py (página inicial) em um
+processo Python novo, como na primeira visita depois de subir o servidor:
+importações, montagem da navegação e execução da Page_Main. Mede também o
+script inteiro. O cliente da API e o prefetch só são criados nas páginas que
+usam a planilha, então não entram em nenhum dos dois tempos.
+
+Cada repetição roda em um subprocesso separado (importações frias). O backend
+é o emulador local, para não depender de rede nem de credenciais.
+
+    python benchmarks/bench_inicio.py [repetições]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PESADOS = ("pandas", "pyarrow", "plotly", "googleapiclient", "google.oauth2")
+
+# Roda no subprocesso. Embrulha o 'run' da página escolhida pelo st.navigation para
+# saber quando a página terminou de renderizar (e o que já estava importado nessa hora).
+# Como na suite.py, a cópia local e o log de medições vão para a pasta temporária
+# (importados só depois da página, para não antecipar o pandas que o medicao.py traz).
+_MEDIR = r"""
+import sys, time
+inicio = time.perf_counter()
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+pagina = {}
+_navigation = st.navigation
+def _navegar(*args, **kwargs):
+    pg = _navigation(*args, **kwargs)
+    _run = pg.run
+    def run():
+        try:
+            _run()
+        finally:
+            pagina["tempo"] = time.perf_counter() - inicio
+            pagina["modulos"] = [m for m in PESADOS if m in sys.modules]
+            import os, medicao, snapshot
+            snapshot.SNAPSHOT_PATH = os.path.join(PASTA, "snapshot", "planilhas.sqlite3")
+            medicao.ARQUIVO_LOG = os.path.join(PASTA, "medicoes.log")
+    pg.run = run
+    return pg
+st.navigation = _navegar
+at = AppTest.from_file("app.py", default_timeout=120)
+at.run()
+total = time.perf_counter() - inicio
+assert not at.exception, [e.value for e in at.exception]
+print(f"{pagina['tempo']:.3f} {total:.3f} {','.join(sorted(pagina['modulos'])) or '-'}")
+"""
+
+
+def medir_uma_vez(pasta):
+    env = dict(os.environ, SHEETS_BACKEND="emulador", SHEETS_EMULADOR=os.path.join(pasta, "planilha.sqlite3"))
+    codigo = f"PESADOS = {PESADOS!r}\nPASTA = {pasta!r}\n" + _MEDIR
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, env=env, capture_output=True, text=True, check=True)
+    pagina, total, modulos = saida.stdout.split()[-3:]
+    return float(pagina), float(total), modulos
+
+
+def main(repeticoes):
+    with tempfile.TemporaryDirectory() as pasta:
+        resultados = [medir_uma_vez(pasta) for _ in range(repeticoes)]
+    for nome, i in (("página inicial renderizada", 0), ("script do app.py completo", 1)):
+        tempos = [r[i] for r in resultados]
+        print(f"{nome}: mediana {statistics.median(tempos):.3f}s, melhor {min(tempos):.3f}s ({repeticoes} processos)")
+    print(f"módulos pesados já carregados quando a página inicial ficou pronta: {resultados[-1][2]}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,255 @@
+# benchmarks/planilha_falsa.py
+"""
+Planilha em memória que imita a parte da API do Google Sheets usada pelo app
+(spreadsheets().get/batchUpdate e values().get/batchGet/batchUpdate), e geradores
+de abas 'Notas'/'Devolução' sintéticas com distribuições parecidas com as reais:
+poucos gestores concentram a maior parte das notas, muitos fornecedores com
+cauda longa, vencimentos espalhados em 18 meses e notas antigas quase todas
+assinadas.
+
+A latência é opcional (por requisição e por célula); sem ela os tempos medidos
+são só os do processamento local.
+"""
+import re
+import threading
+import time
+
+import numpy as np
+
+from sheets import ABA_NOTAS, ABA_DEVOLUCAO
+
+CABECALHO_NOTAS = ["NF", "FORNECEDOR", "VALOR", "DT VENC", "GESTOR_RESP", "ASSINATURA", "GESTORASSINATURA", "ENTREGA GESTOR"]
+CABECALHO_DEVOLUCAO = ["NF", "FORNECEDOR", "VALOR", "DT VENC", "GESTOR_RESP", "ASSINATURA", "GESTORASSINATURA", "DEVOLUCAO", "DATA DEVOLUCAO"]
+GESTORES = ["KATIA", "DANILO", "HEBERTON", "MARCOS", "ANA", "PAULO", "JULIANA", "RAFAEL", "CARLA", "BRUNO",
+            "FERNANDA", "LUCAS", "PATRICIA", "DIEGO", "MARIANA", "RODRIGO", "CAMILA", "THIAGO", "LETICIA", "VITOR"]
+QTD_FORNECEDORES = 2000
+DATA_BASE = np.datetime64("2025-06-30")
+EPOCA_SHEETS = np.datetime64("1899-12-30T00:00:00")
+
+_CELULA = re.compile(r"([A-Z]+)(\d+)")
+
+
+# --- Geradores ---
+
+def _zipf(rng, n, k, a=1.2):
+    """n sorteios entre 0 e k-1, os primeiros bem mais frequentes (lei de Zipf)."""
+    pesos = 1.0 / np.arange(1, k + 1) ** a
+    return rng.choice(k, n, p=pesos / pesos.sum())
+
+
+def _datas_texto(datas):
+    texto = np.datetime_as_string(datas, unit="D") # AAAA-MM-DD
+    return [f"{d[8:10]}/{d[5:7]}/{d[0:4]}" for d in texto]
+
+
+def _colunas_base(n, rng):
+    gestores = np.array(GESTORES)[_zipf(rng, n, len(GESTORES))]
+    fornecedores = [f"FORNECEDOR {i:04d}" for i in _zipf(rng, n, QTD_FORNECEDORES, a=0.9)]
+    valores = np.round(rng.lognormal(7, 1.2, n), 2)
+    # Mais notas nos meses recentes: idade em dias ~ exponencial, limitada a 18 meses
+    idade = np.minimum(rng.exponential(120, n), 540).astype(int)
+    vencimento = DATA_BASE - idade.astype("timedelta64[D]")
+    # Quanto mais antiga a nota, maior a chance de já estar assinada
+    assinada = rng.random(n) < np.clip(0.3 + idade / 200, 0, 0.97)
+    assinatura = vencimento + rng.integers(0, 20, n).astype("timedelta64[D]")
+    return gestores, fornecedores, valores, vencimento, assinada, assinatura
+
+
+def gerar_notas(n, seed=0):
+    """Cabeçalho + n linhas da aba 'Notas' no formato de texto que a API devolve."""
+    rng = np.random.default_rng(seed)
+    gestores, fornecedores, valores, vencimento, assinada, assinatura = _colunas_base(n, rng)
+    entrega = _datas_texto(vencimento - rng.integers(1, 15, n).astype("timedelta64[D]"))
+    venc = _datas_texto(vencimento)
+    assin = _datas_texto(assinatura)
+    linhas = [CABECALHO_NOTAS]
+    for i in range(n):
+        valor = f"{valores[i]:.2f}".replace(".", ",")
+        linhas.append([str(100000 + i), fornecedores[i], valor, venc[i], gestores[i], "FALSE",
+                       f"{assin[i]} 10:00:00" if assinada[i] else "", entrega[i]])
+    return linhas
+
+
+def gerar_devolucao(n, seed=1):
+    """Cabeçalho + n linhas da aba 'Devolução' (cerca de 10% já devolvidas)."""
+    rng = np.random.default_rng(seed)
+    gestores, fornecedores, valores, vencimento, assinada, assinatura = _colunas_base(n, rng)
+    devolvida = assinada & (rng.random(n) < 0.15)
+    venc = _datas_texto(vencimento)
+    assin = _datas_texto(assinatura)
+    devol = _datas_texto(assinatura + rng.integers(1, 10, n).astype("timedelta64[D]"))
+    linhas = [CABECALHO_DEVOLUCAO]
+    for i in range(n):
+        valor = f"{valores[i]:.2f}".replace(".", ",")
+        linhas.append([str(500000 + i), fornecedores[i], valor, venc[i], gestores[i], "FALSE",
+                       f"{assin[i]} 10:00:00" if assinada[i] else "",
+                       "TRUE" if devolvida[i] else "FALSE", devol[i] if devolvida[i] else ""])
+    return linhas
+
+
+def gerar_abas(n_notas, n_devolucao=None, seed=0):
+    """Dicionário aba -> linhas, pronto para a PlanilhaFalsa."""
+    n_devolucao = n_notas // 10 if n_devolucao is None else n_devolucao
+    return {ABA_NOTAS: gerar_notas(n_notas, seed), ABA_DEVOLUCAO: gerar_devolucao(n_devolucao, seed + 1)}
+
+
+# --- API falsa ---
+
+def _coluna(letras):
+    numero = 0
+    for letra in letras:
+        numero = numero * 26 + ord(letra) - 64
+    return numero - 1
+
+
+def _separar(faixa):
+    aba, _, a1 = faixa.partition("!")
+    return aba.strip("'"), a1
+
+
+class _Execucao:
+    def __init__(self, planilha, func, celulas=0):
+        self._planilha = planilha
+        self._func = func
+        self._celulas = celulas
+
+    def execute(self, **kwargs):
+        self._planilha._esperar(self._celulas)
+        return self._func()
+
+
+class _Valores:
+    def __init__(self, planilha):
+        self._p = planilha
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return _Execucao(self._p, lambda: self._p.ler(range), self._p.tamanho(range))
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        return _Execucao(self._p, lambda: {"valueRanges": [dict(self._p.ler(r), range=r) for r in ranges]},
+                         sum(self._p.tamanho(r) for r in ranges))
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        celulas = sum(len(l) for item in body["data"] for l in item["values"])
+        return _Execucao(self._p, lambda: self._p.escrever_valores(body["data"]), celulas)
+
+
+class _Planilhas:
+    def __init__(self, planilha):
+        self._p = planilha
+
+    def values(self):
+        return _Valores(self._p)
+
+    def get(self, spreadsheetId, fields=None, **kwargs):
+        return _Execucao(self._p, self._p.propriedades)
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        return _Execucao(self._p, lambda: self._p.aplicar_requests(body["requests"]))
+
+
+class PlanilhaFalsa:
+    """Imita o 'service' do googleapiclient sobre as abas em memória (listas de linhas)."""
+
+    def __init__(self, abas, latencia=0.0, segundos_por_celula=0.0):
+        self.abas = abas
+        self.latencia = latencia
+        self.segundos_por_celula = segundos_por_celula
+        self.requisicoes = 0
+        self._lock = threading.Lock()
+
+    def spreadsheets(self):
+        return _Planilhas(self)
+
+    def _esperar(self, celulas):
+        with self._lock:
+            self.requisicoes += 1
+        if self.latencia or self.segundos_por_celula:
+            time.sleep(self.latencia + self.segundos_por_celula * celulas)
+
+    def _selecionar(self, faixa):
+        aba, a1 = _separar(faixa)
+        linhas = self.abas.get(aba, [])
+        if not a1:
+            return linhas
+        inicio, _, fim = a1.partition(":")
+        celula = _CELULA.fullmatch(inicio)
+        if celula is None: # Faixa de linhas '10:20'
+            return linhas[int(inicio) - 1:int(fim or inicio)]
+        col, lin = _coluna(celula.group(1)), int(celula.group(2))
+        col_fim, lin_fim = col, lin
+        if fim:
+            celula_fim = _CELULA.fullmatch(fim)
+            if celula_fim is None: # Coluna aberta 'A2:A'
+                col_fim, lin_fim = _coluna(fim), len(linhas)
+            else:
+                col_fim, lin_fim = _coluna(celula_fim.group(1)), int(celula_fim.group(2))
+        return [l[col:col_fim + 1] for l in linhas[lin - 1:lin_fim]]
+
+    def tamanho(self, faixa):
+        return sum(len(l) for l in self._selecionar(faixa))
+
+    def ler(self, faixa):
+        linhas = [list(l) for l in self._selecionar(faixa)]
+        while linhas and not any(linhas[-1]):
+            linhas.pop()
+        return {"values": linhas} if linhas else {}
+
+    def propriedades(self):
+        return {"sheets": [
+            {"properties": {"sheetId": i, "title": aba, "gridProperties": {"rowCount": len(linhas)}}}
+            for i, (aba, linhas) in enumerate(self.abas.items())
+        ]}
+
+    def escrever_valores(self, data):
+        total = 0
+        for item in data:
+            aba, a1 = _separar(item["range"])
+            celula = _CELULA.match(a1)
+            col, lin = _coluna(celula.group(1)), int(celula.group(2)) - 1
+            linhas = self.abas.setdefault(aba, [])
+            for i, valores in enumerate(item["values"]):
+                while len(linhas) <= lin + i:
+                    linhas.append([])
+                linha = linhas[lin + i]
+                linha.extend([""] * (col + len(valores) - len(linha)))
+                linha[col:col + len(valores)] = valores
+                total += len(valores)
+        return {"totalUpdatedCells": total}
+
+    def aplicar_requests(self, requests):
+        nomes = list(self.abas)
+        for request in requests:
+            if "updateCells" in request:
+                corpo = request["updateCells"]
+                linhas = self.abas[nomes[corpo["start"]["sheetId"]]]
+                lin, col = corpo["start"]["rowIndex"], corpo["start"]["columnIndex"]
+                for i, linha_api in enumerate(corpo["rows"]):
+                    valores = [_texto(c) for c in linha_api["values"]]
+                    linha = linhas[lin + i]
+                    linha.extend([""] * (col + len(valores) - len(linha)))
+                    linha[col:col + len(valores)] = valores
+            elif "deleteDimension" in request:
+                faixa = request["deleteDimension"]["range"]
+                del self.abas[nomes[faixa["sheetId"]]][faixa["startIndex"]:faixa["endIndex"]]
+            elif "appendCells" in request:
+                corpo = request["appendCells"]
+                self.abas[nomes[corpo["sheetId"]]].extend(
+                    [_texto(c) for c in linha["values"]] for linha in corpo["rows"]
+                )
+        return {"replies": [{} for _ in requests]}
+
+
+def _texto(celula):
+    """Texto que a API devolveria para o CellData (datas voltam a dd/mm/aaaa)."""
+    valor = (celula or {}).get("userEnteredValue", {})
+    formato = (celula or {}).get("userEnteredFormat", {}).get("numberFormat")
+    if formato and "numberValue" in valor:
+        data = EPOCA_SHEETS + np.timedelta64(round(valor["numberValue"] * 86400), "s")
+        texto = str(data.astype("datetime64[s]"))
+        dia = f"{texto[8:10]}/{texto[5:7]}/{texto[0:4]}"
+        return f"{dia} {texto[11:19]}" if formato["type"] == "DATE_TIME" else dia
+    for chave in ("stringValue", "numberValue", "boolValue", "formulaValue"):
+        if chave in valor:
+            return str(valor[chave]).upper() if chave == "boolValue" else str(valor[chave])
+    return ""
@@ -0,0 +1,206 @@
+# benchmarks/suite.py
+"""
+Suíte de benchmarks do app sobre a planilha falsa (planilha_falsa.py).
+
+Para cada tamanho da aba 'Notas' (a 'Devolução' tem 1/10 das linhas) mede:
+  carga.api             get_tabela_sheets sem cache, baixando da API falsa (blocos + conversão)
+  carga.copia_local     get_tabela_sheets sem cache, lendo a cópia local (snapshot.py)
+  assinatura.salvar     laço de salvar da Page_Assinatura: aplicar_assinaturas + update_tabela_sheets
+                        (metade das notas de um gestor marcadas, gravadas pela fila de escrita)
+  admin.salvar          update_tabela_sheets da Page_Admin: 1% das linhas editadas, 10 novas, 5 removidas
+  painel.agregados      calcular_agregados da aba inteira
+  painel.analises       get_analises do zero (todas as semanas)
+  painel.analises_nova  get_analises depois de uma versão nova da aba (só as semanas abertas)
+
+Os resultados vão para um JSON (melhor tempo e mediana por etapa e tamanho, com o
+commit atual) que pode ser comparado com o de outro commit:
+
+    python benchmarks/suite.py --tamanhos 1000 10000 100000 --saida resultados.json
+    python benchmarks/suite.py --comparar resultados_antes.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit.logger
+
+streamlit.logger.set_log_level("error") # Avisos de 'bare mode' (fora do streamlit run)
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import analises
+import medicao
+import snapshot
+import sheets
+from agregados import calcular_agregados
+from fila_escrita import FilaEscrita
+from notas import aplicar_assinaturas
+from planilha_falsa import PlanilhaFalsa, gerar_abas
+from sheets import ABA_NOTAS, ABA_DEVOLUCAO, COLUNA_ASSINATURA, COLUNA_GESTOR_RESP
+
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000]
+
+
+def funcoes_da_pagina(arquivo, marcador):
+    """
+    Executa só a parte de definições de uma página (tudo antes de 'marcador', onde começa
+    a interface) e retorna o namespace, para medir as mesmas funções que a página usa.
+    """
+    with open(os.path.join(RAIZ, arquivo), encoding="utf-8") as f:
+        codigo = f.read()
+    namespace = {"__name__": "bench_" + os.path.splitext(arquivo)[0]}
+    exec(compile(codigo[:codigo.index(marcador)], arquivo, "exec"), namespace)
+    return namespace
+
+
+def medir(func, repeticoes, preparar=None):
+    """Roda 'func(preparar())' 'repeticoes' vezes; retorna a lista de tempos (s)."""
+    tempos = []
+    for _ in range(repeticoes):
+        argumento = preparar() if preparar else None
+        inicio = time.perf_counter()
+        func(argumento)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def _carga_sem_cache(service, aba):
+    sheets.invalidar_aba(aba) # Versão nova: o cache da aba não vale mais
+    return sheets.get_tabela_sheets(service, aba)
+
+
+def rodar_tamanho(n, repeticoes):
+    service = PlanilhaFalsa(gerar_abas(n))
+    pagina_assinatura = funcoes_da_pagina("Page_Assinatura.py", "# --- Lógica da Página")
+    pagina_admin = funcoes_da_pagina("Page_Admin.py", "# --- Execução Principal")
+    fila = FilaEscrita(janela=0) # Sem a janela de espera: mede só o trabalho da gravação
+    pagina_assinatura["get_fila_escrita"] = lambda: fila
+    resultados = {}
+
+    def limpar_copia_local():
+        shutil.rmtree(os.path.dirname(snapshot.SNAPSHOT_PATH), ignore_errors=True)
+
+    resultados["carga.api"] = medir(
+        lambda _: _carga_sem_cache(service, ABA_NOTAS), repeticoes, preparar=limpar_copia_local)
+    resultados["carga.copia_local"] = medir(lambda _: _carga_sem_cache(service, ABA_NOTAS), repeticoes)
+
+    df = sheets.get_tabela_sheets(service, ABA_NOTAS)
+    gestor = df[COLUNA_GESTOR_RESP].astype(object).mode()[0]
+
+    def preparar_assinatura():
+        notas = sheets.get_notas_gestor(service, ABA_NOTAS, gestor)
+        editado = notas[[COLUNA_ASSINATURA]].copy()
+        editado[COLUNA_ASSINATURA] = np.arange(len(editado)) % 2 == 0
+        return notas, editado
+
+    def salvar_assinaturas(args):
+        notas, editado = args
+        para_salvar = aplicar_assinaturas(notas, editado)
+        pagina_assinatura["update_tabela_sheets"](service, notas, para_salvar, editado.index)
+
+    resultados["assinatura.salvar"] = medir(salvar_assinaturas, repeticoes, preparar=preparar_assinatura)
+
+    def preparar_admin():
+        devolucao = sheets.get_tabela_sheets(service, ABA_DEVOLUCAO)
+        rng = np.random.default_rng(0)
+        editadas = devolucao.sample(max(1, len(devolucao) // 100), random_state=0)
+        editadas["FORNECEDOR"] = "FORNECEDOR EDITADO"
+        novas = devolucao.iloc[:10].reset_index(drop=True)
+        removidas = set(rng.choice(devolucao.index.difference(editadas.index), 5, replace=False).tolist())
+        return devolucao, {"editadas": editadas, "novas": [novas], "removidas": removidas}
+
+    def salvar_admin(args):
+        devolucao, alteracoes = args
+        alteracoes = dict(alteracoes, novas=pd.concat(alteracoes["novas"], ignore_index=True))
+        pagina_admin["update_tabela_sheets"](service, devolucao, alteracoes)
+
+    resultados["admin.salvar"] = medir(salvar_admin, repeticoes, preparar=preparar_admin)
+
+    df = sheets.get_tabela_sheets(service, ABA_NOTAS)
+    hoje = pd.Timestamp("2025-06-30")
+    resultados["painel.agregados"] = medir(lambda _: calcular_agregados(df, hoje), repeticoes)
+
+    def preparar_analises_do_zero():
+        analises._analises()["itens"].clear()
+        sheets.get_tabela_sheets(service, ABA_NOTAS) # A carga da aba não entra na medição
+
+    def preparar_analises_versao_nova():
+        analises.get_analises(service, ABA_NOTAS, hoje=hoje)
+        sheets.invalidar_aba(ABA_NOTAS)
+        sheets.get_tabela_sheets(service, ABA_NOTAS)
+
+    resultados["painel.analises"] = medir(
+        lambda _: analises.get_analises(service, ABA_NOTAS, hoje=hoje), repeticoes, preparar=preparar_analises_do_zero)
+    resultados["painel.analises_nova"] = medir(
+        lambda _: analises.get_analises(service, ABA_NOTAS, hoje=hoje), repeticoes, preparar=preparar_analises_versao_nova)
+    return resultados
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual, anterior):
+    antes = {(r["etapa"], r["linhas"]): r["melhor"] for r in anterior["resultados"]}
+    print(f"\nComparação com {anterior.get('commit')} (melhor tempo, >1 = mais lento agora):")
+    for r in atual["resultados"]:
+        referencia = antes.get((r["etapa"], r["linhas"]))
+        if referencia:
+            print(f"{r['etapa']:<20} {r['linhas']:>8} {referencia:>9.4f}s -> {r['melhor']:>9.4f}s  {r['melhor'] / referencia:>5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", default="resultados_bench.json")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_")
+    snapshot.SNAPSHOT_PATH = os.path.join(pasta, "snapshot", "planilhas.sqlite3")
+    medicao.ARQUIVO_LOG = os.path.join(pasta, "medicoes.log")
+
+    saida = {
+        "commit": _commit(),
+        "quando": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "repeticoes": args.repeticoes,
+        "resultados": [],
+    }
+    print(f"{'etapa':<20} {'linhas':>8} {'melhor (s)':>11} {'mediana (s)':>12}")
+    try:
+        for n in args.tamanhos:
+            for etapa, tempos in rodar_tamanho(n, args.repeticoes).items():
+                r = {"etapa": etapa, "linhas": n, "melhor": min(tempos), "mediana": statistics.median(tempos)}
+                saida["resultados"].append(r)
+                print(f"{etapa:<20} {n:>8} {r['melhor']:>11.4f} {r['mediana']:>12.4f}")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(saida, f, indent=2)
+    print(f"\nResultados gravados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(saida, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
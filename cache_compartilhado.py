@@ -0,0 +1,329 @@
+# cache_compartilhado.py
+"""
+Cache das abas compartilhado entre réplicas do app (vários processos do Streamlit
+atrás de um balanceador), para que só uma delas baixe cada versão da planilha.
+
+Para cada (planilha, aba) o cache guarda:
+  - um carimbo de versão: muda a cada escrita feita por qualquer réplica (ou
+    quando a sonda de versão detecta uma alteração feita direto na planilha).
+    Publicar um carimbo novo é o aviso de invalidação para todas as réplicas:
+    cada uma confere o carimbo antes de ler e descarta a sua versão local se
+    ele mudou (ver sheets.py);
+  - a tabela já convertida (DataFrame com os tipos do esquema) da versão daquele
+    carimbo, serializada em Arrow IPC. A tabela é procurada pelo carimbo: uma
+    gravada com um carimbo que já não é o atual nunca é lida, e some na próxima
+    publicação (pasta) ou quando expira (Redis).
+
+Dois armazenamentos, escolhidos pelo endereço:
+  /mnt/compartilhado/cache_planilhas   pasta em um volume compartilhado (arquivos
+                                       Arrow lidos por mmap)
+  redis://[:senha@]host:6379/0         servidor que fale o protocolo do Redis
+
+Configuração (opcional; sem ela cada réplica mantém só o seu cache), em secrets.toml:
+
+    [cache_compartilhado]
+    endereco = "redis://cache.interno:6379/0"
+
+ou pela variável de ambiente SHEETS_CACHE_COMPARTILHADO, que tem prioridade.
+
+Para testar várias réplicas sem um Redis instalado, há um servidor local mínimo
+(dados só em memória):
+
+    python cache_compartilhado.py servidor [porta]
+"""
+import hashlib
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from urllib.parse import unquote, urlparse
+
+import pandas as pd
+import pyarrow as pa
+
+TEMPO_LIMITE = 5 # Segundos por operação no servidor Redis
+VALIDADE_TABELA = 24 * 3600 # Segundos - tabelas órfãs somem sozinhas do Redis
+PREFIXO = "planilhas"
+
+
+class ErroCacheCompartilhado(Exception):
+    """Falha ao falar com o cache compartilhado (as páginas seguem com o cache local)."""
+
+
+# --- Serialização das tabelas ---
+
+def _para_bytes(df):
+    tabela = pa.Table.from_pandas(df, preserve_index=True)
+    saida = pa.BufferOutputStream()
+    with pa.ipc.new_file(saida, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return saida.getvalue()
+
+
+def _tipo_pandas(tipo):
+    # Decimais voltam como ArrowDtype (e não como objetos decimal.Decimal)
+    return pd.ArrowDtype(tipo) if pa.types.is_decimal(tipo) else None
+
+
+def _para_dataframe(origem):
+    df = pa.ipc.open_file(origem).read_all().to_pandas(types_mapper=_tipo_pandas)
+    for coluna in df.columns[[isinstance(t, pd.StringDtype) for t in df.dtypes]]:
+        df[coluna] = df[coluna].astype(pd.StringDtype("pyarrow")) # Voltariam como string[python]
+    return df
+
+
+def _nome(spreadsheet_id, aba):
+    """Nome seguro para arquivos e chaves (o nome da aba pode ter acentos e espaços)."""
+    return hashlib.sha1(f"{spreadsheet_id}\0{aba}".encode("utf-8")).hexdigest()[:20]
+
+
+# --- Pasta em volume compartilhado ---
+
+class CacheEmArquivo:
+    """Carimbos e tabelas em arquivos de uma pasta vista por todas as réplicas."""
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        try:
+            os.makedirs(pasta, exist_ok=True)
+        except OSError as err:
+            raise ErroCacheCompartilhado(f"pasta '{pasta}' indisponível: {err}") from err
+
+    def _caminho(self, spreadsheet_id, aba, sufixo):
+        return os.path.join(self.pasta, f"{_nome(spreadsheet_id, aba)}.{sufixo}")
+
+    def _tabela(self, spreadsheet_id, aba, carimbo):
+        return self._caminho(spreadsheet_id, aba, hashlib.sha1(carimbo.encode("utf-8")).hexdigest()[:16] + ".arrow")
+
+    def _temporario(self, conteudo):
+        descritor, caminho = tempfile.mkstemp(dir=self.pasta, suffix=".tmp")
+        with os.fdopen(descritor, "wb") as f:
+            f.write(conteudo)
+        return caminho
+
+    def carimbo_atual(self, spreadsheet_id, aba, padrao):
+        """Carimbo publicado da aba; se ainda não houver, publica 'padrao' (só se ninguém o fez antes)."""
+        caminho = self._caminho(spreadsheet_id, aba, "carimbo")
+        try:
+            try:
+                with open(caminho, encoding="utf-8") as f:
+                    return f.read()
+            except FileNotFoundError:
+                pass
+            temporario = self._temporario(padrao.encode("utf-8"))
+            try:
+                os.link(temporario, caminho) # Falha se o arquivo já existe: quem chegou antes vence
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(temporario)
+            with open(caminho, encoding="utf-8") as f:
+                return f.read()
+        except OSError as err:
+            raise ErroCacheCompartilhado(err) from err
+
+    def publicar(self, spreadsheet_id, aba, carimbo):
+        """Troca o carimbo da aba (invalida a aba em todas as réplicas) e apaga as tabelas antigas."""
+        caminho = self._caminho(spreadsheet_id, aba, "carimbo")
+        atual = os.path.basename(self._tabela(spreadsheet_id, aba, carimbo))
+        try:
+            os.replace(self._temporario(carimbo.encode("utf-8")), caminho)
+            prefixo = _nome(spreadsheet_id, aba) + "."
+            for arquivo in os.listdir(self.pasta):
+                if arquivo.startswith(prefixo) and arquivo.endswith(".arrow") and arquivo != atual:
+                    try:
+                        os.remove(os.path.join(self.pasta, arquivo))
+                    except FileNotFoundError: # Outra réplica apagou antes
+                        pass
+        except OSError as err:
+            raise ErroCacheCompartilhado(err) from err
+
+    def ler_tabela(self, spreadsheet_id, aba, carimbo):
+        """DataFrame gravado com 'carimbo', ou None se nenhuma réplica gravou essa versão."""
+        try:
+            with pa.memory_map(self._tabela(spreadsheet_id, aba, carimbo)) as origem:
+                return _para_dataframe(origem)
+        except FileNotFoundError:
+            return None
+        except (OSError, pa.ArrowInvalid) as err:
+            raise ErroCacheCompartilhado(err) from err
+
+    def gravar_tabela(self, spreadsheet_id, aba, carimbo, df):
+        """Grava a tabela da versão 'carimbo' (pode vir antes do carimbo ser publicado)."""
+        try:
+            os.replace(self._temporario(_para_bytes(df)), self._tabela(spreadsheet_id, aba, carimbo))
+        except (OSError, pa.ArrowInvalid) as err:
+            raise ErroCacheCompartilhado(err) from err
+
+
+# --- Servidor com protocolo do Redis ---
+
+def _comando_resp(*partes):
+    saida = [b"*%d\r\n" % len(partes)]
+    for parte in partes:
+        dado = parte if isinstance(parte, (bytes, memoryview, pa.Buffer)) else str(parte).encode("utf-8")
+        saida += [b"$%d\r\n" % len(memoryview(dado)), bytes(dado), b"\r\n"]
+    return b"".join(saida)
+
+
+def _ler_resposta(arquivo):
+    linha = arquivo.readline()
+    if not linha:
+        raise ConnectionError("conexão fechada pelo servidor")
+    tipo, resto = linha[:1], linha[1:-2]
+    if tipo == b"+":
+        return resto.decode("utf-8")
+    if tipo == b"-":
+        raise ErroCacheCompartilhado(resto.decode("utf-8"))
+    if tipo == b":":
+        return int(resto)
+    if tipo == b"$":
+        tamanho = int(resto)
+        if tamanho < 0:
+            return None
+        dado = arquivo.read(tamanho + 2)
+        return dado[:-2]
+    if tipo == b"*":
+        quantidade = int(resto)
+        return None if quantidade < 0 else [_ler_resposta(arquivo) for _ in range(quantidade)]
+    raise ErroCacheCompartilhado(f"resposta inesperada do servidor: {linha[:40]!r}")
+
+
+class CacheRedis:
+    """Carimbos e tabelas em um servidor Redis (ou qualquer um que fale o mesmo protocolo)."""
+
+    def __init__(self, host="localhost", porta=6379, banco=0, senha=None):
+        self.endereco = (host, porta)
+        self.banco = banco
+        self.senha = senha
+        self._lock = threading.Lock() # Uma conexão por processo, um comando por vez
+        self._conexao = None
+        self._comando("PING")
+
+    def _conectar(self):
+        conexao = socket.create_connection(self.endereco, timeout=TEMPO_LIMITE)
+        arquivo = conexao.makefile("rb")
+        for partes in ((("AUTH", self.senha),) if self.senha else ()) + ((("SELECT", self.banco),) if self.banco else ()):
+            conexao.sendall(_comando_resp(*partes))
+            _ler_resposta(arquivo)
+        return conexao, arquivo
+
+    def _comando(self, *partes):
+        with self._lock:
+            for tentativa in range(2): # Reconecta uma vez se a conexão antiga caiu
+                try:
+                    if self._conexao is None:
+                        self._conexao = self._conectar()
+                    conexao, arquivo = self._conexao
+                    conexao.sendall(_comando_resp(*partes))
+                    return _ler_resposta(arquivo)
+                except (OSError, ConnectionError) as err:
+                    if self._conexao is not None:
+                        self._conexao[0].close()
+                    self._conexao = None
+                    if tentativa:
+                        raise ErroCacheCompartilhado(f"servidor {self.endereco[0]}:{self.endereco[1]}: {err}") from err
+
+    def _chave(self, spreadsheet_id, aba, *partes):
+        return ":".join((PREFIXO, _nome(spreadsheet_id, aba)) + partes)
+
+    def carimbo_atual(self, spreadsheet_id, aba, padrao):
+        chave = self._chave(spreadsheet_id, aba, "carimbo")
+        self._comando("SET", chave, padrao, "NX")
+        carimbo = self._comando("GET", chave)
+        return padrao if carimbo is None else carimbo.decode("utf-8")
+
+    def publicar(self, spreadsheet_id, aba, carimbo):
+        anterior = self._comando("GET", self._chave(spreadsheet_id, aba, "carimbo"))
+        self._comando("SET", self._chave(spreadsheet_id, aba, "carimbo"), carimbo)
+        if anterior is not None and anterior.decode("utf-8") != carimbo:
+            self._comando("DEL", self._chave(spreadsheet_id, aba, "tabela", anterior.decode("utf-8")))
+
+    def ler_tabela(self, spreadsheet_id, aba, carimbo):
+        dado = self._comando("GET", self._chave(spreadsheet_id, aba, "tabela", carimbo))
+        if dado is None:
+            return None
+        try:
+            return _para_dataframe(pa.py_buffer(dado))
+        except pa.ArrowInvalid as err:
+            raise ErroCacheCompartilhado(err) from err
+
+    def gravar_tabela(self, spreadsheet_id, aba, carimbo, df):
+        self._comando("SET", self._chave(spreadsheet_id, aba, "tabela", carimbo), _para_bytes(df), "EX", VALIDADE_TABELA)
+
+
+def abrir(endereco):
+    """Abre o cache do endereço: 'redis://...' ou o caminho de uma pasta."""
+    url = urlparse(endereco)
+    if url.scheme == "redis":
+        banco = url.path.strip("/")
+        return CacheRedis(url.hostname or "localhost", url.port or 6379, int(banco or 0),
+                          unquote(url.password) if url.password else None)
+    if url.scheme == "file":
+        return CacheEmArquivo(unquote(url.path))
+    return CacheEmArquivo(endereco)
+
+
+# --- Servidor local para testes ---
+
+class ServidorRespLocal(socketserver.ThreadingTCPServer):
+    """
+    Servidor mínimo com o protocolo do Redis (PING, GET, SET [NX] [EX], DEL, AUTH, SELECT),
+    com os dados só em memória. Serve para rodar várias réplicas numa máquina sem Redis.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, endereco=("127.0.0.1", 6379)):
+        self.dados = {}
+        self.lock = threading.Lock()
+        super().__init__(endereco, _AtendimentoResp)
+
+    def executar(self, nome, argumentos):
+        with self.lock:
+            if nome in ("PING", "AUTH", "SELECT"):
+                return "PONG" if nome == "PING" else "OK"
+            if nome == "GET":
+                return self.dados.get(argumentos[0])
+            if nome == "SET":
+                opcoes = [a.upper() for a in argumentos[2:]] # EX é aceito e ignorado
+                if b"NX" in opcoes and argumentos[0] in self.dados:
+                    return None
+                self.dados[argumentos[0]] = argumentos[1]
+                return "OK"
+            if nome == "DEL":
+                return sum(self.dados.pop(chave, None) is not None for chave in argumentos)
+        raise ErroCacheCompartilhado(f"ERR comando '{nome}' não suportado")
+
+
+class _AtendimentoResp(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                comando = _ler_resposta(self.rfile)
+            except (ConnectionError, ValueError, ErroCacheCompartilhado):
+                return
+            try:
+                resposta = self.server.executar(comando[0].decode("utf-8").upper(), comando[1:])
+            except ErroCacheCompartilhado as err:
+                self.wfile.write(b"-" + str(err).encode("utf-8") + b"\r\n")
+                continue
+            if resposta is None:
+                self.wfile.write(b"$-1\r\n")
+            elif isinstance(resposta, int):
+                self.wfile.write(b":%d\r\n" % resposta)
+            elif isinstance(resposta, str):
+                self.wfile.write(b"+" + resposta.encode("utf-8") + b"\r\n")
+            else:
+                self.wfile.write(b"$%d\r\n" % len(resposta) + resposta + b"\r\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "servidor":
+        raise SystemExit("uso: python cache_compartilhado.py servidor [porta]")
+    porta = int(sys.argv[2]) if len(sys.argv) > 2 else 6379
+    with ServidorRespLocal(("127.0.0.1", porta)) as servidor:
+        print(f"Servidor local (protocolo Redis) em 127.0.0.1:{porta} - Ctrl+C para parar")
+        servidor.serve_forever()
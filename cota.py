@@ -0,0 +1,185 @@
+# cota.py
+"""
+Cliente do Google Sheets que respeita a cota da API.
+
+ClienteComCota embrulha o 'service' do googleapiclient: cada execute() passa
+por um balde de fichas (um para leituras e outro para escritas, no tamanho da
+cota por minuto) e, se a API responder 429 ou 5xx, tenta de novo com espera
+exponencial com jitter até o prazo da requisição. Sob carga as páginas ficam
+mais lentas em vez de mostrar erro e perder as alterações do usuário.
+
+As escritas estruturais (spreadsheets().batchUpdate: inserir/apagar linhas) e
+o values().append (acrescenta as linhas de novo a cada tentativa) não são
+idempotentes, então só são repetidas em 429, quando a API garante que nada foi
+aplicado.
+
+O httplib2 usado pelo googleapiclient não é seguro entre threads, e a fila de
+escrita, o prefetch e as páginas usam o mesmo 'service' ao mesmo tempo: cada
+thread executa as requisições com a sua própria conexão autenticada.
+"""
+import random
+import socket
+import threading
+import time
+
+# Cota padrão do Sheets: 60 leituras e 60 escritas por minuto por usuário
+LEITURAS_POR_MINUTO = 60
+ESCRITAS_POR_MINUTO = 60
+TEMPO_LIMITE_HTTP = 30 # Segundos sem resposta até desistir de uma conexão (e tentar de novo)
+PRAZO_REQUISICAO = 45 # Segundos que uma requisição pode levar, somando esperas e tentativas
+ESPERA_INICIAL = 1.0 # Primeira espera depois de um 429/5xx (dobra a cada tentativa)
+ESPERA_MAXIMA = 16.0
+
+STATUS_REPETIR = {429, 500, 502, 503, 504}
+METODOS_ESCRITA = {"update", "batchUpdate", "append", "clear", "batchClear", "batchUpdateByDataFilter"}
+
+
+class PrazoEsgotado(TimeoutError):
+    """A requisição não coube no prazo (cota esgotada ou API indisponível por muito tempo)."""
+
+
+_local = threading.local()
+
+
+def http_da_thread(service):
+    """
+    Conexão autenticada da thread atual, com as mesmas credenciais do 'service'.
+    Retorna None para serviços sem credenciais (ex.: emuladores locais).
+    """
+    credenciais = getattr(getattr(service, "_http", None), "credentials", None)
+    if credenciais is None:
+        return None
+    if getattr(_local, "credenciais", None) is not credenciais:
+        import google_auth_httplib2
+        import httplib2
+        _local.http = google_auth_httplib2.AuthorizedHttp(credenciais, http=httplib2.Http(timeout=TEMPO_LIMITE_HTTP))
+        _local.credenciais = credenciais
+    return _local.http
+
+
+class BaldeDeFichas:
+    """Balde de fichas: 'por_minuto' fichas por minuto, acumulando até 'capacidade'."""
+
+    def __init__(self, por_minuto, capacidade=None):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = capacidade or por_minuto
+        self._fichas = float(self.capacidade)
+        self._ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def retirar(self, prazo):
+        """Espera por uma ficha até o instante 'prazo' (time.monotonic()); retorna os segundos esperados."""
+        inicio = time.monotonic()
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.capacidade, self._fichas + (agora - self._ultima) * self.taxa)
+                self._ultima = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return agora - inicio
+                espera = (1 - self._fichas) / self.taxa
+            if agora + espera > prazo:
+                raise PrazoEsgotado("Cota de requisições da API esgotada; tente novamente em instantes.")
+            time.sleep(espera)
+
+
+class _Requisicao:
+    """Requisição do googleapiclient cujo execute() passa pelo controle de cota."""
+
+    def __init__(self, cliente, request, escrita, estrutural):
+        self._cliente = cliente
+        self._request = request
+        self._escrita = escrita
+        self._estrutural = estrutural
+
+    def execute(self, **kwargs):
+        return self._cliente.executar(self._request, self._escrita, self._estrutural, **kwargs)
+
+    def __getattr__(self, nome):
+        return getattr(self._request, nome)
+
+
+class _Recurso:
+    """spreadsheets() / values(): devolve os sub-recursos e as requisições embrulhados."""
+
+    def __init__(self, cliente, recurso, nome):
+        self._cliente = cliente
+        self._recurso = recurso
+        self._nome = nome
+
+    def __getattr__(self, nome):
+        metodo = getattr(self._recurso, nome)
+        if not callable(metodo):
+            return metodo
+
+        def chamar(*args, **kwargs):
+            resultado = metodo(*args, **kwargs)
+            if not hasattr(resultado, "execute"):
+                return _Recurso(self._cliente, resultado, nome) # Sub-recurso (ex.: values())
+            escrita = nome in METODOS_ESCRITA
+            estrutural = escrita and (self._nome == "spreadsheets" or nome == "append")
+            return _Requisicao(self._cliente, resultado, escrita, estrutural)
+        return chamar
+
+
+class ClienteComCota:
+    """Embrulha o 'service' da API; o resto do código o usa exatamente como o original."""
+
+    def __init__(self, service, leituras_por_minuto=LEITURAS_POR_MINUTO,
+                 escritas_por_minuto=ESCRITAS_POR_MINUTO, prazo=PRAZO_REQUISICAO):
+        self._service = service
+        self._baldes = {False: BaldeDeFichas(leituras_por_minuto), True: BaldeDeFichas(escritas_por_minuto)}
+        self.prazo = prazo
+        self._lock = threading.Lock()
+        self._contadores = {"requisicoes": 0, "tentativas_extras": 0, "segundos_limitados": 0.0, "falhas": 0}
+
+    def spreadsheets(self):
+        return _Recurso(self, self._service.spreadsheets(), "spreadsheets")
+
+    def __getattr__(self, nome):
+        return getattr(self._service, nome)
+
+    def _contar(self, **valores):
+        with self._lock:
+            for chave, valor in valores.items():
+                self._contadores[chave] += valor
+
+    def estatisticas(self):
+        """Cópia dos contadores: requisições, tentativas extras, segundos de espera e falhas."""
+        with self._lock:
+            return dict(self._contadores)
+
+    def executar(self, request, escrita, estrutural, **kwargs):
+        from googleapiclient.errors import HttpError # Já carregado junto com o 'service'
+
+        if "http" not in kwargs:
+            http = http_da_thread(self._service)
+            if http is not None:
+                kwargs["http"] = http
+        prazo = time.monotonic() + self.prazo
+        tentativa = 0
+        while True:
+            self._contar(requisicoes=1, segundos_limitados=self._baldes[escrita].retirar(prazo))
+            try:
+                return request.execute(**kwargs)
+            except HttpError as err:
+                status = err.resp.status
+                if status not in STATUS_REPETIR or (estrutural and status != 429):
+                    self._contar(falhas=1)
+                    raise
+                erro = err
+            except (socket.timeout, ConnectionError) as err:
+                if estrutural:
+                    self._contar(falhas=1)
+                    raise
+                erro = err
+
+            # Espera exponencial com jitter completo: sessões diferentes não voltam juntas
+            espera = random.uniform(0, min(ESPERA_MAXIMA, ESPERA_INICIAL * 2 ** tentativa))
+            if time.monotonic() + espera > prazo:
+                self._contar(falhas=1)
+                raise PrazoEsgotado(f"A API continuou recusando a requisição até o fim do prazo: {erro}") from erro
+            self._contar(tentativas_extras=1, segundos_limitados=espera)
+            time.sleep(espera)
+            tentativa += 1
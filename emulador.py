@@ -0,0 +1,418 @@
+# emulador.py
+"""
+Emulador local (SQLite) da API do Google Sheets, para rodar o app sem acesso ao
+Google (rede isolada da planta) e para testes de carga com planilhas grandes.
+
+Implementa a parte da API que o app usa, com o mesmo formato de respostas:
+  spreadsheets().get / batchUpdate (updateCells, deleteDimension, insertDimension,
+  appendCells, addSheet) e values().get / batchGet / update / batchUpdate /
+  append / clear / batchClear.
+
+As células são guardadas como texto, como a API devolve (FORMATTED_VALUE). Cada
+escrita em uma aba que tem sonda de versão (sheets.SONDAS) atualiza a célula da
+sonda, então a detecção de alterações funciona como na planilha real, inclusive
+com vários processos usando o mesmo arquivo.
+
+Para usar, configure em st.secrets (ou pelas variáveis de ambiente
+SHEETS_BACKEND=emulador e SHEETS_EMULADOR=<arquivo>):
+
+    [backend]
+    tipo = "emulador"
+    caminho = "dados/planilha.sqlite3"
+
+Para popular o arquivo:
+
+    python emulador.py importar dados/planilha.sqlite3 Notas notas.csv
+    python emulador.py gerar dados/planilha.sqlite3 100000
+"""
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+EMULADOR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".emulador", "planilha.sqlite3")
+EPOCA_SHEETS = datetime(1899, 12, 30)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS abas (
+    spreadsheet_id TEXT NOT NULL,
+    aba TEXT NOT NULL,
+    sheet_id INTEGER NOT NULL,
+    revisao INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (spreadsheet_id, aba)
+);
+CREATE TABLE IF NOT EXISTS linhas (
+    spreadsheet_id TEXT NOT NULL,
+    aba TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    valores TEXT NOT NULL,
+    PRIMARY KEY (spreadsheet_id, aba, posicao)
+);
+"""
+
+_A1 = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _erro(status, mensagem):
+    return HttpError(httplib2.Response({"status": status}), json.dumps({"error": {"message": mensagem}}).encode())
+
+
+def _coluna(letras):
+    numero = 0
+    for letra in letras:
+        numero = numero * 26 + ord(letra) - 64
+    return numero - 1
+
+
+def separar_faixa(faixa):
+    """
+    'Aba', 'Aba!A1', "'Aba'!A2:C10", 'Aba!2:10' ou 'Aba!A:C' ->
+    (aba, linha_inicial, linha_final|None, coluna_inicial, coluna_final|None), base 0.
+    """
+    aba, _, a1 = faixa.partition("!")
+    aba = aba.strip("'").replace("''", "'")
+    if not a1:
+        return aba, 0, None, 0, None
+    inicio, _, fim = a1.upper().partition(":")
+    partes = []
+    for celula in (inicio, fim or inicio):
+        m = _A1.match(celula)
+        if m is None:
+            raise _erro(400, f"Unable to parse range: {faixa}")
+        partes.append((_coluna(m.group(1)) if m.group(1) else None, int(m.group(2)) - 1 if m.group(2) else None))
+    (col_ini, lin_ini), (col_fim, lin_fim) = partes
+    return aba, lin_ini or 0, lin_fim, col_ini or 0, col_fim
+
+
+def _texto_celula(celula):
+    """Texto que a API mostraria para um CellData (datas voltam para dd/mm/aaaa)."""
+    valor = (celula or {}).get("userEnteredValue", {})
+    formato = (celula or {}).get("userEnteredFormat", {}).get("numberFormat")
+    if "boolValue" in valor:
+        return "TRUE" if valor["boolValue"] else "FALSE"
+    if "numberValue" in valor:
+        numero = valor["numberValue"]
+        if formato:
+            data = EPOCA_SHEETS + timedelta(days=numero)
+            return data.strftime("%d/%m/%Y %H:%M:%S" if formato.get("type") == "DATE_TIME" else "%d/%m/%Y")
+        return str(int(numero)) if float(numero).is_integer() else str(numero)
+    return str(valor.get("stringValue", valor.get("formulaValue", "")))
+
+
+def _sem_vazios_no_fim(linha):
+    while linha and linha[-1] in ("", None):
+        linha = linha[:-1]
+    return linha
+
+
+class _Execucao:
+    def __init__(self, func):
+        self._func = func
+
+    def execute(self, **kwargs):
+        return self._func()
+
+
+class _Valores:
+    def __init__(self, emulador):
+        self._e = emulador
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return _Execucao(lambda: self._e.ler(spreadsheetId, range))
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        return _Execucao(lambda: {
+            "spreadsheetId": spreadsheetId,
+            "valueRanges": [self._e.ler(spreadsheetId, faixa) for faixa in ranges],
+        })
+
+    def update(self, spreadsheetId, range, body, **kwargs):
+        return _Execucao(lambda: self._e.escrever(spreadsheetId, [{"range": range, "values": body.get("values", [])}]))
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        return _Execucao(lambda: self._e.escrever(spreadsheetId, body.get("data", [])))
+
+    def append(self, spreadsheetId, range, body, **kwargs):
+        return _Execucao(lambda: self._e.anexar(spreadsheetId, range, body.get("values", [])))
+
+    def clear(self, spreadsheetId, range, body=None, **kwargs):
+        return _Execucao(lambda: self._e.limpar(spreadsheetId, [range]))
+
+    def batchClear(self, spreadsheetId, body, **kwargs):
+        return _Execucao(lambda: self._e.limpar(spreadsheetId, body.get("ranges", [])))
+
+
+class _Planilhas:
+    def __init__(self, emulador):
+        self._e = emulador
+
+    def values(self):
+        return _Valores(self._e)
+
+    def get(self, spreadsheetId, fields=None, **kwargs):
+        return _Execucao(lambda: self._e.propriedades(spreadsheetId))
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        return _Execucao(lambda: self._e.aplicar_requests(spreadsheetId, body.get("requests", [])))
+
+
+class EmuladorSheets:
+    """Objeto com a mesma interface do 'service' do googleapiclient, guardado em SQLite."""
+
+    def __init__(self, caminho=None, sondas=None):
+        self.caminho = caminho or EMULADOR_PATH
+        self.sondas = dict(sondas or {}) # aba -> célula da sonda (ex.: "'_controle'!B1")
+        self._local = threading.local()
+        self._lock = threading.Lock() # Uma escrita por vez, como a API faz na mesma planilha
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_ESQUEMA)
+
+    def spreadsheets(self):
+        return _Planilhas(self)
+
+    def _conn(self):
+        """Uma conexão por thread (o sqlite3 não compartilha conexões entre threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Abas ---
+
+    def _sheet_id(self, conn, spreadsheet_id, aba, criar=False):
+        linha = conn.execute(
+            "SELECT sheet_id FROM abas WHERE spreadsheet_id = ? AND aba = ?", (spreadsheet_id, aba)
+        ).fetchone()
+        if linha is not None:
+            return linha[0]
+        if not criar:
+            raise _erro(400, f"Unable to parse range: {aba}")
+        proximo = conn.execute("SELECT COALESCE(MAX(sheet_id) + 1, 0) FROM abas WHERE spreadsheet_id = ?",
+                               (spreadsheet_id,)).fetchone()[0]
+        conn.execute("INSERT INTO abas (spreadsheet_id, aba, sheet_id) VALUES (?, ?, ?)", (spreadsheet_id, aba, proximo))
+        return proximo
+
+    def _aba_por_id(self, conn, spreadsheet_id, sheet_id):
+        linha = conn.execute("SELECT aba FROM abas WHERE spreadsheet_id = ? AND sheet_id = ?",
+                             (spreadsheet_id, sheet_id)).fetchone()
+        if linha is None:
+            raise _erro(400, f"No grid with id: {sheet_id}")
+        return linha[0]
+
+    def criar_aba(self, spreadsheet_id, aba, linhas=()):
+        """Cria (ou substitui) a aba com as linhas de texto dadas (a primeira é o cabeçalho)."""
+        with self._lock, self._conn() as conn:
+            self._sheet_id(conn, spreadsheet_id, aba, criar=True)
+            conn.execute("DELETE FROM linhas WHERE spreadsheet_id = ? AND aba = ?", (spreadsheet_id, aba))
+            conn.executemany(
+                "INSERT INTO linhas (spreadsheet_id, aba, posicao, valores) VALUES (?, ?, ?, ?)",
+                ((spreadsheet_id, aba, i, json.dumps([str(v) for v in l], ensure_ascii=False)) for i, l in enumerate(linhas)),
+            )
+            self._nova_revisao(conn, spreadsheet_id, aba)
+
+    def propriedades(self, spreadsheet_id):
+        abas = self._conn().execute(
+            "SELECT a.aba, a.sheet_id, (SELECT COALESCE(MAX(posicao) + 1, 0) FROM linhas l "
+            " WHERE l.spreadsheet_id = a.spreadsheet_id AND l.aba = a.aba) "
+            "FROM abas a WHERE a.spreadsheet_id = ? ORDER BY a.sheet_id", (spreadsheet_id,)
+        ).fetchall()
+        return {"spreadsheetId": spreadsheet_id, "sheets": [
+            {"properties": {"sheetId": sheet_id, "title": aba, "gridProperties": {"rowCount": max(total, 1000)}}}
+            for aba, sheet_id, total in abas
+        ]}
+
+    def _nova_revisao(self, conn, spreadsheet_id, aba):
+        """Conta a escrita na aba e atualiza a célula da sonda dela, se houver."""
+        conn.execute("UPDATE abas SET revisao = revisao + 1 WHERE spreadsheet_id = ? AND aba = ?", (spreadsheet_id, aba))
+        if aba not in self.sondas:
+            return
+        revisao = conn.execute("SELECT revisao FROM abas WHERE spreadsheet_id = ? AND aba = ?",
+                               (spreadsheet_id, aba)).fetchone()[0]
+        aba_sonda, lin, _, col, _ = separar_faixa(self.sondas[aba])
+        self._sheet_id(conn, spreadsheet_id, aba_sonda, criar=True)
+        self._gravar_bloco(conn, spreadsheet_id, aba_sonda, lin, col, [[str(revisao)]])
+
+    # --- Linhas ---
+
+    def _linhas(self, conn, spreadsheet_id, aba, inicio, fim):
+        """Dicionário posição -> lista de células das linhas entre 'inicio' e 'fim' (inclusive)."""
+        fim = fim if fim is not None else 2**62
+        return {p: json.loads(v) for p, v in conn.execute(
+            "SELECT posicao, valores FROM linhas WHERE spreadsheet_id = ? AND aba = ? AND posicao BETWEEN ? AND ?",
+            (spreadsheet_id, aba, inicio, fim),
+        )}
+
+    def _gravar_bloco(self, conn, spreadsheet_id, aba, lin, col, valores):
+        existentes = self._linhas(conn, spreadsheet_id, aba, lin, lin + len(valores) - 1)
+        gravar, apagar = [], []
+        for i, novos in enumerate(valores):
+            linha = existentes.get(lin + i, [])
+            linha = linha + [""] * (col + len(novos) - len(linha))
+            linha[col:col + len(novos)] = ["" if v is None else str(v) for v in novos]
+            linha = _sem_vazios_no_fim(linha)
+            if linha:
+                gravar.append((spreadsheet_id, aba, lin + i, json.dumps(linha, ensure_ascii=False)))
+            else:
+                apagar.append((spreadsheet_id, aba, lin + i))
+        conn.executemany("INSERT OR REPLACE INTO linhas (spreadsheet_id, aba, posicao, valores) VALUES (?, ?, ?, ?)", gravar)
+        conn.executemany("DELETE FROM linhas WHERE spreadsheet_id = ? AND aba = ? AND posicao = ?", apagar)
+        return sum(len(v) for v in valores)
+
+    def _deslocar(self, conn, spreadsheet_id, aba, a_partir, deslocamento):
+        """Soma 'deslocamento' à posição das linhas >= 'a_partir' (em dois passos, por causa da chave)."""
+        conn.execute(
+            "UPDATE linhas SET posicao = -(posicao + ?) - 1 WHERE spreadsheet_id = ? AND aba = ? AND posicao >= ?",
+            (deslocamento, spreadsheet_id, aba, a_partir),
+        )
+        conn.execute("UPDATE linhas SET posicao = -posicao - 1 WHERE spreadsheet_id = ? AND aba = ? AND posicao < 0",
+                     (spreadsheet_id, aba))
+
+    def _ultima_linha(self, conn, spreadsheet_id, aba):
+        return conn.execute("SELECT COALESCE(MAX(posicao), -1) FROM linhas WHERE spreadsheet_id = ? AND aba = ?",
+                            (spreadsheet_id, aba)).fetchone()[0]
+
+    # --- values() ---
+
+    def ler(self, spreadsheet_id, faixa):
+        conn = self._conn()
+        aba, lin, lin_fim, col, col_fim = separar_faixa(faixa)
+        self._sheet_id(conn, spreadsheet_id, aba)
+        existentes = self._linhas(conn, spreadsheet_id, aba, lin, lin_fim)
+        resposta = {"range": faixa, "majorDimension": "ROWS"}
+        if not existentes:
+            return resposta
+        valores = []
+        for posicao in range(lin, max(existentes) + 1):
+            linha = existentes.get(posicao, [])
+            valores.append(_sem_vazios_no_fim(linha[col:None if col_fim is None else col_fim + 1]))
+        while valores and not valores[-1]:
+            valores.pop()
+        if valores:
+            resposta["values"] = valores
+        return resposta
+
+    def escrever(self, spreadsheet_id, data):
+        total, abas = 0, set()
+        with self._lock, self._conn() as conn:
+            for item in data:
+                aba, lin, _, col, _ = separar_faixa(item["range"])
+                self._sheet_id(conn, spreadsheet_id, aba)
+                total += self._gravar_bloco(conn, spreadsheet_id, aba, lin, col, item.get("values", []))
+                abas.add(aba)
+            for aba in abas:
+                self._nova_revisao(conn, spreadsheet_id, aba)
+        return {"spreadsheetId": spreadsheet_id, "totalUpdatedCells": total, "totalUpdatedSheets": len(abas)}
+
+    def anexar(self, spreadsheet_id, faixa, valores):
+        aba, _, _, col, _ = separar_faixa(faixa)
+        with self._lock, self._conn() as conn:
+            self._sheet_id(conn, spreadsheet_id, aba)
+            inicio = self._ultima_linha(conn, spreadsheet_id, aba) + 1
+            total = self._gravar_bloco(conn, spreadsheet_id, aba, inicio, col, valores)
+            self._nova_revisao(conn, spreadsheet_id, aba)
+        return {"spreadsheetId": spreadsheet_id, "updates": {"updatedRows": len(valores), "updatedCells": total}}
+
+    def limpar(self, spreadsheet_id, faixas):
+        with self._lock, self._conn() as conn:
+            for faixa in faixas:
+                aba, lin, lin_fim, col, col_fim = separar_faixa(faixa)
+                self._sheet_id(conn, spreadsheet_id, aba)
+                ultima = self._ultima_linha(conn, spreadsheet_id, aba)
+                fim = ultima if lin_fim is None else min(lin_fim, ultima)
+                if fim < lin:
+                    continue
+                existentes = self._linhas(conn, spreadsheet_id, aba, lin, fim)
+                largura = max((len(l) for l in existentes.values()), default=0)
+                ate = largura if col_fim is None else col_fim + 1
+                if ate > col:
+                    self._gravar_bloco(conn, spreadsheet_id, aba, lin, col, [[""] * (ate - col)] * (fim - lin + 1))
+                self._nova_revisao(conn, spreadsheet_id, aba)
+        return {"spreadsheetId": spreadsheet_id, "clearedRanges": list(faixas)}
+
+    # --- spreadsheets().batchUpdate ---
+
+    def aplicar_requests(self, spreadsheet_id, requests):
+        respostas, abas = [], set()
+        with self._lock, self._conn() as conn:
+            for request in requests:
+                tipo, corpo = next(iter(request.items()))
+                resposta = {}
+                if tipo == "updateCells":
+                    aba = self._aba_por_id(conn, spreadsheet_id, corpo["start"]["sheetId"])
+                    valores = [[_texto_celula(c) for c in linha.get("values", [])] for linha in corpo["rows"]]
+                    self._gravar_bloco(conn, spreadsheet_id, aba, corpo["start"]["rowIndex"], corpo["start"]["columnIndex"], valores)
+                elif tipo in ("deleteDimension", "insertDimension"):
+                    faixa = corpo["range"]
+                    if faixa.get("dimension") != "ROWS":
+                        raise _erro(400, f"{tipo} só é suportado para ROWS no emulador.")
+                    aba = self._aba_por_id(conn, spreadsheet_id, faixa["sheetId"])
+                    inicio, fim = faixa["startIndex"], faixa["endIndex"]
+                    if tipo == "deleteDimension":
+                        conn.execute(
+                            "DELETE FROM linhas WHERE spreadsheet_id = ? AND aba = ? AND posicao >= ? AND posicao < ?",
+                            (spreadsheet_id, aba, inicio, fim),
+                        )
+                        self._deslocar(conn, spreadsheet_id, aba, fim, inicio - fim)
+                    else:
+                        self._deslocar(conn, spreadsheet_id, aba, inicio, fim - inicio)
+                elif tipo == "appendCells":
+                    aba = self._aba_por_id(conn, spreadsheet_id, corpo["sheetId"])
+                    valores = [[_texto_celula(c) for c in linha.get("values", [])] for linha in corpo["rows"]]
+                    inicio = self._ultima_linha(conn, spreadsheet_id, aba) + 1
+                    self._gravar_bloco(conn, spreadsheet_id, aba, inicio, 0, valores)
+                elif tipo == "addSheet":
+                    aba = corpo["properties"]["title"]
+                    sheet_id = self._sheet_id(conn, spreadsheet_id, aba, criar=True)
+                    resposta = {"addSheet": {"properties": {"sheetId": sheet_id, "title": aba}}}
+                else:
+                    raise _erro(400, f"Request '{tipo}' não é suportado pelo emulador.")
+                abas.add(aba)
+                respostas.append(resposta)
+            for aba in abas:
+                self._nova_revisao(conn, spreadsheet_id, aba)
+        return {"spreadsheetId": spreadsheet_id, "replies": respostas}
+
+
+# --- Linha de comando ---
+
+def _importar_csv(emulador, spreadsheet_id, aba, arquivo):
+    with open(arquivo, newline="", encoding="utf-8-sig") as f:
+        linhas = list(csv.reader(f))
+    emulador.criar_aba(spreadsheet_id, aba, linhas)
+    print(f"{len(linhas) - 1} linhas importadas para '{aba}'.")
+
+
+def _gerar(emulador, spreadsheet_id, n):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+    from planilha_falsa import gerar_abas
+    for aba, linhas in gerar_abas(n).items():
+        emulador.criar_aba(spreadsheet_id, aba, linhas)
+        print(f"{len(linhas) - 1} linhas sintéticas em '{aba}'.")
+
+
+if __name__ == "__main__":
+    from sheets import SPREADSHEET_ID, SONDAS
+
+    uso = ("Uso: python emulador.py importar <arquivo.sqlite3> <aba> <arquivo.csv>\n"
+           "     python emulador.py gerar <arquivo.sqlite3> <linhas>")
+    if len(sys.argv) < 4 or sys.argv[1] not in ("importar", "gerar"):
+        print(uso)
+        sys.exit(1)
+    emulador = EmuladorSheets(sys.argv[2], sondas=SONDAS)
+    if sys.argv[1] == "importar" and len(sys.argv) == 5:
+        _importar_csv(emulador, SPREADSHEET_ID, sys.argv[3], sys.argv[4])
+    elif sys.argv[1] == "gerar":
+        _gerar(emulador, SPREADSHEET_ID, int(sys.argv[3]))
+    else:
+        print(uso)
+        sys.exit(1)
@@ -0,0 +1,141 @@
+# fila_escrita.py
+"""
+Fila de escrita única por processo para as assinaturas da aba 'Notas'.
+
+Em vez de cada sessão mandar o seu próprio values().batchUpdate, as páginas
+entregam as células alteradas para a fila e esperam a resposta. A fila junta
+tudo o que chegar dentro de uma janela curta (JANELA_SEGUNDOS) e envia um
+único batchUpdate por aba, o que evita escritas concorrentes e economiza a
+cota de escritas por minuto da API em horários de pico (ex.: fechamento do mês).
+Cada sessão recebe de volta o resultado (ou o erro) da sua parte.
+
+Os ranges são posições de linha tiradas de DataFrames que podem estar até uma
+consulta da sonda atrasados. Logo antes de enviar, a fila relê a coluna NF (uma
+leitura por lote) e recusa, com AbaAlterada, os pedidos cujas linhas mudaram de
+posição na planilha; os demais pedidos do lote seguem normalmente.
+"""
+import threading
+import time
+
+import streamlit as st
+
+from sheets import escrever_celulas, conferir_chaves, invalidar_aba, AbaAlterada, SPREADSHEET_ID
+
+JANELA_SEGUNDOS = 1.5 # Tempo que a fila espera por outras sessões antes de enviar
+ESPERA_MAXIMA = 60 # Segundos que uma página espera pela resposta da fila
+
+
+class Pedido:
+    """Células de uma sessão na fila; 'aguardar()' devolve o resultado ou levanta o erro."""
+
+    def __init__(self, data, conferir=None):
+        self.data = data
+        self.conferir = conferir
+        self.resultado = None
+        self.erro = None
+        self._pronto = threading.Event()
+
+    def concluir(self, resultado=None, erro=None):
+        self.resultado, self.erro = resultado, erro
+        self._pronto.set()
+
+    def aguardar(self, timeout=ESPERA_MAXIMA):
+        if not self._pronto.wait(timeout):
+            raise TimeoutError("A fila de escrita não respondeu a tempo.")
+        if self.erro is not None:
+            raise self.erro
+        return self.resultado
+
+
+def _erro_de_requisicao(err):
+    """True se a API recusou o conteúdo do lote (400, ex.: um range inválido), e não a cota ou a conexão."""
+    from googleapiclient.errors import HttpError # Já carregado junto com o 'service'
+    return isinstance(err, HttpError) and err.resp.status == 400
+
+
+def _celulas(data):
+    return sum(len(linha) for item in data for linha in item["values"])
+
+
+class FilaEscrita:
+    """Junta os pedidos de todas as sessões e envia um batchUpdate por aba a cada janela."""
+
+    def __init__(self, janela=JANELA_SEGUNDOS):
+        self.janela = janela
+        self._lock = threading.Lock()
+        self._pedidos = {} # (service, planilha, aba) -> [Pedido]
+        self._acordar = threading.Event()
+        self._thread = threading.Thread(target=self._laco, name="fila-escrita", daemon=True)
+        self._thread.start()
+
+    def enviar(self, service, sheet_name, data, spreadsheet_id=SPREADSHEET_ID, conferir=None):
+        """
+        Coloca os ranges A1 'data' (formato do values().batchUpdate) na fila e retorna o Pedido.
+        'conferir' (saída de sheets.chaves_nf) são as linhas que os ranges alteram, conferidas
+        pela coluna NF antes do envio.
+        """
+        pedido = Pedido(data, conferir)
+        with self._lock:
+            self._pedidos.setdefault((service, spreadsheet_id, sheet_name), []).append(pedido)
+        self._acordar.set()
+        return pedido
+
+    def _laco(self):
+        while True:
+            self._acordar.wait()
+            time.sleep(self.janela) # Dá tempo para as outras sessões entrarem no mesmo lote
+            with self._lock:
+                self._acordar.clear()
+                lotes, self._pedidos = self._pedidos, {}
+            for (service, spreadsheet_id, sheet_name), pedidos in lotes.items():
+                self._gravar(service, spreadsheet_id, sheet_name, pedidos)
+
+    def _gravar(self, service, spreadsheet_id, sheet_name, pedidos):
+        """
+        Envia os pedidos que conferem em um único batchUpdate. Se a API recusar o lote (400),
+        tenta cada pedido sozinho para achar o culpado. Cota ou prazo esgotados derrubam o lote
+        todo: repetir pedido a pedido multiplicaria as chamadas e seguraria a fila (e as páginas
+        já teriam desistido de esperar).
+        """
+        try:
+            pedidos = self._conferir(service, spreadsheet_id, sheet_name, pedidos)
+        except Exception as err: # Sem conferir, nenhum pedido é enviado
+            for pedido in pedidos:
+                pedido.concluir(erro=err)
+            return
+        if not pedidos:
+            return
+        try:
+            self._escrever(service, spreadsheet_id, sheet_name, pedidos)
+        except Exception as err:
+            if len(pedidos) == 1 or not _erro_de_requisicao(err):
+                for pedido in pedidos:
+                    pedido.concluir(erro=err)
+                return
+            for pedido in pedidos:
+                try:
+                    self._escrever(service, spreadsheet_id, sheet_name, [pedido])
+                except Exception as err_pedido:
+                    pedido.concluir(erro=err_pedido)
+
+    def _conferir(self, service, spreadsheet_id, sheet_name, pedidos):
+        """Recusa os pedidos cujas linhas mudaram de posição na planilha e retorna os demais."""
+        conferem = conferir_chaves(service, sheet_name, [p.conferir for p in pedidos], spreadsheet_id)
+        if all(conferem):
+            return pedidos
+        invalidar_aba(sheet_name, spreadsheet_id) # As páginas recarregam a aba já com as linhas novas
+        for pedido, confere in zip(pedidos, conferem):
+            if not confere:
+                pedido.concluir(erro=AbaAlterada(sheet_name))
+        return [p for p, confere in zip(pedidos, conferem) if confere]
+
+    def _escrever(self, service, spreadsheet_id, sheet_name, pedidos):
+        data = [item for pedido in pedidos for item in pedido.data]
+        escrever_celulas(service, sheet_name, data, spreadsheet_id)
+        for pedido in pedidos:
+            pedido.concluir({"celulas": _celulas(pedido.data), "sessoes_no_lote": len(pedidos)})
+
+
+@st.cache_resource # Uma única fila (e uma thread) por processo
+def get_fila_escrita():
+    return FilaEscrita()
@@ -0,0 +1,104 @@
+# medicao.py
+"""
+Medição de tempo das etapas quentes: leitura da API, conversão dos DataFrames,
+renderização do editor/gráficos e escrita na planilha.
+
+    with medir("api.get", aba="Notas") as m:
+        ...
+        m["celulas"] = 1234 # contadores de tamanho entram no mesmo registro
+
+Cada registro vai como uma linha JSON para um log local com rotação (ARQUIVO_LOG)
+e, quando a medição roda dentro de uma sessão do Streamlit, também para a lista
+da sessão mostrada no painel de medições (só para o administrador).
+Medições feitas em threads de fundo (prefetch, fila de escrita, blocos da carga)
+vão só para o log.
+"""
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+ARQUIVO_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "medicoes.log")
+TAMANHO_MAXIMO_LOG = 5 * 2**20 # Bytes por arquivo antes de rodar
+ARQUIVOS_ANTIGOS = 3 # Quantos arquivos rodados manter
+REGISTROS_POR_SESSAO = 200 # Registros guardados por sessão para o painel
+CHAVE_SESSAO = "medicoes"
+ADM_USERNAME = "admin"
+
+
+@st.cache_resource # Um único logger (e arquivo) por processo
+def _logger():
+    logger = logging.getLogger("medicoes")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    try:
+        os.makedirs(os.path.dirname(ARQUIVO_LOG), exist_ok=True)
+        handler = RotatingFileHandler(ARQUIVO_LOG, maxBytes=TAMANHO_MAXIMO_LOG,
+                                      backupCount=ARQUIVOS_ANTIGOS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    except OSError:
+        logger.addHandler(logging.NullHandler()) # Sem disco gravável: segue só com o painel
+    return logger
+
+
+def _registrar(registro):
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is not None:
+        registro["sessao"] = ctx.session_id[:8]
+        registro["usuario"] = st.session_state.get("logged_in_user")
+        registros = st.session_state.setdefault(CHAVE_SESSAO, [])
+        registros.append(registro)
+        del registros[:-REGISTROS_POR_SESSAO]
+    _logger().info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def medir(etapa, **contadores):
+    """Mede o bloco como 'etapa'. O dict devolvido recebe contadores (linhas, células...)."""
+    registro = {"etapa": etapa, **contadores}
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    except Exception as err:
+        registro["erro"] = type(err).__name__
+        raise
+    finally:
+        registro["segundos"] = round(time.perf_counter() - inicio, 4)
+        registro["quando"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        _registrar(registro)
+
+
+def cronometrado(etapa):
+    """Decorator: mede cada chamada da função como 'etapa'."""
+    def decorador(func):
+        @functools.wraps(func)
+        def medida(*args, **kwargs):
+            with medir(etapa):
+                return func(*args, **kwargs)
+        return medida
+    return decorador
+
+
+def mostrar_painel_medicoes(usuario_admin=ADM_USERNAME):
+    """Painel na barra lateral com as medições desta sessão (só para o administrador)."""
+    if st.session_state.get("logged_in_user") != usuario_admin:
+        return
+    registros = st.session_state.get(CHAVE_SESSAO)
+    with st.sidebar.expander("⏱️ Medições desta sessão"):
+        if not registros:
+            st.caption("Nenhuma medição ainda.")
+            return
+        df = pd.DataFrame(registros)
+        resumo = df.groupby("etapa")["segundos"].agg(["count", "mean", "max", "sum"]).sort_values("sum", ascending=False)
+        st.dataframe(resumo.round(3), use_container_width=True)
+        colunas = [c for c in ("quando", "etapa", "segundos", "aba", "linhas", "celulas", "erro") if c in df.columns]
+        st.dataframe(df[colunas].iloc[::-1], hide_index=True, use_container_width=True)
+        st.caption(f"Log completo em {ARQUIVO_LOG}")
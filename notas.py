@@ -0,0 +1,28 @@
+# notas.py
+"""Regras das notas que não dependem da interface (usadas pelas páginas e pelos benchmarks)."""
+from datetime import datetime
+
+import pandas as pd
+
+from sheets import COLUNA_ASSINATURA, COLUNA_GESTOR_ASSINATURA
+
+
+def aplicar_assinaturas(df_original, edited_df, agora=None):
+    """
+    Aplica as marcações de 'Assinar?' do editor ao DataFrame completo, de uma vez só.
+    As linhas recém-assinadas (marcadas e ainda sem GESTORASSINATURA) recebem todas o
+    mesmo horário 'agora'. Retorna uma cópia; 'df_original' não é alterado.
+    """
+    agora = pd.Timestamp(agora or datetime.now())
+    # Só as duas colunas alteradas são copiadas; as demais continuam as de 'df_original'
+    df_para_salvar = df_original.copy(deep=False)
+    for coluna in (COLUNA_ASSINATURA, COLUNA_GESTOR_ASSINATURA):
+        df_para_salvar[coluna] = df_original[coluna].copy()
+    indices = edited_df.index
+
+    marcadas = edited_df[COLUNA_ASSINATURA].fillna(False).astype(bool).to_numpy()
+    sem_assinatura = df_para_salvar.loc[indices, COLUNA_GESTOR_ASSINATURA].isna().to_numpy()
+
+    df_para_salvar.loc[indices[marcadas & sem_assinatura], COLUNA_GESTOR_ASSINATURA] = agora
+    df_para_salvar.loc[indices, COLUNA_ASSINATURA] = marcadas
+    return df_para_salvar
@@ -0,0 +1,78 @@
+# prefetch.py
+"""
+Atualizador em segundo plano das abas da planilha.
+
+Uma única thread por processo do servidor confere a sonda de versão das abas
+a cada INTERVALO_ATUALIZACAO segundos (e logo depois de qualquer escrita) e
+já deixa a nova versão carregada no cache compartilhado. Assim as páginas
+leem sempre do cache e nunca esperam pela planilha durante um rerun.
+"""
+import threading
+import time
+
+import streamlit as st
+
+import sheets
+
+INTERVALO_ATUALIZACAO = 30 # Segundos entre verificações
+ABAS_PREFETCH = (sheets.ABA_NOTAS, sheets.ABA_DEVOLUCAO)
+
+
+def _atualizar(service, estado):
+    """Laço da thread: confere cada aba, aquece o cache e registra o horário."""
+    while True:
+        estado["acordar"].clear()
+        for aba in ABAS_PREFETCH:
+            try:
+                # Sem 'forcar': o intervalo da sonda já é o deste laço (e uma escrita o zera), e
+                # as abas sem sonda continuam valendo por IDADE_MAXIMA_SNAPSHOT segundos
+                sheets.verificar_alteracoes(service, aba, aquecer=True)
+                # Garante a versão atual em cache (ex.: logo após uma escrita)
+                if sheets.get_tabela_sheets(service, aba) is None:
+                    raise RuntimeError("não foi possível carregar os dados")
+                estado["abas"][aba] = {"atualizado_em": time.time(), "erro": None}
+            except Exception as err:
+                anterior = estado["abas"].get(aba, {})
+                estado["abas"][aba] = {"atualizado_em": anterior.get("atualizado_em"), "erro": str(err)}
+        estado["acordar"].wait(INTERVALO_ATUALIZACAO)
+
+
+@st.cache_resource # Uma única thread por processo
+def iniciar_prefetch(_service):
+    """Inicia a thread de atualização (só na primeira chamada do processo)."""
+    estado = {"acordar": threading.Event(), "abas": {}}
+    thread = threading.Thread(target=_atualizar, args=(_service, estado), name="prefetch-planilhas", daemon=True)
+    thread.start()
+    sheets.registrar_prefetch(thread, estado["acordar"])
+    return estado
+
+
+def status_aba(_service, aba):
+    """
+    Retorna (atualizado_em, idade_em_segundos, erro) da última atualização da aba,
+    ou (None, None, None) se o prefetch ainda não rodou.
+    """
+    info = iniciar_prefetch(_service)["abas"].get(aba)
+    if not info or info["atualizado_em"] is None:
+        return None, None, info["erro"] if info else None
+    return info["atualizado_em"], time.time() - info["atualizado_em"], info["erro"]
+
+
+def mostrar_status(_service, aba):
+    """Mostra na barra lateral há quanto tempo os dados da aba foram atualizados."""
+    atualizado_em, idade, erro = status_aba(_service, aba)
+    if atualizado_em is None:
+        st.sidebar.caption("🕒 Atualizando dados da planilha...")
+    else:
+        horario = time.strftime("%H:%M:%S", time.localtime(atualizado_em))
+        st.sidebar.caption(f"🕒 Dados conferidos às {horario} (há {idade:.0f}s)")
+    if erro:
+        st.sidebar.warning(f"Falha na última atualização: {erro}")
+    estatisticas = getattr(_service, "estatisticas", None)
+    if estatisticas is not None:
+        contadores = estatisticas()
+        if contadores["tentativas_extras"] or contadores["segundos_limitados"] >= 1:
+            st.sidebar.caption(
+                f"⏳ Cota da API: {contadores['tentativas_extras']} novas tentativas, "
+                f"{contadores['segundos_limitados']:.0f}s de espera"
+            )
@@ -0,0 +1,669 @@
+# sheets.py
+"""
+Camada única de acesso ao Google Sheets usada por todas as páginas.
+
+Mantém um só cliente da API (st.cache_resource) e uma entrada de cache por
+(planilha, aba). Cada aba tem um número de versão; toda escrita feita por
+aqui incrementa a versão da aba escrita, o que invalida só aquela entrada
+para todas as páginas e sessões. Alterações feitas direto na planilha são
+detectadas por uma sonda de versão (uma célula barata de ler, ver SONDAS).
+
+Cada versão de uma aba existe uma única vez na memória do processo. As páginas
+recebem visões dela (_visao): só as colunas que as sessões alteram (COLUNAS_EDITAVEIS)
+são copiadas por rerun, as demais são as mesmas do DataFrame compartilhado.
+
+Com várias réplicas do app, o cache compartilhado opcional (cache_compartilhado.py)
+guarda as tabelas já convertidas e um carimbo de versão por aba: uma escrita em
+qualquer réplica publica um carimbo novo, que invalida a aba nas demais.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import weakref
+
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+
+import snapshot
+from cache_compartilhado import ErroCacheCompartilhado, abrir as abrir_cache_compartilhado
+from cota import ClienteComCota, TEMPO_LIMITE_HTTP
+from medicao import medir
+from sheets_chunks import carregar_em_blocos, montar_dataframe
+from sheets_sync import aplicar_operacoes, conferir_posicoes, ler_coluna, sincronizar_aba
+
+# --- Configurações ---
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+SPREADSHEET_ID = "1Lpjc8Zb9_P8vZjt8pjjft66LpGqTE4g7uUy0hlOnUO8"
+ABA_NOTAS = "Notas"
+ABA_DEVOLUCAO = "Devolução"
+COLUNA_GESTOR_RESP = 'GESTOR_RESP'
+COLUNA_ASSINATURA = 'ASSINATURA'
+COLUNA_GESTOR_ASSINATURA = 'GESTORASSINATURA'
+COLUNA_DEVOLUCAO = 'DEVOLUCAO'
+COLUNA_NF = 'NF' # Identifica a linha ao conferir posições antes de uma escrita
+
+# Sonda de versão: célula que muda sempre que a aba muda. Crie uma aba '_controle'
+# com uma fórmula por aba monitorada, por exemplo em B1:
+#   =COUNTA(Notas!A:A)&"|"&SUMPRODUCT(LEN(Notas!A:Z))
+# Sem a sonda, as abas voltam a ser recarregadas a cada IDADE_MAXIMA_SNAPSHOT segundos.
+ABA_CONTROLE = "_controle"
+SONDAS = {
+    ABA_NOTAS: f"'{ABA_CONTROLE}'!B1",
+    ABA_DEVOLUCAO: f"'{ABA_CONTROLE}'!B2",
+}
+INTERVALO_SONDA = 30 # Segundos entre consultas à sonda (por processo)
+
+INTERVALO_CARIMBO = 1 # Segundos entre consultas ao carimbo do cache compartilhado (por aba)
+
+# Colunas usadas quando a aba está completamente vazia
+COLUNAS_PADRAO = ["NF", "FORNECEDOR", "VALOR", "DT VENC", "GESTOR_RESP", "ASSINATURA", "GESTORASSINATURA"]
+
+# --- Cliente da API ---
+
+BACKEND_GOOGLE = "google"
+BACKEND_EMULADOR = "emulador"
+
+def _config_backend():
+    """
+    (tipo, caminho) do backend: a seção [backend] de st.secrets ou as variáveis de
+    ambiente SHEETS_BACKEND / SHEETS_EMULADOR, que têm prioridade. Padrão: Google.
+    """
+    config = {}
+    try:
+        if "backend" in st.secrets:
+            config = st.secrets["backend"].to_dict()
+    except Exception: # Sem secrets.toml (ex.: emulador em uma máquina isolada)
+        pass
+    tipo = os.environ.get("SHEETS_BACKEND", config.get("tipo", BACKEND_GOOGLE))
+    caminho = os.environ.get("SHEETS_EMULADOR", config.get("caminho"))
+    return tipo, caminho
+
+@st.cache_resource # Um único 'service' para todo o processo
+def get_sheets_service():
+    """
+    Autentica com a API do Google Sheets usando st.secrets e retorna o objeto 'service',
+    embrulhado pelo controle de cota (ver cota.ClienteComCota). Com o backend 'emulador'
+    configurado, retorna o emulador local (emulador.py), que tem a mesma interface.
+    As bibliotecas do Google só são importadas aqui, quando o cliente é criado.
+    """
+    tipo, caminho = _config_backend()
+    if tipo == BACKEND_EMULADOR:
+        from emulador import EmuladorSheets
+        return EmuladorSheets(caminho, sondas=SONDAS)
+    if tipo != BACKEND_GOOGLE:
+        st.error(f"Backend '{tipo}' desconhecido (use '{BACKEND_GOOGLE}' ou '{BACKEND_EMULADOR}').")
+        return None
+
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_httplib2 import AuthorizedHttp
+    from googleapiclient.discovery import build
+    import httplib2
+
+    creds = None
+    if "google_token" not in st.secrets:
+        st.error("Configuração '[google_token]' não encontrada em st.secrets.")
+        return None
+    try:
+        token_info = st.secrets["google_token"].to_dict()
+        creds = Credentials.from_authorized_user_info(token_info, SCOPES)
+    except Exception as e:
+        st.error(f"Erro ao carregar credenciais: {e}")
+        return None
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+                st.success("Token atualizado!")
+            except Exception as e:
+                st.error(f"Erro ao atualizar o token: {e}")
+                return None
+        else:
+            st.error("Credenciais inválidas.")
+            return None
+    try:
+        with medir("servico.conectar"):
+            http = AuthorizedHttp(creds, http=httplib2.Http(timeout=TEMPO_LIMITE_HTTP))
+            # Documento de descoberta estático (vem com o googleapiclient): nada é baixado
+            service = build("sheets", "v4", http=http, static_discovery=True, cache_discovery=False)
+        return ClienteComCota(service)
+    except Exception as e:
+        st.error(f"Erro ao construir serviço: {e}")
+        return None
+
+# --- Cache compartilhado entre réplicas (opcional) ---
+
+def _config_cache_compartilhado():
+    """Endereço do cache compartilhado: SHEETS_CACHE_COMPARTILHADO ou [cache_compartilhado] em st.secrets."""
+    endereco = None
+    try:
+        if "cache_compartilhado" in st.secrets:
+            endereco = st.secrets["cache_compartilhado"].get("endereco")
+    except Exception: # Sem secrets.toml
+        pass
+    return os.environ.get("SHEETS_CACHE_COMPARTILHADO", endereco)
+
+@st.cache_resource # Uma conexão por processo
+def get_cache_compartilhado():
+    """Cache compartilhado entre as réplicas, ou None se não houver um configurado (ou acessível)."""
+    endereco = _config_cache_compartilhado()
+    if not endereco:
+        return None
+    try:
+        return abrir_cache_compartilhado(endereco)
+    except ErroCacheCompartilhado as e:
+        st.warning(f"Cache compartilhado indisponível, usando só o cache local: {e}")
+        return None
+
+def _novo_carimbo():
+    return secrets.token_hex(8)
+
+def _publicar_carimbo(spreadsheet_id, sheet_name, carimbo):
+    """Avisa as outras réplicas que a aba mudou."""
+    cache = get_cache_compartilhado()
+    if cache is None:
+        return
+    try:
+        cache.publicar(spreadsheet_id, sheet_name, carimbo)
+    except ErroCacheCompartilhado:
+        pass # As outras réplicas ainda percebem a mudança pela sonda de versão
+
+def _conferir_carimbo(sheet_name, spreadsheet_id=SPREADSHEET_ID, forcar=False):
+    """
+    Compara o carimbo publicado no cache compartilhado (no máximo a cada INTERVALO_CARIMBO
+    segundos) com o desta réplica e invalida a aba aqui se outra réplica publicou um novo.
+    """
+    cache = get_cache_compartilhado()
+    if cache is None:
+        return
+    estado = _versoes_abas()
+    chave = (spreadsheet_id, sheet_name)
+    agora = time.time()
+    with estado["lock"]:
+        local = estado["carimbos"].setdefault(chave, {"carimbo": None, "versao": 0, "verificado_em": 0.0})
+        if not forcar and agora - local["verificado_em"] < INTERVALO_CARIMBO:
+            return
+        local["verificado_em"] = agora
+        proprio = local["carimbo"] or _novo_carimbo()
+    try:
+        remoto = cache.carimbo_atual(spreadsheet_id, sheet_name, proprio)
+    except ErroCacheCompartilhado:
+        return
+    with estado["lock"]:
+        if local["carimbo"] is None and local["versao"] == estado["versoes"].get(chave, 0):
+            local["carimbo"] = remoto # Primeira consulta do processo: só adota o carimbo
+            return
+        if remoto == local["carimbo"]:
+            return
+    invalidar_aba(sheet_name, spreadsheet_id, carimbo=remoto, publicar=False)
+
+def _carimbo_da_versao(spreadsheet_id, sheet_name, versao):
+    """Carimbo compartilhado da versão local 'versao', ou None se a aba já mudou de versão."""
+    local = _versoes_abas()["carimbos"].get((spreadsheet_id, sheet_name))
+    if local is None or local["versao"] != versao:
+        return None
+    return local["carimbo"]
+
+def _ler_compartilhado(spreadsheet_id, sheet_name, carimbo):
+    cache = get_cache_compartilhado()
+    if cache is None or carimbo is None:
+        return None
+    try:
+        return cache.ler_tabela(spreadsheet_id, sheet_name, carimbo)
+    except ErroCacheCompartilhado:
+        return None
+
+def _gravar_compartilhado(spreadsheet_id, sheet_name, carimbo, df):
+    cache = get_cache_compartilhado()
+    if cache is None or carimbo is None:
+        return
+    try:
+        cache.gravar_tabela(spreadsheet_id, sheet_name, carimbo, df)
+    except ErroCacheCompartilhado:
+        pass
+
+# --- Versões por aba (invalidação precisa do cache) ---
+
+@st.cache_resource
+def _versoes_abas():
+    """Dicionário (planilha, aba) -> versão, compartilhado por todas as sessões."""
+    return {"lock": threading.Lock(), "versoes": {}, "sondas": {}, "carimbos": {}, "prefetch": None}
+
+def versao_aba(sheet_name, spreadsheet_id=SPREADSHEET_ID):
+    """Versão atual dos dados em cache da aba."""
+    return _versoes_abas()["versoes"].get((spreadsheet_id, sheet_name), 0)
+
+def invalidar_aba(sheet_name, spreadsheet_id=SPREADSHEET_ID, acordar_prefetch=True, carimbo=None, publicar=True):
+    """
+    Descarta o cache de uma única aba (para todas as páginas e sessões).
+    Se houver um atualizador em segundo plano (prefetch.py), ele é acordado para
+    recarregar a aba logo em seguida.
+    A nova versão recebe 'carimbo' (ou um novo), publicado no cache compartilhado
+    para invalidar a aba nas outras réplicas; 'publicar=False' quando o aviso veio delas.
+    """
+    estado = _versoes_abas()
+    chave = (spreadsheet_id, sheet_name)
+    carimbo = carimbo or _novo_carimbo()
+    # A cópia local fica desatualizada antes da versão nova existir: nenhuma carga
+    # da versão nova lê (e compartilha) a cópia antiga
+    try:
+        snapshot.marcar_desatualizado(spreadsheet_id, sheet_name)
+    except sqlite3.Error:
+        pass
+    with estado["lock"]:
+        anterior = estado["versoes"].get(chave, 0)
+        estado["versoes"][chave] = anterior + 1
+        estado["carimbos"][chave] = {"carimbo": carimbo, "versao": anterior + 1, "verificado_em": time.time()}
+        # A próxima leitura consulta a sonda, e a mudança causada por esta
+        # invalidação não deve invalidar a aba de novo
+        sonda = estado["sondas"].setdefault(chave, {"token": None, "verificado_em": 0.0})
+        sonda["verificado_em"] = 0.0
+        sonda["invalidada"] = True
+    if publicar:
+        _publicar_carimbo(spreadsheet_id, sheet_name, carimbo)
+    if acordar_prefetch and estado["prefetch"] is not None:
+        estado["prefetch"]["acordar"].set()
+
+# --- Sonda de versão (detecta alterações sem baixar a aba) ---
+
+def ler_versao_remota(_service, sheet_name, spreadsheet_id=SPREADSHEET_ID):
+    """Lê a célula de sonda da aba. Retorna None se a aba não tiver sonda configurada."""
+    faixa = SONDAS.get(sheet_name)
+    if not faixa or not _service:
+        return None
+    try:
+        result = _service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=faixa).execute()
+    except Exception:
+        return None
+    values = result.get("values", [])
+    return str(values[0][0]) if values and values[0] else None
+
+def _trocar_versao(_service, sheet_name, spreadsheet_id, aquecer, carimbo=None):
+    """Invalida a aba; com 'aquecer', carrega a nova versão antes de publicá-la."""
+    carimbo = carimbo or _novo_carimbo()
+    if aquecer:
+        try:
+            snapshot.marcar_desatualizado(spreadsheet_id, sheet_name)
+        except sqlite3.Error:
+            pass
+        _carregar_tabela(_service, spreadsheet_id, sheet_name, versao_aba(sheet_name, spreadsheet_id) + 1, _carimbo=carimbo)
+    invalidar_aba(sheet_name, spreadsheet_id, acordar_prefetch=False, carimbo=carimbo)
+
+def verificar_alteracoes(_service, sheet_name, spreadsheet_id=SPREADSHEET_ID, forcar=False, aquecer=False):
+    """
+    Consulta a sonda da aba (no máximo a cada INTERVALO_SONDA segundos, ou já se 'forcar')
+    e invalida a aba só se a versão remota mudou. Retorna True se a aba foi invalidada.
+    Sem sonda, a aba é recarregada a cada IDADE_MAXIMA_SNAPSHOT segundos; 'forcar' (botão
+    Recarregar das páginas) recarrega na hora.
+    Com 'aquecer=True' (usado pelo prefetch) a nova versão já é carregada no cache
+    antes de ser publicada, então as páginas nunca esperam pela planilha.
+    """
+    estado = _versoes_abas()
+    chave = (spreadsheet_id, sheet_name)
+    agora = time.time()
+    with estado["lock"]:
+        sonda = estado["sondas"].setdefault(chave, {"token": None, "verificado_em": 0.0})
+        if not forcar and agora - sonda["verificado_em"] < INTERVALO_SONDA:
+            return False
+    # Uma mudança que outra réplica já publicou não precisa ser publicada de novo
+    _conferir_carimbo(sheet_name, spreadsheet_id, forcar=True)
+    with estado["lock"]:
+        sonda["verificado_em"] = agora
+        anterior = sonda["token"]
+        ja_invalidada = sonda.pop("invalidada", False)
+
+    carregado_em = sonda.setdefault("carregado_em", agora)
+    if sonda.get("sem_sonda") and not forcar and agora - carregado_em < snapshot.IDADE_MAXIMA_SNAPSHOT:
+        return False # Aba sem sonda: nem lê a célula enquanto a validade por tempo não vence
+
+    token = ler_versao_remota(_service, sheet_name, spreadsheet_id)
+    sonda["sem_sonda"] = token is None
+
+    if token is None:
+        # Sem sonda: mantém a validade por tempo de antes
+        if forcar or agora - carregado_em >= snapshot.IDADE_MAXIMA_SNAPSHOT:
+            sonda["carregado_em"] = agora
+            _trocar_versao(_service, sheet_name, spreadsheet_id, aquecer)
+            return True
+        return False
+
+    sonda["token"] = token
+    try:
+        confirmada = snapshot.confirmar_versao(spreadsheet_id, sheet_name, token)
+    except sqlite3.Error:
+        confirmada = False
+    if token == anterior or ja_invalidada or (anterior is None and confirmada):
+        return False
+    try:
+        # Réplicas que virem o mesmo token publicam o mesmo carimbo (e compartilham a tabela)
+        _trocar_versao(_service, sheet_name, spreadsheet_id, aquecer, carimbo=f"sonda:{token}")
+    except Exception:
+        sonda["token"] = anterior # Tenta de novo na próxima verificação
+        raise
+    with estado["lock"]:
+        sonda["invalidada"] = False
+        sonda["verificado_em"] = agora
+    return True
+
+def _token_sonda(sheet_name, spreadsheet_id=SPREADSHEET_ID):
+    return _versoes_abas()["sondas"].get((spreadsheet_id, sheet_name), {}).get("token")
+
+def registrar_prefetch(thread, acordar):
+    """Registra o atualizador em segundo plano (ver prefetch.py)."""
+    _versoes_abas()["prefetch"] = {"thread": thread, "acordar": acordar}
+
+def prefetch_ativo():
+    """True se o atualizador em segundo plano está rodando neste processo."""
+    prefetch = _versoes_abas()["prefetch"]
+    return prefetch is not None and prefetch["thread"].is_alive()
+
+def versao_atual(_service, sheet_name, spreadsheet_id=SPREADSHEET_ID):
+    """
+    Versão da aba depois de conferir o carimbo do cache compartilhado e a sonda
+    (o prefetch confere a sonda por conta própria).
+    """
+    _conferir_carimbo(sheet_name, spreadsheet_id)
+    if not prefetch_ativo():
+        verificar_alteracoes(_service, sheet_name, spreadsheet_id)
+    return versao_aba(sheet_name, spreadsheet_id)
+
+# --- Esquema de tipos por aba ---
+
+# Tipos usados no esquema. VALOR fica em decimal de 2 casas (somas sem erro de
+# arredondamento), colunas com poucos valores distintos viram 'category' e os
+# demais textos ficam em strings do Arrow, bem menores que objetos Python.
+TIPO_BOOLEANO = "booleano"
+TIPO_CATEGORIA = "categoria"
+TIPO_DATA = "data"
+TIPO_MOEDA = "moeda"
+TIPO_TEXTO = "texto"
+
+DTYPE_MOEDA = pd.ArrowDtype(pa.decimal128(14, 2))
+DTYPE_TEXTO = pd.StringDtype("pyarrow")
+
+# Coluna -> (tipo, valor usado quando a coluna não existe na aba ou None para não criar)
+ESQUEMAS = {
+    ABA_NOTAS: {
+        "NF": (TIPO_TEXTO, None),
+        "FORNECEDOR": (TIPO_CATEGORIA, None),
+        "VALOR": (TIPO_MOEDA, None),
+        "DT VENC": (TIPO_DATA, None),
+        "ENTREGA GESTOR": (TIPO_DATA, None),
+        COLUNA_GESTOR_RESP: (TIPO_CATEGORIA, ''),
+        COLUNA_ASSINATURA: (TIPO_BOOLEANO, 'FALSE'),
+        COLUNA_GESTOR_ASSINATURA: (TIPO_DATA, ''),
+    },
+    ABA_DEVOLUCAO: {
+        "NF": (TIPO_TEXTO, None),
+        "FORNECEDOR": (TIPO_TEXTO, None), # Editável pelo ADM: aceita fornecedores novos
+        "VALOR": (TIPO_MOEDA, None),
+        "DT VENC": (TIPO_DATA, None),
+        "ENTREGA GESTOR": (TIPO_DATA, None),
+        "DATA DEVOLUCAO": (TIPO_DATA, None),
+        COLUNA_GESTOR_RESP: (TIPO_CATEGORIA, ''),
+        COLUNA_ASSINATURA: (TIPO_BOOLEANO, 'FALSE'),
+        COLUNA_DEVOLUCAO: (TIPO_BOOLEANO, 'FALSE'),
+        COLUNA_GESTOR_ASSINATURA: (TIPO_TEXTO, ''), # O ADM grava o horário como texto
+    },
+}
+
+def _para_booleano(serie):
+    return serie.astype(str).str.upper().isin(['TRUE', 'VERDADEIRO'])
+
+def _para_moeda(serie):
+    numeros = pd.to_numeric(serie.astype(str).str.replace(',', '.', regex=False), errors='coerce').fillna(0)
+    return numeros.round(2).astype(DTYPE_MOEDA)
+
+CONVERSOES_TIPO = {
+    TIPO_BOOLEANO: _para_booleano,
+    TIPO_CATEGORIA: lambda serie: serie.fillna('').astype(str).astype('category'),
+    TIPO_DATA: lambda serie: pd.to_datetime(serie, errors='coerce', dayfirst=True),
+    TIPO_MOEDA: _para_moeda,
+    TIPO_TEXTO: lambda serie: serie.astype(DTYPE_TEXTO),
+}
+
+def aplicar_esquema(df, sheet_name):
+    """Garante as colunas obrigatórias e converte cada coluna do esquema da aba para o seu tipo."""
+    for coluna, (tipo, padrao) in ESQUEMAS[sheet_name].items():
+        if coluna not in df.columns:
+            if padrao is None:
+                continue
+            df[coluna] = padrao
+        df[coluna] = CONVERSOES_TIPO[tipo](df[coluna])
+    return df
+
+CONVERSORES = {aba: (lambda df, aba=aba: aplicar_esquema(df, aba)) for aba in ESQUEMAS}
+
+# --- Leitura ---
+
+def _ler_snapshot(spreadsheet_id, sheet_name):
+    """Valores da cópia local (snapshot.py) se ela estiver recente; senão None."""
+    try:
+        return snapshot.ler_snapshot(spreadsheet_id, sheet_name)
+    except sqlite3.Error:
+        return None
+
+def _baixar_tabela(_service, spreadsheet_id, sheet_name):
+    """
+    Baixa a aba em blocos paralelos (sheets_chunks.py), convertendo cada bloco ao chegar,
+    e atualiza a cópia local bloco a bloco, regravando só as linhas que mudaram.
+    """
+    copia_local = {"ativa": True}
+
+    def gravar_bloco(cabecalho, inicio, linhas):
+        if not copia_local["ativa"]:
+            return
+        try:
+            snapshot.gravar_bloco(spreadsheet_id, sheet_name, cabecalho, inicio, linhas)
+        except sqlite3.Error:
+            copia_local["ativa"] = False # Sem cópia local (ex.: disco somente leitura)
+
+    cabecalho, df = carregar_em_blocos(
+        _service, spreadsheet_id, sheet_name, CONVERSORES[sheet_name], ao_receber=gravar_bloco
+    )
+    if copia_local["ativa"]:
+        try:
+            snapshot.finalizar_sincronizacao(
+                spreadsheet_id, sheet_name, cabecalho, 0 if df is None else len(df),
+                versao_remota=_token_sonda(sheet_name, spreadsheet_id),
+            )
+        except sqlite3.Error:
+            pass
+    return df
+
+@st.cache_resource(max_entries=16) # Uma entrada por (planilha, aba, versão) - a sonda decide quando a versão muda
+def _carregar_tabela(_service, spreadsheet_id, sheet_name, versao, _carimbo=None):
+    """
+    Busca a aba inteira e retorna um DataFrame já com os tipos convertidos. O mesmo
+    objeto é compartilhado por todas as sessões: use sempre _visao() antes de entregar.
+    Erros são propagados (e não ficam em cache) para que a próxima chamada tente de novo.
+    Com o cache compartilhado, a versão vem de lá se outra réplica já a carregou, e a
+    carregada aqui é gravada lá com o carimbo da versão ('_carimbo' ou o da versão local).
+    """
+    carimbo = _carimbo or _carimbo_da_versao(spreadsheet_id, sheet_name, versao)
+    with medir("planilha.carregar", aba=sheet_name) as m:
+        df = _ler_compartilhado(spreadsheet_id, sheet_name, carimbo)
+        if df is not None:
+            m["origem"] = "compartilhado"
+        else:
+            values = _ler_snapshot(spreadsheet_id, sheet_name)
+            m["origem"] = "api" if values is None else "copia_local"
+            if values is None:
+                df = _baixar_tabela(_service, spreadsheet_id, sheet_name)
+            elif values:
+                header = values[0]
+                data = values[1:] if len(values) > 1 else []
+                df = CONVERSORES[sheet_name](montar_dataframe(data, header))
+            else:
+                df = None
+            if df is not None:
+                _gravar_compartilhado(spreadsheet_id, sheet_name, carimbo, df)
+        m["linhas"] = 0 if df is None else len(df)
+
+    if df is None: # Se não houver nada, retorna um DF vazio com colunas
+        st.warning(f"Planilha '{sheet_name}' vazia ou não encontrada. Criando DF vazio.")
+        df = CONVERSORES[sheet_name](pd.DataFrame(columns=COLUNAS_PADRAO))
+    return df
+
+# Colunas que as páginas alteram célula a célula (.loc) nos DataFrames que recebem
+COLUNAS_EDITAVEIS = (COLUNA_ASSINATURA, COLUNA_GESTOR_ASSINATURA, COLUNA_DEVOLUCAO, "DATA DEVOLUCAO")
+
+def _visao(df):
+    """
+    Visão do DataFrame compartilhado: as colunas são as mesmas, sem cópia, menos as
+    COLUNAS_EDITAVEIS, copiadas para que alterações nelas não cheguem ao original.
+    Trocar uma coluna inteira (visao[coluna] = ...) também não altera o original.
+    """
+    visao = df.copy(deep=False)
+    for coluna in COLUNAS_EDITAVEIS:
+        if coluna in visao.columns:
+            visao[coluna] = df[coluna].copy()
+    return visao
+
+def get_tabela_versao(_service, sheet_name, spreadsheet_id=SPREADSHEET_ID):
+    """
+    Retorna (df, versao): o DataFrame da aba e a versão de onde ele veio, lidos juntos
+    (a versão pode mudar enquanto a aba carrega). (None, None) se a aba não puder ser carregada.
+    """
+    if not _service:
+        st.error("Serviço Google Sheets não disponível.")
+        return None, None
+    try:
+        with medir("planilha.tabela", aba=sheet_name) as m:
+            versao = versao_atual(_service, sheet_name, spreadsheet_id)
+            df = _carregar_tabela(_service, spreadsheet_id, sheet_name, versao)
+            m["linhas"] = len(df)
+        return _visao(df), versao
+    except Exception as err:
+        st.error(f"Erro ao buscar dados: {err}")
+        return None, None
+
+def get_tabela_sheets(_service, sheet_name, spreadsheet_id=SPREADSHEET_ID):
+    """Retorna o DataFrame da aba, compartilhado entre páginas enquanto a versão não mudar."""
+    return get_tabela_versao(_service, sheet_name, spreadsheet_id)[0]
+
+# --- Índice por gestor (partições de GESTOR_RESP) ---
+
+@st.cache_resource
+def _indices_gestor():
+    """Dicionário (planilha, aba) -> {'tabela', 'indice'}, compartilhado por todas as sessões."""
+    return {"lock": threading.Lock(), "indices": {}}
+
+def get_indice_gestores(_service, sheet_name, spreadsheet_id=SPREADSHEET_ID):
+    """
+    Retorna (df, indice), onde 'indice' mapeia cada GESTOR_RESP para as posições das
+    suas linhas em 'df'. O índice é montado uma vez para cada DataFrame carregado: toda
+    versão nova é baixada de novo e pode trazer linhas incluídas ou removidas na planilha.
+    """
+    if not _service:
+        return None, {}
+    chave = (spreadsheet_id, sheet_name)
+    try:
+        versao = versao_atual(_service, sheet_name, spreadsheet_id)
+        df = _carregar_tabela(_service, spreadsheet_id, sheet_name, versao)
+    except Exception as err:
+        st.error(f"Erro ao buscar dados: {err}")
+        return None, {}
+
+    estado = _indices_gestor()
+    with estado["lock"]:
+        item = estado["indices"].get(chave)
+        if item is None or item["tabela"]() is not df:
+            grupos = df.groupby(COLUNA_GESTOR_RESP, sort=False, observed=True).indices
+            item = {"tabela": weakref.ref(df), "indice": dict(grupos)} # Não segura o DataFrame em memória
+            estado["indices"][chave] = item
+    return _visao(df), item["indice"]
+
+def get_notas_gestor(_service, sheet_name, gestor, spreadsheet_id=SPREADSHEET_ID):
+    """Retorna só as linhas de um gestor (fatia pelo índice, sem varrer a aba inteira)."""
+    df, indice = get_indice_gestores(_service, sheet_name, spreadsheet_id)
+    if df is None:
+        return None
+    return df.iloc[indice.get(gestor, [])]
+
+# --- Escrita (sempre invalida a aba escrita) ---
+
+def escrever_celulas(_service, sheet_name, data, spreadsheet_id=SPREADSHEET_ID):
+    """Envia ranges A1 em um único values().batchUpdate e invalida o cache da aba."""
+    body = {"valueInputOption": "USER_ENTERED", "data": data}
+    try:
+        with medir("api.batchUpdate", aba=sheet_name, celulas=sum(len(l) for item in data for l in item["values"])):
+            return _service.spreadsheets().values().batchUpdate(spreadsheetId=spreadsheet_id, body=body).execute()
+    finally:
+        invalidar_aba(sheet_name, spreadsheet_id)
+
+def sincronizar_tabela(_service, sheet_name, texto_original, texto_editado, spreadsheet_id=SPREADSHEET_ID):
+    """Aplica as diferenças entre os DataFrames de texto na aba e invalida o cache dela."""
+    try:
+        with medir("api.sincronizar", aba=sheet_name, linhas=len(texto_editado)):
+            return sincronizar_aba(_service, spreadsheet_id, sheet_name, texto_original, texto_editado)
+    finally:
+        invalidar_aba(sheet_name, spreadsheet_id)
+
+class AbaAlterada(RuntimeError):
+    """As linhas a gravar mudaram de posição na planilha depois que a aba foi carregada."""
+
+    def __init__(self, sheet_name):
+        super().__init__(
+            f"A aba '{sheet_name}' mudou desde que os dados foram carregados. "
+            "Recarregue os dados da planilha e faça as alterações de novo."
+        )
+
+def chaves_nf(df, posicoes):
+    """
+    O que conferir_chaves precisa para as linhas de 'df' (DataFrame carregado da aba) nas
+    'posicoes': (posição da coluna NF, {posição: NF esperado}). O índice de 'df' é a posição
+    da linha na aba, então 'df' pode ser uma fatia (ex.: as notas de um gestor).
+    None se não houver o que conferir (sem a coluna NF ou sem posições).
+    """
+    if COLUNA_NF not in df.columns or not len(posicoes):
+        return None
+    posicoes = sorted(set(int(p) for p in posicoes))
+    chaves = ["" if pd.isna(c) else str(c) for c in df[COLUNA_NF].loc[posicoes]]
+    return df.columns.get_loc(COLUNA_NF), dict(zip(posicoes, chaves))
+
+def conferir_chaves(_service, sheet_name, conferencias, spreadsheet_id=SPREADSHEET_ID):
+    """
+    Confere várias saídas de chaves_nf (ex.: as sessões de um lote da fila de escrita) relendo
+    a coluna NF uma única vez. Retorna um booleano por conferência: True se aquelas linhas
+    continuam nas mesmas posições da planilha.
+    """
+    lidas = {}
+    resultado = []
+    for conferencia in conferencias:
+        if conferencia is None:
+            resultado.append(True)
+            continue
+        coluna, chaves = conferencia
+        if coluna not in lidas:
+            lidas[coluna] = ler_coluna(_service, spreadsheet_id, sheet_name, coluna)
+        resultado.append(conferir_posicoes(lidas[coluna], chaves))
+    return resultado
+
+def ler_coluna_nf(_service, sheet_name, df, spreadsheet_id=SPREADSHEET_ID):
+    """Relê só a coluna NF da aba (na posição que ela tem em 'df'): o texto de cada linha, sem o cabeçalho."""
+    return ler_coluna(_service, spreadsheet_id, sheet_name, df.columns.get_loc(COLUNA_NF))
+
+def posicoes_conferem(_service, sheet_name, df, posicoes, spreadsheet_id=SPREADSHEET_ID):
+    """True se as linhas de 'df' nas 'posicoes' continuam nas mesmas posições da planilha (ver chaves_nf)."""
+    return conferir_chaves(_service, sheet_name, [chaves_nf(df, posicoes)], spreadsheet_id)[0]
+
+def enviar_operacoes(_service, sheet_name, operacoes, spreadsheet_id=SPREADSHEET_ID, conferir=None):
+    """
+    Envia operações já calculadas (ex.: de um registro de alterações) e invalida o cache da aba.
+    'conferir' é o DataFrame de onde vieram as posições: como ele pode estar até uma consulta
+    da sonda atrasado, antes de enviar confere (pela coluna NF) se as linhas alteradas ou
+    removidas continuam nas mesmas posições, e desiste se alguém incluiu ou removeu linhas.
+    """
+    try:
+        posicoes = [p for p, _, _ in operacoes["atualizar"]] + list(operacoes["remover"])
+        if conferir is not None and not posicoes_conferem(_service, sheet_name, conferir, posicoes, spreadsheet_id):
+            raise AbaAlterada(sheet_name)
+        with medir("api.operacoes", aba=sheet_name, operacoes=sum(len(v) for v in operacoes.values())):
+            return aplicar_operacoes(_service, spreadsheet_id, sheet_name, operacoes)
+    finally:
+        invalidar_aba(sheet_name, spreadsheet_id)
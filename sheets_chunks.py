@@ -0,0 +1,142 @@
+# sheets_chunks.py
+"""
+Carga de uma aba em blocos de linhas baixados em paralelo.
+
+Cada bloco é convertido para os tipos finais assim que chega (enquanto os
+outros ainda estão sendo baixados) e a lista crua de linhas é descartada em
+seguida, então nunca existe a aba inteira como lista de listas + DataFrame
+de texto + DataFrame convertido ao mesmo tempo.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from medicao import medir
+
+TAMANHO_BLOCO = 5000 # Linhas por requisição
+MAX_PARALELO = 4 # Requisições simultâneas
+
+def montar_dataframe(linhas, cabecalho):
+    """
+    DataFrame de texto com as colunas do cabeçalho. A API corta as células vazias do
+    fim de cada linha; se todas as linhas de um bloco forem curtas, as colunas que
+    faltam são criadas vazias (None), como o pandas faz quando só algumas são curtas.
+    """
+    df = pd.DataFrame(linhas)
+    if df.shape[1] > len(cabecalho):
+        raise ValueError(f"{len(cabecalho)} colunas no cabeçalho, mas há linhas com {df.shape[1]} células.")
+    df.columns = cabecalho[:df.shape[1]]
+    for coluna in cabecalho[df.shape[1]:]:
+        df[coluna] = None
+    return df
+
+
+def concatenar(frames):
+    """
+    Junta os blocos convertidos mantendo as colunas 'category': o pd.concat volta para
+    'object' quando os blocos têm categorias diferentes, então elas são unificadas antes.
+    """
+    if len(frames) > 1:
+        for coluna in frames[0].columns:
+            if not isinstance(frames[0][coluna].dtype, pd.CategoricalDtype):
+                continue
+            categorias = frames[0][coluna].cat.categories
+            for df in frames[1:]:
+                categorias = categorias.union(df[coluna].cat.categories)
+            for df in frames:
+                df[coluna] = df[coluna].cat.set_categories(categorias)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _baixar(service, spreadsheet_id, faixa):
+    with medir("api.get", faixa=faixa) as m:
+        request = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=faixa)
+        result = request.execute() # O ClienteComCota usa uma conexão por thread
+        values = result.get("values", [])
+        m["celulas"] = sum(len(linha) for linha in values)
+    return values
+
+
+def total_linhas_grade(service, spreadsheet_id, aba):
+    """Quantidade de linhas da grade da aba (inclui linhas vazias no fim) ou None."""
+    info = service.spreadsheets().get(
+        spreadsheetId=spreadsheet_id, fields="sheets.properties(title,gridProperties.rowCount)"
+    ).execute()
+    for item in info.get("sheets", []):
+        props = item.get("properties", {})
+        if props.get("title") == aba:
+            return props.get("gridProperties", {}).get("rowCount")
+    return None
+
+
+def carregar_em_blocos(service, spreadsheet_id, aba, converter, ao_receber=None,
+                       tamanho_bloco=TAMANHO_BLOCO, max_paralelo=MAX_PARALELO):
+    """
+    Baixa a aba em blocos de 'tamanho_bloco' linhas, até 'max_paralelo' ao mesmo tempo,
+    e retorna (cabecalho, df). 'converter' recebe o DataFrame de texto de um bloco e o
+    devolve com os tipos convertidos. 'ao_receber(cabecalho, inicio, linhas)' recebe as
+    linhas cruas de cada bloco (posição base 0, sem cabeçalho), ex. para a cópia local.
+    Se a aba estiver vazia, retorna ([], None).
+    """
+    total = total_linhas_grade(service, spreadsheet_id, aba)
+    if total:
+        faixas = [(a, min(a + tamanho_bloco, total)) for a in range(0, total, tamanho_bloco)]
+    else:
+        faixas = [(0, None)] # Tamanho desconhecido: um único bloco com a aba inteira
+
+    cabecalho = None
+    aguardando = {} # Blocos que chegaram antes do cabeçalho
+    partes = {} # posição inicial -> [df, linhas recebidas, capacidade]
+
+    def processar(inicio, capacidade, linhas):
+        if ao_receber is not None:
+            ao_receber(cabecalho, inicio, linhas)
+        with medir("conversao", aba=aba, linhas=len(linhas)):
+            df = converter(montar_dataframe(linhas, cabecalho)) if linhas else None
+        partes[inicio] = [df, len(linhas), capacidade]
+
+    with ThreadPoolExecutor(max_workers=max_paralelo) as pool:
+        futuros = {}
+        for a, b in faixas:
+            faixa = f"'{aba}'!{a + 1}:{b}" if b is not None else aba
+            futuros[pool.submit(_baixar, service, spreadsheet_id, faixa)] = (a, b)
+
+        for futuro in as_completed(futuros):
+            a, b = futuros[futuro]
+            linhas = futuro.result()
+            if a == 0:
+                cabecalho = linhas[0] if linhas else []
+                if not cabecalho:
+                    for f in futuros:
+                        f.cancel()
+                    return [], None
+                processar(0, (b - 1) if b is not None else None, linhas[1:])
+                for inicio, (capacidade, pendentes) in sorted(aguardando.items()):
+                    processar(inicio, capacidade, pendentes)
+                aguardando.clear()
+            elif cabecalho is None:
+                aguardando[a - 1] = (b - a, linhas)
+            else:
+                processar(a - 1, b - a, linhas)
+            del linhas
+
+    # A API omite as linhas vazias no fim de cada faixa; completa os blocos
+    # anteriores ao último com dados para manter as posições das linhas.
+    com_dados = [inicio for inicio, (_, n, _) in partes.items() if n]
+    ultimo = max(com_dados) if com_dados else 0
+    frames = []
+    for inicio in sorted(partes):
+        if inicio > ultimo:
+            break
+        df, n, capacidade = partes[inicio]
+        if df is not None:
+            frames.append(df)
+        if inicio < ultimo and capacidade is not None and n < capacidade:
+            vazias = [[] for _ in range(capacidade - n)]
+            if ao_receber is not None:
+                ao_receber(cabecalho, inicio + n, vazias)
+            frames.append(converter(montar_dataframe(vazias, cabecalho)))
+
+    if not frames:
+        return cabecalho, converter(pd.DataFrame(columns=cabecalho))
+    return cabecalho, concatenar(frames)
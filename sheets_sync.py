@@ -0,0 +1,236 @@
+# sheets_sync.py
+"""
+Sincronização incremental entre um DataFrame editado e a aba do Google Sheets.
+
+Em vez de limpar e reescrever a aba inteira, compara o DataFrame carregado
+com o editado e envia só as operações necessárias (células alteradas, linhas
+novas e linhas removidas) em um único spreadsheets().batchUpdate.
+"""
+import re
+from datetime import datetime
+
+# Cache de 'sheetId' por (planilha, aba) - o ID numérico é necessário para
+# deleteDimension/appendCells e não muda enquanto a aba existir.
+_SHEET_IDS = {}
+
+_EPOCA_SHEETS = datetime(1899, 12, 30)
+_RE_NUMERO = re.compile(r"^-?(0|[1-9]\d*)(\.\d+)?$")
+_RE_DATA = re.compile(r"^\d{2}/\d{2}/\d{4}$")
+_RE_DATA_HORA = re.compile(r"^\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}$")
+
+CAMPOS_VALOR = "userEnteredValue"
+CAMPOS_VALOR_FORMATO = "userEnteredValue,userEnteredFormat.numberFormat"
+
+
+def letra_coluna(posicao):
+    """Converte a posição (0 = A) de uma coluna na letra usada em ranges A1."""
+    letra = ""
+    posicao += 1
+    while posicao:
+        posicao, resto = divmod(posicao - 1, 26)
+        letra = chr(65 + resto) + letra
+    return letra
+
+
+def texto_celulas(df):
+    """Converte um DataFrame já formatado para a planilha em textos comparáveis ('' para vazios)."""
+    if df.empty: # astype(str) falha em colunas 'category' vazias (pandas 2.2 + numpy 2)
+        return df.astype(object)
+    return df.astype(str).replace({"NaT": "", "nan": "", "None": "", "<NA>": ""})
+
+
+def _celula(texto):
+    """
+    Monta o CellData de um texto do mesmo jeito que o USER_ENTERED interpretaria:
+    TRUE/FALSE viram booleano, números viram número e datas dd/mm/aaaa viram data.
+    """
+    if texto == "":
+        return {}
+    if texto in ("TRUE", "FALSE"):
+        return {"userEnteredValue": {"boolValue": texto == "TRUE"}}
+    if _RE_NUMERO.match(texto):
+        return {"userEnteredValue": {"numberValue": float(texto)}}
+    for regex, formato, padrao in (
+        (_RE_DATA, "%d/%m/%Y", "dd/mm/yyyy"),
+        (_RE_DATA_HORA, "%d/%m/%Y %H:%M:%S", "dd/mm/yyyy hh:mm:ss"),
+    ):
+        if regex.match(texto):
+            try:
+                serial = (datetime.strptime(texto, formato) - _EPOCA_SHEETS).total_seconds() / 86400
+            except ValueError:
+                break
+            return {
+                "userEnteredValue": {"numberValue": serial},
+                "userEnteredFormat": {"numberFormat": {"type": "DATE_TIME" if " " in padrao else "DATE", "pattern": padrao}},
+            }
+    return {"userEnteredValue": {"stringValue": texto}}
+
+
+def calcular_operacoes(texto_original, texto_editado):
+    """
+    Compara os dois DataFrames de texto (saída de 'texto_celulas') e retorna um dict com:
+      - 'atualizar': lista de (posicao_linha, posicao_coluna, texto) das células alteradas
+      - 'adicionar': lista de linhas (listas de texto) que não existiam no original
+      - 'remover': posições (base 0, sem cabeçalho) das linhas que saíram do editado
+    A posição de uma linha é a posição dela no DataFrame original carregado da planilha.
+    """
+    colunas = list(texto_original.columns)
+    texto_editado = texto_editado.reindex(columns=colunas, fill_value="")
+
+    comuns = texto_original.index.intersection(texto_editado.index, sort=False)
+    removidos = texto_original.index.difference(texto_editado.index, sort=False)
+    adicionados = texto_editado.index.difference(texto_original.index, sort=False)
+
+    atualizar = []
+    if len(comuns):
+        antes = texto_original.loc[comuns]
+        depois = texto_editado.loc[comuns]
+        alteradas = antes.ne(depois).to_numpy()
+        posicoes = texto_original.index.get_indexer(comuns)
+        linhas, cols = alteradas.nonzero()
+        valores = depois.to_numpy()
+        atualizar = [(int(posicoes[l]), int(c), valores[l, c]) for l, c in zip(linhas, cols)]
+
+    return {
+        "atualizar": sorted(atualizar),
+        "adicionar": texto_editado.loc[adicionados].to_numpy().tolist(),
+        "remover": sorted(texto_original.index.get_indexer(removidos).tolist()),
+    }
+
+
+def operacoes_do_registro(posicoes, texto_antes, texto_depois, remover=(), texto_novas=None):
+    """
+    Monta o mesmo dict de 'calcular_operacoes' a partir de um registro de alterações,
+    sem comparar a aba inteira: 'texto_antes'/'texto_depois' têm só as linhas editadas
+    (mesmos rótulos), 'posicoes' é a posição de cada uma delas na aba (base 0, sem
+    cabeçalho), 'remover' são posições de linhas removidas e 'texto_novas' as linhas novas.
+    """
+    colunas = list(texto_antes.columns)
+    texto_depois = texto_depois.reindex(index=texto_antes.index, columns=colunas, fill_value="")
+
+    alteradas = texto_antes.ne(texto_depois).to_numpy()
+    linhas, cols = alteradas.nonzero()
+    valores = texto_depois.to_numpy()
+    atualizar = [(int(posicoes[l]), int(c), valores[l, c]) for l, c in zip(linhas, cols)]
+
+    adicionar = []
+    if texto_novas is not None and len(texto_novas):
+        adicionar = texto_novas.reindex(columns=colunas, fill_value="").to_numpy().tolist()
+
+    return {
+        "atualizar": sorted(atualizar),
+        "adicionar": adicionar,
+        "remover": sorted(int(p) for p in remover),
+    }
+
+
+def montar_requests(sheet_id, operacoes, cabecalho=None):
+    """
+    Monta a lista de requests do spreadsheets().batchUpdate para as operações calculadas.
+    A ordem importa (a API aplica em sequência): primeiro as células, enquanto as posições
+    ainda são as originais; depois as remoções, de baixo para cima; por fim as linhas novas.
+    'cabecalho' regrava a linha 1 (usado quando a aba ainda não tem cabeçalho).
+    """
+    requests = []
+
+    if cabecalho is not None:
+        requests.append({"updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+            "rows": [{"values": [_celula(str(c)) for c in cabecalho]}],
+            "fields": CAMPOS_VALOR,
+        }})
+
+    # Agrupa células vizinhas da mesma linha em um único updateCells. Células de data
+    # levam o formato junto, então só são agrupadas com outras células de data.
+    bloco = None
+    for posicao, coluna, texto in operacoes["atualizar"] + [(None, None, None)]:
+        celula = _celula(texto) if posicao is not None else None
+        campos = CAMPOS_VALOR_FORMATO if celula and "userEnteredFormat" in celula else CAMPOS_VALOR
+        if bloco and posicao == bloco["linha"] and coluna == bloco["coluna"] + len(bloco["valores"]) and campos == bloco["campos"]:
+            bloco["valores"].append(celula)
+            continue
+        if bloco:
+            requests.append({"updateCells": {
+                "start": {"sheetId": sheet_id, "rowIndex": bloco["linha"] + 1, "columnIndex": bloco["coluna"]},
+                "rows": [{"values": bloco["valores"]}],
+                "fields": bloco["campos"],
+            }})
+        bloco = {"linha": posicao, "coluna": coluna, "valores": [celula], "campos": campos} if posicao is not None else None
+
+    # Remove as linhas em faixas contíguas, da última para a primeira
+    faixas = []
+    for posicao in operacoes["remover"]:
+        if faixas and posicao == faixas[-1][1]:
+            faixas[-1][1] += 1
+        else:
+            faixas.append([posicao, posicao + 1])
+    for inicio, fim in reversed(faixas):
+        requests.append({"deleteDimension": {"range": {
+            "sheetId": sheet_id, "dimension": "ROWS", "startIndex": inicio + 1, "endIndex": fim + 1,
+        }}})
+
+    if operacoes["adicionar"]:
+        requests.append({"appendCells": {
+            "sheetId": sheet_id,
+            "rows": [{"values": [_celula(t) for t in linha]} for linha in operacoes["adicionar"]],
+            "fields": CAMPOS_VALOR_FORMATO,
+        }})
+
+    return requests
+
+
+def get_sheet_id(service, spreadsheet_id, sheet_name):
+    """Retorna o 'sheetId' numérico da aba (consultado uma vez e guardado em cache)."""
+    chave = (spreadsheet_id, sheet_name)
+    if chave not in _SHEET_IDS:
+        info = service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id, fields="sheets.properties(sheetId,title)"
+        ).execute()
+        for aba in info.get("sheets", []):
+            props = aba.get("properties", {})
+            _SHEET_IDS[(spreadsheet_id, props.get("title"))] = props.get("sheetId")
+        if chave not in _SHEET_IDS:
+            raise KeyError(f"Aba '{sheet_name}' não encontrada na planilha.")
+    return _SHEET_IDS[chave]
+
+
+def ler_coluna(service, spreadsheet_id, sheet_name, coluna):
+    """Relê só uma coluna da aba (posição 'coluna', ex.: NF): o texto de cada linha, sem o cabeçalho."""
+    letra = letra_coluna(coluna)
+    result = service.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'!{letra}2:{letra}"
+    ).execute()
+    return [linha[0] if linha else "" for linha in result.get("values", [])]
+
+
+def conferir_posicoes(atuais, chaves):
+    """
+    Confere se as linhas continuam nas posições lidas: 'chaves' mapeia a posição de cada
+    linha (base 0, sem cabeçalho) para o texto esperado na coluna chave ('' para vazio) e
+    'atuais' é a coluna relida (ler_coluna). Retorna False se alguém incluiu ou removeu linhas.
+    """
+    return all((atuais[p] if p < len(atuais) else "") == texto for p, texto in chaves.items())
+
+
+def sincronizar_aba(service, spreadsheet_id, sheet_name, texto_original, texto_editado):
+    """
+    Envia para a aba apenas as diferenças entre 'texto_original' e 'texto_editado'
+    em um único spreadsheets().batchUpdate. Retorna o dict de operações aplicadas.
+    """
+    operacoes = calcular_operacoes(texto_original, texto_editado)
+    cabecalho = list(texto_original.columns) if texto_original.empty else None
+    return aplicar_operacoes(service, spreadsheet_id, sheet_name, operacoes, cabecalho=cabecalho)
+
+
+def aplicar_operacoes(service, spreadsheet_id, sheet_name, operacoes, cabecalho=None):
+    """
+    Envia as operações já calculadas (ver 'calcular_operacoes' e 'operacoes_do_registro')
+    em um único spreadsheets().batchUpdate. Retorna o próprio dict de operações.
+    """
+    if not (operacoes["atualizar"] or operacoes["adicionar"] or operacoes["remover"]):
+        return operacoes
+
+    sheet_id = get_sheet_id(service, spreadsheet_id, sheet_name)
+    requests = montar_requests(sheet_id, operacoes, cabecalho=cabecalho)
+    service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={"requests": requests}).execute()
+    return operacoes
@@ -0,0 +1,203 @@
+# snapshot.py
+"""
+Cópia local (SQLite) das abas da planilha.
+
+As páginas leem da cópia local enquanto ela estiver recente, então um
+reinício do servidor não precisa baixar as abas de novo. A sincronização
+compara um hash por linha com o que já está gravado e só regrava as linhas
+que mudaram.
+
+As linhas são guardadas pela posição na aba, e não pela NF. A aba é baixada em
+blocos paralelos que chegam fora de ordem (sheets_chunks.py), e a posição é a
+única chave que cada bloco conhece sozinho: a NF pode repetir ou estar vazia, e
+numerar as repetições exigiria a aba inteira. Guardar pela NF também não evitaria
+as escritas, porque a posição de cada linha continuaria gravada (para remontar a
+ordem) e mudar essa coluna já regrava a linha no SQLite. O custo é que incluir ou
+remover uma linha no meio da aba regrava as linhas abaixo dela uma vez. No uso do
+app isso é raro: as linhas novas entram no fim (appendCells), e só o arquivamento
+(arquivamento.py) remove linhas antigas, uma vez por execução.
+
+Quando a aba tem uma sonda de versão (ver sheets.SONDAS), a cópia guarda a
+versão remota com que foi sincronizada e continua válida enquanto a sonda
+não mudar, independente da idade.
+
+Para manter a cópia sempre recente sem depender de acessos às páginas,
+rode a sincronização periodicamente (ex.: cron a cada minuto):
+
+    python snapshot.py
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshot", "planilhas.sqlite3")
+IDADE_MAXIMA_SNAPSHOT = 300 # Segundos - mesma validade do cache das páginas
+COLUNA_CHAVE = "NF"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS abas (
+    spreadsheet_id TEXT NOT NULL,
+    aba TEXT NOT NULL,
+    cabecalho TEXT NOT NULL,
+    total_linhas INTEGER NOT NULL,
+    sincronizado_em REAL NOT NULL,
+    versao_remota TEXT,
+    PRIMARY KEY (spreadsheet_id, aba)
+);
+CREATE TABLE IF NOT EXISTS linhas (
+    spreadsheet_id TEXT NOT NULL,
+    aba TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    nf TEXT,
+    hash TEXT NOT NULL,
+    valores TEXT NOT NULL,
+    PRIMARY KEY (spreadsheet_id, aba, posicao)
+);
+CREATE INDEX IF NOT EXISTS linhas_nf ON linhas (spreadsheet_id, aba, nf);
+"""
+
+
+def _conectar(caminho=None):
+    caminho = caminho or SNAPSHOT_PATH
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    conn = sqlite3.connect(caminho, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_ESQUEMA)
+    # Cópias criadas antes da sonda de versão não têm a coluna 'versao_remota'
+    colunas = [c[1] for c in conn.execute("PRAGMA table_info(abas)")]
+    if "versao_remota" not in colunas:
+        conn.execute("ALTER TABLE abas ADD COLUMN versao_remota TEXT")
+    return conn
+
+
+def _hash_linha(linha):
+    return hashlib.sha1(json.dumps(linha, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def ler_snapshot(spreadsheet_id, aba, idade_maxima=IDADE_MAXIMA_SNAPSHOT, caminho=None):
+    """
+    Retorna os valores da aba (cabeçalho + linhas, como o values().get) gravados
+    localmente, ou None se não houver cópia ou se ela for mais velha que 'idade_maxima'.
+    """
+    with closing(_conectar(caminho)) as conn:
+        info = conn.execute(
+            "SELECT cabecalho, sincronizado_em FROM abas WHERE spreadsheet_id = ? AND aba = ?",
+            (spreadsheet_id, aba),
+        ).fetchone()
+        if info is None:
+            return None
+        cabecalho, sincronizado_em = info
+        if idade_maxima is not None and time.time() - sincronizado_em > idade_maxima:
+            return None
+        linhas = conn.execute(
+            "SELECT valores FROM linhas WHERE spreadsheet_id = ? AND aba = ? ORDER BY posicao",
+            (spreadsheet_id, aba),
+        ).fetchall()
+    cabecalho = json.loads(cabecalho)
+    if not cabecalho:
+        return []
+    return [cabecalho] + [json.loads(v) for (v,) in linhas]
+
+
+def _posicao_chave(cabecalho):
+    try:
+        return cabecalho.index(COLUNA_CHAVE)
+    except ValueError:
+        return None
+
+
+def gravar_bloco(spreadsheet_id, aba, cabecalho, inicio, linhas, caminho=None):
+    """
+    Grava um bloco de linhas que começa na posição 'inicio' (base 0, sem cabeçalho),
+    regravando só as que mudaram. Retorna quantas linhas foram regravadas.
+    """
+    pos_chave = _posicao_chave(cabecalho)
+    with closing(_conectar(caminho)) as conn, conn:
+        hashes = dict(conn.execute(
+            "SELECT posicao, hash FROM linhas WHERE spreadsheet_id = ? AND aba = ? AND posicao >= ? AND posicao < ?",
+            (spreadsheet_id, aba, inicio, inicio + len(linhas)),
+        ).fetchall())
+
+        alteradas = []
+        for posicao, linha in enumerate(linhas, start=inicio):
+            h = _hash_linha(linha)
+            if hashes.get(posicao) != h:
+                nf = linha[pos_chave] if pos_chave is not None and pos_chave < len(linha) else None
+                alteradas.append((spreadsheet_id, aba, posicao, nf, h, json.dumps(linha, ensure_ascii=False)))
+
+        conn.executemany("INSERT OR REPLACE INTO linhas VALUES (?, ?, ?, ?, ?, ?)", alteradas)
+    return len(alteradas)
+
+
+def finalizar_sincronizacao(spreadsheet_id, aba, cabecalho, total_linhas, caminho=None, versao_remota=None):
+    """Remove as linhas que sobraram depois de 'total_linhas' e marca a cópia como sincronizada."""
+    with closing(_conectar(caminho)) as conn, conn:
+        conn.execute(
+            "DELETE FROM linhas WHERE spreadsheet_id = ? AND aba = ? AND posicao >= ?",
+            (spreadsheet_id, aba, total_linhas),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO abas (spreadsheet_id, aba, cabecalho, total_linhas, sincronizado_em, versao_remota)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (spreadsheet_id, aba, json.dumps(cabecalho, ensure_ascii=False), total_linhas, time.time(), versao_remota),
+        )
+
+
+def gravar_incremental(spreadsheet_id, aba, values, caminho=None, versao_remota=None):
+    """
+    Atualiza a cópia local com os valores da aba gravando só as linhas cujo hash mudou
+    (e removendo as que sobraram no fim). Retorna quantas linhas foram regravadas.
+    """
+    cabecalho = values[0] if values else []
+    linhas = values[1:] if values else []
+    alteradas = gravar_bloco(spreadsheet_id, aba, cabecalho, 0, linhas, caminho)
+    finalizar_sincronizacao(spreadsheet_id, aba, cabecalho, len(linhas), caminho, versao_remota=versao_remota)
+    return alteradas
+
+
+def marcar_desatualizado(spreadsheet_id, aba, caminho=None):
+    """Força a próxima leitura da aba a sincronizar com a planilha (usado após escritas)."""
+    with closing(_conectar(caminho)) as conn, conn:
+        conn.execute(
+            "UPDATE abas SET sincronizado_em = 0, versao_remota = NULL WHERE spreadsheet_id = ? AND aba = ?",
+            (spreadsheet_id, aba),
+        )
+
+
+def confirmar_versao(spreadsheet_id, aba, versao_remota, caminho=None):
+    """
+    Se a cópia local foi sincronizada na mesma 'versao_remota', renova a validade dela
+    e retorna True; senão retorna False (a cópia precisa ser sincronizada).
+    """
+    with closing(_conectar(caminho)) as conn, conn:
+        cursor = conn.execute(
+            "UPDATE abas SET sincronizado_em = ? WHERE spreadsheet_id = ? AND aba = ? AND versao_remota = ?",
+            (time.time(), spreadsheet_id, aba, versao_remota),
+        )
+        return cursor.rowcount > 0
+
+
+def sincronizar_snapshot(service, spreadsheet_id, aba, caminho=None, versao_remota=None):
+    """Baixa a aba, atualiza a cópia local só nas linhas alteradas e retorna os valores."""
+    result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=aba).execute()
+    values = result.get("values", [])
+    gravar_incremental(spreadsheet_id, aba, values, caminho, versao_remota=versao_remota)
+    return values
+
+
+if __name__ == "__main__":
+    from sheets import get_sheets_service, ler_versao_remota, SPREADSHEET_ID, ABA_NOTAS, ABA_DEVOLUCAO
+
+    service = get_sheets_service()
+    if service is None:
+        raise SystemExit("Serviço Google Sheets não disponível.")
+    for aba in (ABA_NOTAS, ABA_DEVOLUCAO):
+        versao_remota = ler_versao_remota(service, aba)
+        if versao_remota is not None and confirmar_versao(SPREADSHEET_ID, aba, versao_remota):
+            print(f"{aba}: sem alterações.")
+            continue
+        values = sincronizar_snapshot(service, SPREADSHEET_ID, aba, versao_remota=versao_remota)
+        print(f"{aba}: {max(len(values) - 1, 0)} linhas sincronizadas.")
@@ -0,0 +1,26 @@
+# tests/conftest.py
+"""Planilha falsa dos benchmarks (benchmarks/planilha_falsa.py) com cópia local e log numa pasta temporária."""
+import os
+import sys
+
+import pytest
+import streamlit as st
+import streamlit.logger
+
+streamlit.logger.set_log_level("error") # Avisos de 'bare mode' (fora do streamlit run)
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, "benchmarks")]
+
+import medicao
+import snapshot
+from planilha_falsa import PlanilhaFalsa, gerar_abas
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_PATH", str(tmp_path / "snapshot" / "planilhas.sqlite3"))
+    monkeypatch.setattr(medicao, "ARQUIVO_LOG", str(tmp_path / "medicoes.log"))
+    st.cache_resource.clear()
+    yield PlanilhaFalsa(gerar_abas(1000))
+    st.cache_resource.clear()
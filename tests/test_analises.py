@@ -0,0 +1,52 @@
+# tests/test_analises.py
+"""
+Semanas encerradas guardadas pelas análises do painel (analises.get_analises).
+
+    python -m pytest tests
+"""
+import analises
+import sheets
+from sheets import ABA_NOTAS, SPREADSHEET_ID
+
+HOJE = "2025-06-30"
+
+
+def _versao_nova(service):
+    """Invalida a aba e recalcula; retorna (resultado, semanas encerradas guardadas)."""
+    sheets.invalidar_aba(ABA_NOTAS)
+    resultado, _ = analises.get_analises(service, ABA_NOTAS, hoje=HOJE)
+    return resultado, analises._analises()["itens"][(SPREADSHEET_ID, ABA_NOTAS)]["encerradas"]
+
+
+def _do_zero(service):
+    analises._analises()["itens"].clear()
+    return _versao_nova(service)[0]
+
+
+def _iguais(a, b):
+    return all(a[painel].equals(b[painel]) for painel in a)
+
+
+def test_nota_nova_e_linha_deslocada_nao_refazem_as_semanas_encerradas(service):
+    _, encerradas = _versao_nova(service)
+
+    linhas = service.abas[ABA_NOTAS]
+    linhas.append(["999999", "FORNECEDOR NOVO", "10,00", "15/07/2025", "DANILO", "FALSE", "", "30/06/2025"])
+    linhas.insert(1, linhas.pop(500))
+    resultado, guardadas = _versao_nova(service)
+
+    assert guardadas is encerradas
+    assert _iguais(resultado, _do_zero(service))
+
+
+def test_historico_editado_refaz_as_semanas_encerradas(service):
+    _, encerradas = _versao_nova(service)
+
+    linhas = service.abas[ABA_NOTAS]
+    coluna = linhas[0].index(sheets.COLUNA_GESTOR_ASSINATURA)
+    assinada_em_maio = next(l for l in linhas[1:] if l[coluna][3:10] == "05/2025" and not l[coluna].startswith("02/"))
+    assinada_em_maio[coluna] = "02/05/2025 10:00:00"
+    resultado, guardadas = _versao_nova(service)
+
+    assert guardadas is not encerradas
+    assert _iguais(resultado, _do_zero(service))
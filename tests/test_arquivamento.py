@@ -0,0 +1,99 @@
+# tests/test_arquivamento.py
+"""
+Job de arquivamento (arquivamento.arquivar_aba) sobre a planilha falsa dos benchmarks.
+
+    python -m pytest tests
+"""
+import pandas as pd
+import pytest
+
+import sheets
+from arquivamento import arquivar_aba, ler_arquivo
+from fila_escrita import FilaEscrita
+from notas import aplicar_assinaturas
+from sheets import ABA_NOTAS, COLUNA_ASSINATURA, COLUNA_GESTOR_ASSINATURA, COLUNA_NF
+from suite import funcoes_da_pagina
+
+HOJE = "2025-06-30"
+IDADE_DIAS = 180
+
+
+def _linhas_por_nf(service):
+    return {linha[0]: list(linha) for linha in service.abas[ABA_NOTAS][1:]}
+
+
+def _arquivadas(pasta):
+    df = ler_arquivo(ABA_NOTAS, "0000-00", "9999-99", str(pasta))
+    return [] if df is None else df[COLUNA_NF].astype(str).tolist()
+
+
+def _resolvidas_antes_do_limite(linhas):
+    limite = pd.Timestamp(HOJE) - pd.Timedelta(days=IDADE_DIAS)
+    coluna = linhas[0].index(COLUNA_GESTOR_ASSINATURA)
+    datas = pd.to_datetime(pd.Series([l[coluna] for l in linhas[1:]]), errors="coerce", dayfirst=True)
+    return {l[0] for l, frio in zip(linhas[1:], (datas < limite).tolist()) if frio}
+
+
+def _falhar_na_remocao(service, aplicadas):
+    """A próxima remoção aplica só as 'aplicadas' primeiras requests e termina com erro."""
+    aplicar = service.aplicar_requests
+
+    def aplicar_e_falhar(requests):
+        aplicar(requests[:aplicadas(len(requests))])
+        raise TimeoutError("sem resposta da API")
+    service.aplicar_requests = aplicar_e_falhar
+
+
+def test_arquivar_remove_da_planilha_o_que_foi_para_o_arquivo(service, tmp_path):
+    antes = _linhas_por_nf(service)
+    frias = _resolvidas_antes_do_limite(service.abas[ABA_NOTAS])
+
+    total = arquivar_aba(service, ABA_NOTAS, IDADE_DIAS, pasta=str(tmp_path), hoje=HOJE)
+
+    arquivadas = _arquivadas(tmp_path)
+    assert total == len(frias) > 0
+    assert sorted(arquivadas) == sorted(frias)
+    assert _linhas_por_nf(service) == {nf: linha for nf, linha in antes.items() if nf not in frias}
+
+
+def test_arquivar_simulando_nao_altera_nada(service, tmp_path):
+    antes = _linhas_por_nf(service)
+    assert arquivar_aba(service, ABA_NOTAS, IDADE_DIAS, pasta=str(tmp_path), hoje=HOJE, simular=True) > 0
+    assert _linhas_por_nf(service) == antes
+    assert _arquivadas(tmp_path) == []
+
+
+@pytest.mark.parametrize("aplicadas", [
+    lambda n: 0, # Nada foi removido
+    lambda n: n // 2, # A remoção parou no meio
+    lambda n: n, # Tudo foi removido, mas a resposta se perdeu
+], ids=["nada", "metade", "tudo"])
+def test_remocao_com_erro_deixa_cada_linha_num_lugar_so(service, tmp_path, aplicadas):
+    antes = _linhas_por_nf(service)
+    _falhar_na_remocao(service, aplicadas)
+
+    with pytest.raises(TimeoutError):
+        arquivar_aba(service, ABA_NOTAS, IDADE_DIAS, pasta=str(tmp_path), hoje=HOJE)
+
+    na_planilha = _linhas_por_nf(service)
+    arquivadas = _arquivadas(tmp_path)
+    assert len(arquivadas) == len(set(arquivadas))
+    assert set(arquivadas).isdisjoint(na_planilha)
+    assert set(arquivadas) | set(na_planilha) == set(antes)
+    assert na_planilha == {nf: linha for nf, linha in antes.items() if nf in na_planilha}
+
+
+def test_assinatura_carregada_antes_do_arquivamento_e_recusada(service, tmp_path):
+    """Uma sessão com a aba carregada antes do arquivamento não grava nas posições antigas."""
+    notas = sheets.get_notas_gestor(service, ABA_NOTAS, "KATIA")
+    arquivar_aba(service, ABA_NOTAS, IDADE_DIAS, pasta=str(tmp_path), hoje=HOJE)
+    antes = _linhas_por_nf(service)
+
+    pagina = funcoes_da_pagina("Page_Assinatura.py", "# --- Lógica da Página")
+    fila = FilaEscrita(janela=0)
+    pagina["get_fila_escrita"] = lambda: fila
+    pendentes = notas[notas[COLUNA_GESTOR_ASSINATURA].isna()]
+    editado = pendentes[[COLUNA_ASSINATURA]].iloc[-1:].assign(**{COLUNA_ASSINATURA: True})
+
+    assert not pagina["update_tabela_sheets"](service, notas, aplicar_assinaturas(notas, editado), editado.index)
+    assert _linhas_por_nf(service) == antes
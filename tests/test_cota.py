@@ -0,0 +1,96 @@
+# tests/test_cota.py
+"""
+Repetições e conexões do cliente com cota (cota.ClienteComCota), sobre um 'service' falso.
+
+    python -m pytest tests
+"""
+import threading
+from types import SimpleNamespace
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import cota
+from cota import ClienteComCota
+
+
+class _Request:
+    def __init__(self, servico):
+        self._servico = servico
+
+    def execute(self, **kwargs):
+        self._servico.chamadas.append(kwargs.get("http"))
+        if self._servico.falhas:
+            raise HttpError(httplib2.Response({"status": self._servico.falhas.pop(0)}), b"")
+        return {}
+
+
+class _Recurso:
+    def __init__(self, servico):
+        self._servico = servico
+
+    def values(self):
+        return _Recurso(self._servico)
+
+    def __getattr__(self, nome):
+        if nome == "execute": # Recurso, não requisição
+            raise AttributeError(nome)
+        return lambda **kwargs: _Request(self._servico)
+
+
+class _Servico:
+    """Responde com os status de 'falhas' (um por chamada) e depois com sucesso."""
+
+    def __init__(self, falhas=()):
+        self.falhas = list(falhas)
+        self.chamadas = []
+        self._http = SimpleNamespace(credentials=object())
+
+    def spreadsheets(self):
+        return _Recurso(self)
+
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(cota.time, "sleep", lambda segundos: None)
+
+
+def _executar(servico, metodo, recurso="values"):
+    raiz = ClienteComCota(servico).spreadsheets()
+    return getattr(raiz.values() if recurso == "values" else raiz, metodo)().execute()
+
+
+@pytest.mark.parametrize("metodo", ["update", "get"])
+def test_idempotentes_sao_repetidos_em_5xx(metodo):
+    servico = _Servico([503])
+    _executar(servico, metodo)
+    assert len(servico.chamadas) == 2
+
+
+@pytest.mark.parametrize("recurso, metodo", [("values", "append"), ("spreadsheets", "batchUpdate")])
+def test_nao_idempotentes_so_sao_repetidos_em_429(recurso, metodo):
+    servico = _Servico([429])
+    _executar(servico, metodo, recurso)
+    assert len(servico.chamadas) == 2
+
+    servico = _Servico([503])
+    with pytest.raises(HttpError):
+        _executar(servico, metodo, recurso)
+    assert len(servico.chamadas) == 1
+
+
+def test_cada_thread_usa_sua_conexao():
+    servico = _Servico()
+    cliente = ClienteComCota(servico)
+    threads = [threading.Thread(target=lambda: [cliente.spreadsheets().values().get().execute() for _ in range(2)])
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conexoes = servico.chamadas
+    assert len(conexoes) == 6 and None not in conexoes and servico._http not in conexoes
+    assert len({id(http) for http in conexoes}) == 3
+    assert all(http.credentials is servico._http.credentials for http in conexoes)
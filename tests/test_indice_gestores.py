@@ -0,0 +1,72 @@
+# tests/test_indice_gestores.py
+"""
+Índice por gestor (sheets.get_indice_gestores) sobre a planilha falsa dos benchmarks.
+
+    python -m pytest tests
+"""
+import sheets
+from fila_escrita import FilaEscrita
+from notas import aplicar_assinaturas
+from sheets import ABA_NOTAS, COLUNA_ASSINATURA, COLUNA_GESTOR_ASSINATURA, COLUNA_GESTOR_RESP, COLUNA_NF
+from suite import funcoes_da_pagina
+
+GESTOR = "KATIA"
+
+
+def _linhas_do_gestor(service):
+    linhas = service.abas[ABA_NOTAS]
+    coluna = linhas[0].index(COLUNA_GESTOR_RESP)
+    return sum(1 for linha in linhas[1:] if linha[coluna] == GESTOR)
+
+
+def _linhas_por_nf(service):
+    return {linha[0]: list(linha) for linha in service.abas[ABA_NOTAS][1:]}
+
+
+def test_linhas_incluidas_na_planilha_antes_de_uma_assinatura(service):
+    """Linhas incluídas direto na planilha e uma assinatura gravada logo depois: o índice é refeito."""
+    notas = sheets.get_notas_gestor(service, ABA_NOTAS, GESTOR)
+    assert len(notas) == _linhas_do_gestor(service)
+    nf = notas.loc[notas[COLUNA_GESTOR_ASSINATURA].isna(), COLUNA_NF].iloc[0]
+
+    cabecalho = service.abas[ABA_NOTAS][0]
+    for i in range(3):
+        nova = dict(zip(cabecalho, [f"90000{i}", "FORNECEDOR NOVO", "10,00", "01/07/2025", "DANILO", "FALSE", "", ""]))
+        service.abas[ABA_NOTAS].insert(1, [nova[c] for c in cabecalho])
+    antes = _linhas_por_nf(service)
+
+    # Uma assinatura salva pela Page_Assinatura (pela fila de escrita) logo depois: as
+    # linhas mudaram de posição, então ela é recusada e nada é gravado
+    pagina = funcoes_da_pagina("Page_Assinatura.py", "# --- Lógica da Página")
+    fila = FilaEscrita(janela=0)
+    pagina["get_fila_escrita"] = lambda: fila
+
+    def assinar(notas):
+        editado = notas.loc[notas[COLUNA_NF] == nf, [COLUNA_ASSINATURA]].assign(**{COLUNA_ASSINATURA: True})
+        return pagina["update_tabela_sheets"](service, notas, aplicar_assinaturas(notas, editado), editado.index)
+
+    assert not assinar(notas)
+    assert _linhas_por_nf(service) == antes
+
+    # Depois de recarregar, a assinatura vai para a nota certa e só para ela
+    notas = sheets.get_notas_gestor(service, ABA_NOTAS, GESTOR)
+    assert assinar(notas)
+    depois = _linhas_por_nf(service)
+    coluna = cabecalho.index(COLUNA_GESTOR_ASSINATURA)
+    assert antes[nf][coluna] == "" and depois[nf][coluna] != ""
+    assert {k: v for k, v in depois.items() if k != nf} == {k: v for k, v in antes.items() if k != nf}
+
+    notas = sheets.get_notas_gestor(service, ABA_NOTAS, GESTOR)
+    assert len(notas) == _linhas_do_gestor(service)
+    assert (notas[COLUNA_GESTOR_RESP] == GESTOR).all()
+
+
+def test_indice_reaproveitado_enquanto_a_tabela_nao_muda(service):
+    _, indice = sheets.get_indice_gestores(service, ABA_NOTAS)
+    _, de_novo = sheets.get_indice_gestores(service, ABA_NOTAS)
+    assert de_novo is indice
+
+    sheets.invalidar_aba(ABA_NOTAS)
+    df, refeito = sheets.get_indice_gestores(service, ABA_NOTAS)
+    assert refeito is not indice
+    assert sorted(refeito) == sorted(df[COLUNA_GESTOR_RESP].astype(str).unique())